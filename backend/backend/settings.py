@@ -10,12 +10,21 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -81,10 +90,22 @@ TEMPLATES = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'symptomtracker.authentication.EagerJWTAuthentication',
     )
 }
 
+# Default page size for the cursor-paginated entry and notification lists
+ENTRY_PAGE_SIZE = 50
+
+# Changes per /api/sync/ response by default, and the most a client may ask for
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 5000
+
+# Deletion tombstones older than this many days are removed by
+# `manage.py prune_tombstones`. A client whose sync cursor predates a pruned
+# tombstone is told to sync again from scratch.
+SYNC_TOMBSTONE_RETENTION_DAYS = env_int("SYNC_TOMBSTONE_RETENTION_DAYS", 90)
+
 # JWT settings
 from datetime import timedelta
 
@@ -94,25 +115,182 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_REFRESH_SERIALIZER': 'symptomtracker.serializers.FilteredTokenRefreshSerializer',
 }
 
+# In-process Bloom filter in front of the refresh-token blacklist check. A
+# token blacklisted by another worker is seen within TOKEN_BLACKLIST_SYNC_SECONDS;
+# until then a replay of it is refused when rotation blacklists it (tokens.py).
+TOKEN_BLACKLIST_FILTER = True
+TOKEN_BLACKLIST_SYNC_SECONDS = 5
+TOKEN_BLACKLIST_FILTER_CAPACITY = 10000
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.01
+
+# Most recent refresh and login timings kept for the auth metrics endpoints
+AUTH_METRICS_WINDOW = 1000
+
+# Largest array accepted by the entry viewsets' batch/ upload action
+BATCH_CREATE_MAX_ITEMS = 500
+
+# Rows fetched per round trip by each table's iterator in the history export
+EXPORT_CHUNK_SIZE = 2000
+
+# Entries older than this many days are moved to the compressed archive table
+# by `manage.py archive_entries`, ARCHIVE_BATCH_SIZE per transaction. The
+# codec is "zlib", or "zstd" when the optional zstandard package is installed.
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 365)
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_CODEC = os.environ.get("ARCHIVE_CODEC", "zlib")
+
+# Outgoing mail. Configure SMTP here for production; the console backend
+# just prints messages so the physician digest worker can run locally.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Chronic Care <no-reply@chroniccare.app>'
+
+# Physician digest delivery retries: the wait doubles after each failed
+# attempt, starting at the base and capped at the maximum
+PHYSICIAN_DELIVERY_MAX_ATTEMPTS = 5
+PHYSICIAN_DELIVERY_BACKOFF_SECONDS = 60
+PHYSICIAN_DELIVERY_MAX_BACKOFF_SECONDS = 3600
+
+# Seconds a worker's claim on the rows it is emailing lasts before another
+# worker may take them over
+PHYSICIAN_DELIVERY_CLAIM_SECONDS = 300
+
+# Per-process cache; point this at a shared backend when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Route the home screen, recent entries and trend charts to the native async
+# views in symptomtracker/async_views.py. asgi.py turns this on by default;
+# under WSGI the sync DRF views avoid running an event loop per request.
+ASYNC_READ_VIEWS = env_bool("ASYNC_READ_VIEWS")
+
+# Seconds a user's assembled home screen payload may be kept in cache. It is
+# only served while the user's data version (a database counter) is unchanged.
+HOME_DATA_CACHE_TIMEOUT = 300
+
+# Seconds a user's entry count, used to weight multi-term searches, is cached
+SEARCH_DOCUMENT_COUNT_TIMEOUT = 3600
+
+# Longest range the data-analysis trends and statistics accept, and the
+# largest day lag of the statistics
+ANALYTICS_MAX_DAYS = 3650
+ANALYTICS_MAX_LAG = 30
+
 WSGI_APPLICATION = "backend.wsgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DB_ENGINE=postgres switches to PostgreSQL configured by the DB_* variables;
+# otherwise the SQLite file at DB_NAME (default db.sqlite3) is used
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "symptomtracker"),
+            "USER": os.environ.get("DB_USER", ""),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # Verify a reused connection before each request instead of
+            # failing on one the server has dropped
+            "CONN_HEALTH_CHECKS": True,
+            "CONN_MAX_AGE": env_int("DB_CONN_MAX_AGE", 60),
+            "OPTIONS": {},
+        }
     }
+    # DB_POOL=1 uses Django's psycopg pool (needs psycopg[pool]). Pooled
+    # connections are returned to the pool after each request, so Django's
+    # own persistent connections must be off.
+    if env_bool("DB_POOL"):
+        from psycopg_pool import ConnectionPool
+
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": env_int("DB_POOL_MIN_SIZE", 2),
+            "max_size": env_int("DB_POOL_MAX_SIZE", 10),
+            "timeout": env_int("DB_POOL_TIMEOUT", 10),
+            "check": ConnectionPool.check_connection,
+        }
+    # DB_REPLICA_HOST adds a read replica of the same database, used for the
+    # read-only requests listed in symptomtracker/routers.py
+    if os.environ.get("DB_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": os.environ["DB_REPLICA_HOST"],
+            "PORT": os.environ.get("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+            "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+            "TEST": {"MIRROR": "default"},
+        }
+        DATABASE_ROUTERS = ["symptomtracker.routers.ReadReplicaRouter"]
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # Writers take the lock when their transaction begins, so they
+                # wait out busy_timeout instead of failing a lock upgrade midway
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    }
+
+# PRAGMAs run on every new SQLite connection (see symptomtracker/db.py).
+# busy_timeout is in milliseconds, mmap_size in bytes, and a negative
+# cache_size in KiB.
+SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,
+}
+# WAL lets readers proceed alongside the single writer, and NORMAL syncs
+# only at checkpoints, which is still crash-safe in WAL mode. The journal
+# mode is written into the database file itself and keeps -wal and -shm
+# files beside it, so deployments switch it on with SQLITE_WAL=1 rather
+# than any manage.py run converting the file.
+SQLITE_WAL_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
 }
+if env_bool("SQLITE_WAL"):
+    SQLITE_PRAGMAS.update(SQLITE_WAL_PRAGMAS)
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# The stock PBKDF2 hasher is replaced rather than followed, since hashers
+# sharing an algorithm name shadow each other when hashes are verified
+PASSWORD_HASHERS = [
+    "symptomtracker.passwords.ConfiguredPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# PBKDF2 iterations for new and upgraded hashes. Values below Django's
+# default count are raised to it; None keeps the default.
+PASSWORD_HASH_ITERATIONS = None
+
+AUTHENTICATION_BACKENDS = ["symptomtracker.passwords.DeferredRehashBackend"]
+
+# Failed logins allowed per username and per client address within the
+# window before /auth/login/ answers 429 without checking the password
+LOGIN_FAILURE_LIMIT = 5
+LOGIN_FAILURE_IP_LIMIT = 50
+LOGIN_FAILURE_WINDOW_SECONDS = 300
+LOGIN_FAILURE_MAX_KEYS = 10000
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     UserProfile, UserSettings, PhysicalPainEntry, 
-    MentalWellnessEntry, DiaryEntry, PhysicianInfo, Notification
+    MentalWellnessEntry, DiaryEntry, PhysicianInfo, Notification, DailySymptomRollup,
+    PhysicianOutbox
 )
 
 admin.site.register(UserProfile)
@@ -11,3 +12,5 @@ admin.site.register(MentalWellnessEntry)
 admin.site.register(DiaryEntry)
 admin.site.register(PhysicianInfo)
 admin.site.register(Notification)
+admin.site.register(DailySymptomRollup)
+admin.site.register(PhysicianOutbox)
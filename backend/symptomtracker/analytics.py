@@ -0,0 +1,76 @@
+"""Vectorized statistics over a user's daily pain and mental wellness series.
+
+Series are NumPy float arrays with one element per calendar day and NaN on
+days without entries. Every window statistic skips NaN days.
+"""
+import numpy as np
+
+
+def daily_series(offsets, totals, counts, length):
+    """Mean value per day from (day offset, total, count) columns."""
+    series = np.full(length, np.nan)
+    series[offsets] = totals / counts
+    return series
+
+
+def _window_sums(values, window):
+    """Rolling sums of `values` over the trailing `window` elements."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    sums = cumulative[window:] - cumulative[:-window]
+    # The first window - 1 days only see a partial window
+    head = cumulative[1:window]
+    return np.concatenate((head, sums))[:len(values)]
+
+
+def rolling_mean(series, window):
+    observed = ~np.isnan(series)
+    filled = np.where(observed, series, 0.0)
+    counts = _window_sums(observed.astype(float), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, _window_sums(filled, window) / counts, np.nan)
+
+
+def rolling_std(series, window):
+    """Sample standard deviation over the trailing window; NaN below two days."""
+    observed = ~np.isnan(series)
+    filled = np.where(observed, series, 0.0)
+    counts = _window_sums(observed.astype(float), window)
+    sums = _window_sums(filled, window)
+    squares = _window_sums(filled ** 2, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums ** 2 / counts) / (counts - 1)
+    # Cumulative sums leave tiny negative rounding residue on flat windows
+    return np.where(counts > 1, np.sqrt(np.clip(variance, 0.0, None)), np.nan)
+
+
+def lagged_correlation(x, y, max_lag):
+    """Pearson r of x[t] against y[t + lag] for lag in -max_lag..max_lag.
+
+    Returns (lags, r, n) arrays; r is NaN where fewer than three days pair up
+    or either side is constant.
+    """
+    length = len(x)
+    lags = np.arange(-max_lag, max_lag + 1)
+    r = np.full(len(lags), np.nan)
+    n = np.zeros(len(lags), dtype=int)
+    for i, lag in enumerate(lags):
+        if abs(lag) >= length:
+            continue
+        a = x[max(0, -lag):length - max(0, lag)]
+        b = y[max(0, lag):length - max(0, -lag)]
+        paired = ~(np.isnan(a) | np.isnan(b))
+        n[i] = paired.sum()
+        if n[i] < 3:
+            continue
+        a = a[paired] - a[paired].mean()
+        b = b[paired] - b[paired].mean()
+        denominator = np.sqrt((a ** 2).sum() * (b ** 2).sum())
+        if denominator > 0:
+            r[i] = (a * b).sum() / denominator
+    return lags, r, n
+
+
+def to_list(values, digits=3):
+    """JSON-ready list with NaN as None."""
+    values = np.round(values, digits)
+    return [None if np.isnan(value) else value for value in values.tolist()]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SymptomtrackerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "symptomtracker"
+
+    def ready(self):
+        from . import db  # connects the SQLite PRAGMA hook
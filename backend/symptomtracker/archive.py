@@ -0,0 +1,269 @@
+"""Cold storage for pain, mental wellness and diary entries.
+
+archive_entries() moves entries older than a cutoff out of their hot tables
+into ArchivedEntry, in batches of one transaction each: one narrow row per
+entry, with its free text compressed (zlib, or zstd when the optional
+zstandard package is installed). Entries keep their id, timestamp, value and
+change number, and the daily rollups are left as they are, so the trend and
+statistics endpoints read the same numbers as before. The entry lists, the
+history export and sync merge archived rows back in with the helpers below
+once a request reaches past the hot rows, and the entry viewsets retrieve
+and delete archived entries by their old id. Archived entries cannot be
+edited and are no longer found by search.
+
+Run it with ``python manage.py archive_entries``.
+"""
+import time
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ArchivedEntry, ChangeSequence, PhysicalPainEntry, MentalWellnessEntry, DiaryEntry, SearchPosting, archiving
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# (entry model, numeric value field, free-text field) per archived entry type
+ARCHIVE_SOURCES = {
+    'pain': (PhysicalPainEntry, 'pain_level', 'notes'),
+    'mental': (MentalWellnessEntry, 'wellness_level', 'notes'),
+    'diary': (DiaryEntry, None, 'content'),
+}
+
+ARCHIVE_TYPES = {model: entry_type for entry_type, (model, _, _) in ARCHIVE_SOURCES.items()}
+
+# codec: (compress, decompress). Texts that do not shrink are stored as 'raw'.
+CODECS = {
+    'raw': (bytes, bytes),
+    'zlib': (lambda data: zlib.compress(data, 9), zlib.decompress),
+}
+if zstandard:
+    # Compressor objects are not safe to share between threads, so one per call
+    CODECS['zstd'] = (
+        lambda data: zstandard.ZstdCompressor(level=19).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+
+# Columns of an ArchivedEntry that entry_row() needs
+ROW_FIELDS = ['entry_type', 'entry_id', 'timestamp', 'value', 'text', 'codec', 'sent_to_physician']
+
+
+def compress_text(text, codec):
+    """Return (codec actually used, stored bytes) for `text`, which may be None."""
+    if text is None:
+        return 'raw', None
+    data = text.encode('utf-8')
+    compressed = CODECS[codec][0](data)
+    if len(compressed) < len(data):
+        return codec, compressed
+    return 'raw', data
+
+
+def decompress_text(codec, data):
+    if data is None:
+        return None
+    return CODECS[codec][1](bytes(data)).decode('utf-8')
+
+
+def entry_row(archived, field_names):
+    """An ArchivedEntry values() row (ROW_FIELDS) reshaped into its hot table's
+    values() row for `field_names`, so the entry RowSerializers can serialize it."""
+    _, value_field, text_field = ARCHIVE_SOURCES[archived['entry_type']]
+    source = {
+        'id': archived['entry_id'],
+        'timestamp': archived['timestamp'],
+        'sent_to_physician': archived['sent_to_physician'],
+        text_field: decompress_text(archived['codec'], archived['text']),
+    }
+    if value_field:
+        source[value_field] = archived['value']
+    return {name: source[name] for name in field_names}
+
+
+def archive_field(lookup):
+    # The archive keeps the entry's id as entry_id; every other column matches
+    prefix = '-' if lookup.startswith('-') else ''
+    field, _, rest = lookup.lstrip('-').partition('__')
+    field = 'entry_id' if field in ('id', 'pk') else field
+    return prefix + field + ('__' + rest if rest else '')
+
+
+def archive_q(condition):
+    """`condition`, a Q over a hot table's fields, over ArchivedEntry's instead."""
+    children = [
+        archive_q(child) if isinstance(child, Q) else (archive_field(child[0]), child[1])
+        for child in condition.children
+    ]
+    return Q(*children, _connector=condition.connector, _negated=condition.negated)
+
+
+class ArchiveMergedRows:
+    """A user's entry list as .values() rows: the hot rows merged with the
+    archived ones in the same (timestamp, id) order.
+
+    Supports what EntryCursorPagination does with a queryset (order_by, filter
+    on the ordering fields, slicing), so a list pages on past its last hot entry
+    into the archive. A slice reads at most `stop` rows from each side. When
+    the hot rows fill it, the archive is only probed for rows that sort
+    before the last of them, which costs one index lookup.
+    """
+
+    def __init__(self, field_names, hot, archived, ordering):
+        self.field_names = field_names
+        self.hot = hot
+        self.archived = archived
+        self.ordering = ordering
+
+    def order_by(self, *ordering):
+        return ArchiveMergedRows(
+            self.field_names,
+            self.hot.order_by(*ordering),
+            self.archived.order_by(*[archive_field(field) for field in ordering]),
+            ordering,
+        )
+
+    @property
+    def model(self):
+        return self.hot.model
+
+    def filter(self, *args, **kwargs):
+        return ArchiveMergedRows(
+            self.field_names,
+            self.hot.filter(*args, **kwargs),
+            self.archived.filter(
+                *[archive_q(condition) for condition in args],
+                **{archive_field(lookup): value for lookup, value in kwargs.items()}
+            ),
+            self.ordering,
+        )
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('ArchiveMergedRows only supports slicing.')
+        descending = self.ordering[0].startswith('-')
+        fields = [field.lstrip('-') for field in self.ordering]
+        stop = key.stop
+
+        rows = list(self.hot[:stop])
+        archived = self.archived
+        if stop is not None and len(rows) == stop:
+            # Only archived rows up to the last hot one can make the cut
+            bound = rows[-1][fields[0]]
+            archived = archived.filter(**{fields[0] + ('__gte' if descending else '__lte'): bound})
+        rows += [entry_row(row, self.field_names) for row in archived.values(*ROW_FIELDS)[:stop]]
+        rows.sort(key=lambda row: tuple(row[field] for field in fields), reverse=descending)
+        return rows[key]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def with_archived(row_serializer, queryset, user):
+    """`queryset`'s values() rows for `row_serializer`, merged with `user`'s
+    archived entries when it lists an archived entry type."""
+    rows = row_serializer.values(queryset)
+    entry_type = ARCHIVE_TYPES.get(queryset.model)
+    if entry_type is None:
+        return rows
+    archived = ArchivedEntry.objects.filter(user=user, entry_type=entry_type)
+    ordering = queryset.query.order_by or ('-timestamp', '-id')
+    return ArchiveMergedRows(row_serializer.field_names, rows, archived, tuple(ordering)).order_by(*ordering)
+
+
+def iter_archived(user, kind, using=None):
+    """Yield `user`'s archived `kind` entries oldest first, as the history export's
+    (timestamp, id, type, value, text, sent_to_physician) tuples."""
+    rows = ArchivedEntry.objects.using(using).filter(user=user, entry_type=kind).order_by(
+        'timestamp', 'entry_id'
+    ).values_list('timestamp', 'entry_id', 'value', 'codec', 'text', 'sent_to_physician')
+    for timestamp, pk, value, codec, text, sent in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield timestamp, pk, kind, value, decompress_text(codec, text), sent
+
+
+def archive_batch(entry_type, cutoff, batch_size, codec):
+    """Move up to `batch_size` of the oldest `entry_type` entries before `cutoff`
+    in one transaction. Returns (entries moved, text bytes, stored bytes)."""
+    model, value_field, text_field = ARCHIVE_SOURCES[entry_type]
+    fields = ['id', 'user_id', 'timestamp', text_field, 'sent_to_physician', 'idempotency_key', 'change_seq']
+    if value_field:
+        fields.append(value_field)
+
+    with transaction.atomic():
+        # Locked, so an edit made meanwhile waits for the move instead of being lost
+        rows = list(
+            model.objects.select_for_update(skip_locked=True).filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id').values(*fields)[:batch_size]
+        )
+        if not rows:
+            return 0, 0, 0
+
+        text_bytes = stored_bytes = 0
+        archived = []
+        for row in rows:
+            text = row[text_field]
+            row_codec, data = compress_text(text, codec)
+            if text is not None:
+                text_bytes += len(text.encode('utf-8'))
+                stored_bytes += len(data)
+            archived.append(ArchivedEntry(
+                user_id=row['user_id'],
+                entry_type=entry_type,
+                entry_id=row['id'],
+                timestamp=row['timestamp'],
+                value=row[value_field] if value_field else None,
+                text=data,
+                codec=row_codec,
+                sent_to_physician=row['sent_to_physician'],
+                idempotency_key=row['idempotency_key'],
+                change_seq=row['change_seq'],
+            ))
+        ArchivedEntry.objects.bulk_create(archived)
+
+        ids = [row['id'] for row in rows]
+        token = archiving.set(True)
+        try:
+            model.objects.filter(pk__in=ids).delete()
+        finally:
+            archiving.reset(token)
+        SearchPosting.objects.filter(entry_type=entry_type, entry_id__in=ids).delete()
+        # Recent lists no longer include the moved entries, so their owners'
+        # ETags must change. Counters are locked in user order, as elsewhere.
+        for user_id in sorted({row['user_id'] for row in rows}):
+            ChangeSequence.bump(user_id)
+    return len(rows), text_bytes, stored_bytes
+
+
+def archive_entries(cutoff, batch_size=None, codec=None, pause=0, entry_types=None, stdout=None):
+    """Archive every entry older than `cutoff`, sleeping `pause` seconds between
+    batches to leave the database to other writers.
+
+    Returns {entry type: {'entries', 'text_bytes', 'stored_bytes'}}.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    codec = codec or settings.ARCHIVE_CODEC
+    if codec not in CODECS:
+        raise ImproperlyConfigured(
+            f'Unknown archive codec {codec!r}' + (' (is zstandard installed?)' if codec == 'zstd' else '')
+        )
+
+    totals = {}
+    for entry_type in entry_types or ARCHIVE_SOURCES:
+        moved = text_bytes = stored_bytes = 0
+        while True:
+            count, batch_text, batch_stored = archive_batch(entry_type, cutoff, batch_size, codec)
+            if not count:
+                break
+            moved += count
+            text_bytes += batch_text
+            stored_bytes += batch_stored
+            if stdout:
+                stdout.write(f'{entry_type}: archived {moved} entries')
+            if pause:
+                time.sleep(pause)
+        totals[entry_type] = {'entries': moved, 'text_bytes': text_bytes, 'stored_bytes': stored_bytes}
+    return totals
@@ -0,0 +1,103 @@
+"""Native async versions of the read-heavy views, for ASGI deployments.
+
+DRF views are synchronous, so under ASGI every request to one is handed to
+a worker thread. These are plain Django async views. They authenticate with
+the same joined JWT lookup, answer with the same payloads, ETags and errors
+as their DRF counterparts in views.py, and query through Django's async ORM.
+urls.py routes to them when settings.ASYNC_READ_VIEWS is on, which asgi.py
+does by default.
+
+The home screen reuses HomeScreenDataView's cached payload in one thread
+hop: its lookups are a single query, and the async ORM would run them in a
+worker thread one after the other anyway.
+"""
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from .authentication import EagerJWTAuthentication
+from .conditional import conditional_get
+from .models import DailySymptomRollup
+from .renderers import COLUMNAR_RENDERERS
+from .routers import replica_reads
+from .views import DataAnalysisView, HomeScreenDataView
+
+
+class AsyncAPIView(View):
+    """Async counterpart of an authenticated DRF APIView without the browsable API."""
+    http_method_names = ['get', 'head', 'options']
+    authenticator = EagerJWTAuthentication()
+    content_negotiation = DefaultContentNegotiation()
+    renderer_classes = [JSONRenderer]
+
+    async def dispatch(self, request, *args, **kwargs):
+        renderers = [renderer() for renderer in self.renderer_classes]
+        # Errors fall back to the first renderer, as APIView does
+        request.accepted_renderer, request.accepted_media_type = renderers[0], renderers[0].media_type
+        try:
+            request.accepted_renderer, request.accepted_media_type = self.content_negotiation.select_renderer(
+                Request(request), renderers
+            )
+            result = await self.authenticator.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = result
+            response = await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            # Same status and WWW-Authenticate header as APIView.handle_exception
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                exc.auth_header = self.authenticator.authenticate_header(request)
+            response = exception_handler(exc, {'view': self, 'request': request})
+        return self.finalize(request, response)
+
+    def finalize(self, request, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = {'view': self, 'response': response}
+            response.render()
+        return response
+
+
+class AsyncHomeScreenDataView(AsyncAPIView):
+    @conditional_get(extra=lambda request: (DailySymptomRollup.bucket_date(timezone.now()),))
+    async def get(self, request):
+        data = await sync_to_async(HomeScreenDataView.cached_home_data)(request.user, request.data_version)
+        return Response(data)
+
+
+class AsyncRecentEntriesView(AsyncAPIView):
+    """The five newest entries, like the entry viewsets' recent action."""
+    model = None
+    row_serializer = None
+
+    @conditional_get()
+    async def get(self, request):
+        entries = self.model.objects.filter(user=request.user).order_by('-timestamp', '-id')
+        rows = self.row_serializer.values(entries)[:5]
+        return Response(self.row_serializer.serialize([row async for row in rows]))
+
+
+class AsyncTrendView(AsyncAPIView):
+    """DataAnalysisView's pain_trends / mental_wellness_trends actions."""
+    kind = None
+    label = None
+    renderer_classes = [JSONRenderer, *COLUMNAR_RENDERERS]
+
+    async def get(self, request):
+        params = DataAnalysisView.trend_params(request.GET)
+        if isinstance(params, Response):
+            return params
+        start_date, stat = params
+        with replica_reads():
+            rollups = [rollup async for rollup in DataAnalysisView.trend_rollups(request.user, self.kind, start_date)]
+        if getattr(request.accepted_renderer, 'columnar', False):
+            return Response(DataAnalysisView.trend_columns(rollups, self.label, stat))
+        return Response(DataAnalysisView.trend_data(rollups, self.label, DataAnalysisView.ROLLUP_STATS[stat]))
+
@@ -0,0 +1,556 @@
+"""Endpoint benchmark harness.
+
+Seeds users with a configurable amount of history, drives every API route
+through the DRF test client with real JWT authentication and records, per
+endpoint and history size, the query count, p50/p99 latency and peak Python
+memory. Query counts are the same on every machine, so only they are
+checked in (benchmark_baseline.json), and a count above its budget fails
+loudly. Latency and memory depend on the machine, so they are compared
+against an earlier run saved on the same one. Run it with
+``python manage.py benchmark``.
+"""
+import gzip
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import EagerJWTAuthentication
+from .models import (
+    ChangeSequence, PhysicalPainEntry, MentalWellnessEntry, DiaryEntry,
+    PhysicianInfo, Notification, DailySymptomRollup, SearchPosting
+)
+from .renderers import ColumnarJSONRenderer, MessagePackRenderer, msgpack
+from .rows import RowSerializer
+from .serializers import DiaryEntrySerializer, MentalWellnessEntrySerializer, PhysicalPainEntrySerializer
+from .tokens import blacklist_filter
+from .views import DataAnalysisView
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+DEFAULT_SIZES = (10, 10000, 100000)
+
+# How long a seeded history reaches back, whatever its size
+HISTORY_SPAN = timedelta(days=730)
+
+PASSWORD = 'Bench-mark-2024!'
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: str
+    # Called with (context, prepared) to build the request body
+    data: object = None
+    # Called with the context before each request, outside the measurement;
+    # its dict is used to format `path` and is passed on to `data`
+    setup: object = None
+    # Called with (context, prepared) to build extra request headers
+    headers: object = None
+
+
+@dataclass
+class BenchmarkContext:
+    user: User
+    client: APIClient = None
+    counter: int = 0
+    extra: dict = field(default_factory=dict)
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+    def pain_entry(self):
+        return PhysicalPainEntry.objects.create(user=self.user, pain_level=2, notes='benchmark')
+
+    def mental_entry(self):
+        return MentalWellnessEntry.objects.create(user=self.user, wellness_level=3, notes='benchmark')
+
+    def diary_entry(self):
+        return DiaryEntry.objects.create(user=self.user, content='benchmark')
+
+    def physician(self):
+        PhysicianInfo.objects.filter(user=self.user).delete()
+        return PhysicianInfo.objects.create(user=self.user, physician_name='Dr Bench', physician_email='bench@example.com')
+
+    def notification(self):
+        return Notification.objects.create(
+            user=self.user, notification_type='medication', title='Bench',
+            message='Take it', time='08:00', days='Mon,Wed,Fri'
+        )
+
+    def change_cursor(self):
+        return ChangeSequence.objects.get(user=self.user).value
+
+    def refresh_token(self):
+        return str(RefreshToken.for_user(self.user))
+
+    def etag(self, path):
+        return self.client.get(path)['ETag']
+
+
+# Suffix of the endpoints that revalidate a cached body with If-None-Match
+NOT_MODIFIED = ' (not modified)'
+
+
+def revalidate(name, path):
+    """The GET of `path` repeated with the ETag of its current response."""
+    return Endpoint(
+        name + NOT_MODIFIED, 'get', path,
+        setup=lambda ctx: {'etag': ctx.etag(path)},
+        headers=lambda ctx, prepared: {'HTTP_IF_NONE_MATCH': prepared['etag']}
+    )
+
+
+def entry_routes(prefix, factory, create_data, update_data, recent=True):
+    routes = [
+        Endpoint(f'{prefix} list', 'get', f'/api/{prefix}/'),
+        Endpoint(f'{prefix} create', 'post', f'/api/{prefix}/', data=lambda ctx, prepared: create_data),
+        Endpoint(f'{prefix} retrieve', 'get', f'/api/{prefix}/{{pk}}/', setup=lambda ctx: {'pk': factory(ctx).pk}),
+        Endpoint(
+            f'{prefix} update', 'patch', f'/api/{prefix}/{{pk}}/',
+            data=lambda ctx, prepared: update_data,
+            setup=lambda ctx: {'pk': factory(ctx).pk}
+        ),
+        Endpoint(f'{prefix} destroy', 'delete', f'/api/{prefix}/{{pk}}/', setup=lambda ctx: {'pk': factory(ctx).pk}),
+        Endpoint(
+            f'{prefix} batch', 'post', f'/api/{prefix}/batch/',
+            data=lambda ctx, prepared: [
+                dict(create_data, idempotency_key=f'bench-{prefix}-{ctx.next()}') for _ in range(10)
+            ]
+        ),
+        Endpoint(
+            f'{prefix} send_to_physician', 'post', f'/api/{prefix}/{{pk}}/send_to_physician/',
+            setup=lambda ctx: {'pk': factory(ctx).pk}
+        ),
+    ]
+    if recent:
+        routes.append(Endpoint(f'{prefix} recent', 'get', f'/api/{prefix}/recent/'))
+    return routes
+
+
+ENDPOINTS = [
+    Endpoint(
+        'auth register', 'post', '/api/auth/register/',
+        data=lambda ctx, prepared: {
+            'username': f'bench-register-{ctx.user.pk}-{ctx.next()}', 'password': PASSWORD, 'password2': PASSWORD,
+            'email': 'register@example.com', 'first_name': 'Bench', 'last_name': 'Mark',
+            'date_of_birth': '1990-01-01',
+        }
+    ),
+    Endpoint('auth login', 'post', '/api/auth/login/', data=lambda ctx, prepared: {'username': ctx.user.username, 'password': PASSWORD}),
+    Endpoint(
+        'auth refresh', 'post', '/api/auth/refresh/',
+        data=lambda ctx, prepared: {'refresh': prepared['refresh']},
+        setup=lambda ctx: {'refresh': ctx.refresh_token()}
+    ),
+    Endpoint(
+        'auth change-password', 'put', '/api/auth/change-password/',
+        data=lambda ctx, prepared: {'old_password': PASSWORD, 'new_password': PASSWORD, 'confirm_password': PASSWORD}
+    ),
+    Endpoint(
+        'auth logout', 'post', '/api/auth/logout/',
+        data=lambda ctx, prepared: {'refresh': prepared['refresh']},
+        setup=lambda ctx: {'refresh': ctx.refresh_token()}
+    ),
+    Endpoint('profile get', 'get', '/api/profile/'),
+    Endpoint('profile update', 'patch', '/api/profile/', data=lambda ctx, prepared: {'first_name': 'Bench', 'profile': {'phone_number': '555-0100'}}),
+    Endpoint('settings get', 'get', '/api/settings/'),
+    Endpoint('settings update', 'patch', '/api/settings/', data=lambda ctx, prepared: {'dark_mode': True}),
+    Endpoint('settings notifications get', 'get', '/api/settings/notifications/'),
+    Endpoint('settings notifications update', 'patch', '/api/settings/notifications/', data=lambda ctx, prepared: {'notification_enabled': True}),
+    Endpoint('settings health-app get', 'get', '/api/settings/health-app/'),
+    Endpoint('settings health-app update', 'patch', '/api/settings/health-app/', data=lambda ctx, prepared: {'health_app_sync': False}),
+    Endpoint('settings community get', 'get', '/api/settings/community/'),
+    Endpoint('settings community update', 'patch', '/api/settings/community/', data=lambda ctx, prepared: {'community_enabled': False}),
+    Endpoint('emergency-contact get', 'get', '/api/emergency-contact/'),
+    Endpoint('home-data get', 'get', '/api/home-data/'),
+    Endpoint('bootstrap get', 'get', '/api/bootstrap/'),
+    Endpoint('sync full', 'get', '/api/sync/'),
+    Endpoint('sync up to date', 'get', '/api/sync/?cursor={cursor}', setup=lambda ctx: {'cursor': ctx.change_cursor()}),
+    Endpoint(
+        'sync one change', 'get', '/api/sync/?cursor={cursor}',
+        setup=lambda ctx: {'cursor': ctx.pain_entry().change_seq - 1}
+    ),
+    *entry_routes('physical-pain', BenchmarkContext.pain_entry, {'pain_level': 2, 'notes': 'benchmark'}, {'pain_level': 3}),
+    *entry_routes('mental-wellness', BenchmarkContext.mental_entry, {'wellness_level': 3, 'notes': 'benchmark'}, {'wellness_level': 4}),
+    *entry_routes('diary', BenchmarkContext.diary_entry, {'content': 'benchmark'}, {'content': 'updated'}, recent=False),
+    Endpoint('physician-info list', 'get', '/api/physician-info/'),
+    Endpoint(
+        'physician-info create', 'post', '/api/physician-info/',
+        data=lambda ctx, prepared: {'physician_name': 'Dr Bench', 'physician_email': 'bench@example.com'}
+    ),
+    Endpoint('physician-info retrieve', 'get', '/api/physician-info/{pk}/', setup=lambda ctx: {'pk': ctx.physician().pk}),
+    Endpoint('notifications list', 'get', '/api/notifications/'),
+    Endpoint(
+        'notifications create', 'post', '/api/notifications/',
+        data=lambda ctx, prepared: {
+            'notification_type': 'medication', 'title': 'Bench', 'message': 'Take it',
+            'time': '08:00', 'days': 'Mon,Wed,Fri'
+        }
+    ),
+    Endpoint('notifications retrieve', 'get', '/api/notifications/{pk}/', setup=lambda ctx: {'pk': ctx.notification().pk}),
+    Endpoint(
+        'notifications update', 'patch', '/api/notifications/{pk}/',
+        data=lambda ctx, prepared: {'is_active': False},
+        setup=lambda ctx: {'pk': ctx.notification().pk}
+    ),
+    Endpoint('notifications destroy', 'delete', '/api/notifications/{pk}/', setup=lambda ctx: {'pk': ctx.notification().pk}),
+    Endpoint('export ndjson', 'get', '/api/export/'),
+    Endpoint('export csv gzip', 'get', '/api/export/?output=csv&gzip=1'),
+    Endpoint('data-analysis pain_trends', 'get', '/api/data-analysis/pain_trends/?days=365'),
+    Endpoint('data-analysis mental_wellness_trends', 'get', '/api/data-analysis/mental_wellness_trends/?days=365'),
+    Endpoint('data-analysis pain_trends columns', 'get', '/api/data-analysis/pain_trends/?days=365&format=columns'),
+    *([Endpoint('data-analysis pain_trends msgpack', 'get', '/api/data-analysis/pain_trends/?days=365&format=msgpack')] if msgpack else []),
+    Endpoint('data-analysis statistics', 'get', '/api/data-analysis/statistics/?days=365&max_lag=14'),
+    # 'note' is in every pain and mood note; '7' in one entry of each type
+    Endpoint('search common term', 'get', '/api/search/?q=note'),
+    Endpoint('search rare and common terms', 'get', '/api/search/?q=note+7'),
+    Endpoint('search rare term', 'get', '/api/search/?q=7'),
+    Endpoint('search two common terms', 'get', '/api/search/?q=pain+note'),
+    revalidate('profile get', '/api/profile/'),
+    revalidate('settings get', '/api/settings/'),
+    revalidate('home-data get', '/api/home-data/'),
+    revalidate('bootstrap get', '/api/bootstrap/'),
+    revalidate('notifications list', '/api/notifications/'),
+    revalidate('physical-pain recent', '/api/physical-pain/recent/'),
+    revalidate('mental-wellness recent', '/api/mental-wellness/recent/'),
+]
+
+
+@contextmanager
+def throwaway_database():
+    """Run the block against a freshly created test database."""
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_history(user, size, now=None):
+    """Give `user` `size` entries of each type spread evenly over HISTORY_SPAN."""
+    now = now or timezone.now()
+    step = HISTORY_SPAN / max(size, 1)
+    timestamps = [now - step * i for i in range(size)]
+    # Sync change numbers, which bulk_create would otherwise leave unset
+    first = ChangeSequence.allocate(user.pk, 3 * size) - 3 * size + 1
+
+    pain = PhysicalPainEntry.objects.bulk_create(
+        (PhysicalPainEntry(user=user, pain_level=i % 4 + 1, notes=f'Pain note {i}', timestamp=ts, change_seq=first + i)
+         for i, ts in enumerate(timestamps)),
+        batch_size=2000
+    )
+    mental = MentalWellnessEntry.objects.bulk_create(
+        (MentalWellnessEntry(user=user, wellness_level=i % 5 + 1, notes=f'Mood note {i}', timestamp=ts, change_seq=first + size + i)
+         for i, ts in enumerate(timestamps)),
+        batch_size=2000
+    )
+    diary = DiaryEntry.objects.bulk_create(
+        (DiaryEntry(user=user, content=f'Diary entry {i} about how the day went.', timestamp=ts, change_seq=first + 2 * size + i)
+         for i, ts in enumerate(timestamps)),
+        batch_size=2000
+    )
+
+    # bulk_create skips the signals that maintain derived tables
+    DailySymptomRollup.rebuild_for_entries(DailySymptomRollup.KIND_PAIN, pain)
+    DailySymptomRollup.rebuild_for_entries(DailySymptomRollup.KIND_MENTAL, mental)
+    SearchPosting.index_entries('pain', pain, replace=False)
+    SearchPosting.index_entries('mental', mental, replace=False)
+    SearchPosting.index_entries('diary', diary, replace=False)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def call(client, endpoint, ctx):
+    prepared = endpoint.setup(ctx) if endpoint.setup else {}
+    path = endpoint.path.format(**prepared)
+    data = endpoint.data(ctx, prepared) if endpoint.data else None
+    headers = endpoint.headers(ctx, prepared) if endpoint.headers else {}
+    method = getattr(client, endpoint.method)
+
+    def request():
+        response = method(path, data, format='json', **headers) if data is not None else method(path, **headers)
+        # Drain streamed bodies so their cost is part of the measurement
+        if response.streaming:
+            response.body_size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            response.body_size = len(response.content)
+        return response
+    return request
+
+
+def measure_endpoint(client, endpoint, ctx, iterations):
+    # Query count and peak memory from a single cold request
+    cache.clear()
+    request = call(client, endpoint, ctx)
+    # The blacklist filter is loaded once per process, keep that out of the count
+    blacklist_filter.sync()
+    reset_queries()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        response = request()
+    query_count = len(queries)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if response.status_code >= 400:
+        raise RuntimeError(f'{endpoint.name} returned {response.status_code}: {getattr(response, "data", response.status_code)!r}')
+
+    # Latency from repeated requests in steady state, without tracing overhead
+    timings = []
+    for _ in range(iterations):
+        request = call(client, endpoint, ctx)
+        started = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'queries': query_count,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': response.body_size,
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, iterations=20, endpoints=None, stdout=None):
+    """Return {size: {endpoint name: metrics}} for each history size."""
+    results = {}
+    for size in sizes:
+        user = User.objects.create_user(f'bench-{size}', password=PASSWORD, first_name='Bench')
+        seed_history(user, size)
+        PhysicianInfo.objects.create(user=user, physician_name='Dr Bench', physician_email='bench@example.com')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        ctx = BenchmarkContext(user=user, client=client)
+
+        results[str(size)] = {}
+        for endpoint in endpoints or ENDPOINTS:
+            metrics = measure_endpoint(client, endpoint, ctx, iterations)
+            results[str(size)][endpoint.name] = metrics
+            if stdout:
+                stdout.write(
+                    f"{size:>7} {endpoint.name:<40} {metrics['queries']:>4}q "
+                    f"p50 {metrics['p50_ms']:>8.2f}ms p99 {metrics['p99_ms']:>8.2f}ms "
+                    f"peak {metrics['peak_kb']:>9.1f}KB"
+                )
+        if stdout:
+            for line in conditional_savings(results[str(size)]):
+                stdout.write(f'{size:>7} {line}')
+    return results
+
+
+def conditional_savings(results):
+    """Describe the bytes and p50 latency a 304 saves over a full GET."""
+    lines = []
+    for name, metrics in results.items():
+        full = results.get(name.removesuffix(NOT_MODIFIED))
+        if not name.endswith(NOT_MODIFIED) or full is None:
+            continue
+        saved_bytes = full['bytes'] - metrics['bytes']
+        speedup = full['p50_ms'] / metrics['p50_ms'] if metrics['p50_ms'] else 0
+        lines.append(
+            f"{name.removesuffix(NOT_MODIFIED):<26} 304 saves {saved_bytes:>7}B of {full['bytes']:>7}B, "
+            f"p50 {full['p50_ms']:>8.2f}ms -> {metrics['p50_ms']:>8.2f}ms ({speedup:.1f}x)"
+        )
+    return lines
+
+
+def benchmark_authentication(iterations=2000):
+    """Time JWT authentication plus the settings and data version lookups
+    most views make. Both classes load the user from the database on every
+    request; EagerJWTAuthentication folds those lookups into that query.
+
+    Returns {authenticator name: {'us_per_request', 'queries_per_request'}}
+    for the stock simplejwt class and EagerJWTAuthentication.
+    """
+    user = User.objects.create_user('bench-auth', password=PASSWORD)
+    header = f'Bearer {RefreshToken.for_user(user).access_token}'
+    factory = APIRequestFactory()
+
+    results = {}
+    for authenticator in (JWTAuthentication(), EagerJWTAuthentication()):
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                request = Request(factory.get('/api/settings/', HTTP_AUTHORIZATION=header))
+                authenticated_user, _ = authenticator.authenticate(request)
+                authenticated_user.settings.dark_mode
+                ChangeSequence.for_user(authenticated_user)
+            elapsed = time.perf_counter() - started
+            query_count = len(queries)
+        results[type(authenticator).__name__] = {
+            'us_per_request': round(elapsed / iterations * 1e6, 1),
+            'queries_per_request': round(query_count / iterations, 3),
+        }
+    return results
+
+
+def benchmark_trend_encodings(windows=(30, 365, 3650), iterations=200, stat='mean'):
+    """Size and build-plus-render time of each trend payload encoding.
+
+    Uses synthetic daily rollups covering each window. Returns
+    {window: {encoding: {'bytes', 'gzip_bytes', 'us_per_render', 'renders_per_second'}}}.
+    """
+    encodings = [
+        ('chart json', JSONRenderer(), lambda rows: DataAnalysisView.trend_data(rows, 'Pain Level', DataAnalysisView.ROLLUP_STATS[stat])),
+        ('columns json', ColumnarJSONRenderer(), lambda rows: DataAnalysisView.trend_columns(rows, 'Pain Level', stat)),
+    ]
+    if msgpack:
+        encodings.append(
+            ('columns msgpack', MessagePackRenderer(), lambda rows: DataAnalysisView.trend_columns(rows, 'Pain Level', stat))
+        )
+
+    end = timezone.localdate()
+    results = {}
+    for window in windows:
+        # Seeded noise and about one day in three without entries, like real logs
+        rng = random.Random(window)
+        rows = []
+        for offset in range(window - 1, -1, -1):
+            if rng.random() < 0.3:
+                continue
+            levels = [rng.randint(1, 10) for _ in range(rng.randint(1, 3))]
+            rows.append({
+                'date': end - timedelta(days=offset), 'count': len(levels), 'min_value': min(levels),
+                'max_value': max(levels), 'total': sum(levels), 'last_value': levels[-1],
+            })
+        results[window] = {}
+        for name, renderer, build in encodings:
+            body = renderer.render(build(rows), renderer.media_type, {})
+            started = time.perf_counter()
+            for _ in range(iterations):
+                renderer.render(build(rows), renderer.media_type, {})
+            elapsed = (time.perf_counter() - started) / iterations
+            results[window][name] = {
+                'bytes': len(body),
+                'gzip_bytes': len(gzip.compress(body)),
+                'us_per_render': round(elapsed * 1e6, 1),
+                'renders_per_second': round(1 / elapsed),
+            }
+    return results
+
+
+def benchmark_row_serializers(sizes=(100, 1000, 10000), iterations=20):
+    """Rows per second of the ModelSerializer and RowSerializer read paths.
+
+    For each entry type and history size, 'serialize' times serializing
+    already fetched rows and 'total' times the query, serialization and
+    JSON rendering together. Returns
+    {size: {entry type: {path: {'serialize_rows_per_second', 'total_rows_per_second'}}}}.
+    """
+    sources = [
+        ('pain', PhysicalPainEntry, PhysicalPainEntrySerializer),
+        ('mental', MentalWellnessEntry, MentalWellnessEntrySerializer),
+        ('diary', DiaryEntry, DiaryEntrySerializer),
+    ]
+    renderer = JSONRenderer()
+
+    def rows_per_second(size, run):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        return round(size * iterations / (time.perf_counter() - started))
+
+    results = {}
+    for size in sizes:
+        user = User.objects.create_user(f'bench-rows-{size}', password=PASSWORD)
+        seed_history(user, size)
+        results[size] = {}
+        for kind, model, serializer_class in sources:
+            queryset = model.objects.filter(user=user).order_by('-timestamp', '-id')
+            rows = RowSerializer(serializer_class)
+            instances, values = list(queryset), list(rows.values(queryset))
+            results[size][kind] = {
+                'model serializer': {
+                    'serialize_rows_per_second': rows_per_second(size, lambda: serializer_class(instances, many=True).data),
+                    'total_rows_per_second': rows_per_second(
+                        size, lambda: renderer.render(serializer_class(queryset.all(), many=True).data)
+                    ),
+                },
+                'row serializer': {
+                    'serialize_rows_per_second': rows_per_second(size, lambda: rows.serialize(values)),
+                    'total_rows_per_second': rows_per_second(
+                        size, lambda: renderer.render(rows.serialize(rows.values(queryset)))
+                    ),
+                },
+            }
+    return results
+
+
+def compare(results, baseline, reference=None, latency_tolerance=0.5, memory_tolerance=0.5):
+    """List every endpoint that regressed.
+
+    Query counts must not grow past the baseline's {endpoint: queries}
+    budgets at all. When `reference` holds an earlier run's results from
+    the same machine, latency and peak memory may grow past it by the given
+    fraction, plus a small absolute allowance for timer noise.
+    """
+    regressions = []
+    for size, endpoints in results.items():
+        for name, metrics in endpoints.items():
+            label = f'[{size}] {name}'
+            budget = baseline.get(name)
+            if budget is not None and metrics['queries'] > budget:
+                regressions.append(f"{label}: {metrics['queries']} queries, budget {budget}")
+            expected = (reference or {}).get(size, {}).get(name)
+            if expected is None:
+                continue
+            for key in ('p50_ms', 'p99_ms'):
+                allowed = expected[key] * (1 + latency_tolerance) + 2
+                if metrics[key] > allowed:
+                    regressions.append(f'{label}: {key} {metrics[key]:.2f}, reference {expected[key]:.2f}')
+            allowed = expected['peak_kb'] * (1 + memory_tolerance) + 256
+            if metrics['peak_kb'] > allowed:
+                regressions.append(f"{label}: peak {metrics['peak_kb']:.1f}KB, reference {expected['peak_kb']:.1f}KB")
+    return regressions
+
+
+def load_results(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_results(results, path):
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+
+
+def load_baseline(path=BASELINE_PATH):
+    return load_results(path)
+
+
+def write_baseline(results, path=BASELINE_PATH):
+    """Check in the query count budgets of a run; they do not depend on the history size."""
+    budgets = {}
+    for endpoints in results.values():
+        for name, metrics in endpoints.items():
+            budgets[name] = max(budgets.get(name, 0), metrics['queries'])
+    save_results(budgets, path)
@@ -0,0 +1,6 @@
+def home_data_cache_key(user_id):
+    return f'home-data:{user_id}'
+
+
+def search_documents_cache_key(user_id):
+    return f'search-documents:{user_id}'
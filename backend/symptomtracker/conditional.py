@@ -0,0 +1,92 @@
+"""ETag / If-None-Match support for per-user read endpoints.
+
+The ETag is a hash of the user's data version (see ChangeSequence.for_user),
+the requested URL and the negotiated format, so it is known before the view
+runs. EagerJWTAuthentication loads the version with the user, so a matching
+If-None-Match is answered with 304 after the authentication query alone,
+without querying the entry tables or serializing anything. The version is
+kept on the request as `data_version` for views that key their own caches
+on it.
+
+The body must be read from the database the version came from, the
+primary: a lagging replica would pair the new version's ETag with old
+rows, and the client would keep them until the user's next write. The
+handler therefore runs inside routers.primary_reads(), where
+replica_reads() raises ImproperlyConfigured.
+"""
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import ChangeSequence
+from .routers import primary_reads
+
+
+def user_etag(request, *parts):
+    request.data_version = ChangeSequence.for_user(request.user)
+    key = '\n'.join(str(part) for part in (
+        # Versions are per-user counters, so two users can be at the same one
+        request.user.pk,
+        request.data_version,
+        request.build_absolute_uri(),
+        request.accepted_renderer.format,
+        *parts,
+    ))
+    return '"%s"' % hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def matches(etag, if_none_match):
+    # If-None-Match uses the weak comparison
+    tags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+    return '*' in tags or etag in tags
+
+
+def conditional_get(extra=None):
+    """Decorate a view's GET handler, sync or async, to send an ETag and
+    honour If-None-Match.
+
+    `extra(request)` returns further values the response depends on besides
+    the user's rows, such as the current date. The handler reads from the
+    primary and must not use replica_reads().
+    """
+    def decorator(handler):
+        def check(request):
+            etag = user_etag(request, *(extra(request) if extra else ()))
+            if matches(etag, request.headers.get('If-None-Match', '')):
+                return etag, Response(status=status.HTTP_304_NOT_MODIFIED)
+            return etag, None
+
+        def finish(response, etag):
+            if response.status_code not in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+                return response
+            response['ETag'] = etag
+            # Clients may keep the body but must revalidate before using it
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+
+        if iscoroutinefunction(handler):
+            @wraps(handler)
+            async def wrapper(view, request, *args, **kwargs):
+                # The version lookup is a sync ORM query
+                etag, response = await sync_to_async(check)(request)
+                if response is None:
+                    with primary_reads():
+                        response = await handler(view, request, *args, **kwargs)
+                return finish(response, etag)
+        else:
+            @wraps(handler)
+            def wrapper(view, request, *args, **kwargs):
+                etag, response = check(request)
+                if response is None:
+                    with primary_reads():
+                        response = handler(view, request, *args, **kwargs)
+                return finish(response, etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,17 @@
+"""SQLite connection tuning.
+
+Each new SQLite connection runs the PRAGMAs in settings.SQLITE_PRAGMAS
+before it is used. Other database vendors are left alone.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Run on the raw connection so the PRAGMAs never show up in query logs or counts
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}').fetchall()
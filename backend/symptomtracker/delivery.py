@@ -0,0 +1,207 @@
+"""Outbox-backed delivery of entries to the user's physician.
+
+The send_to_physician actions only enqueue a PhysicianOutbox row. The
+``deliver_physician_outbox`` worker later claims due rows in batches,
+groups them per user into one digest email to their physician and retries
+failures with exponential backoff. Emails are sent between transactions,
+never inside one.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChangeSequence, PhysicalPainEntry, MentalWellnessEntry, DiaryEntry, PhysicianInfo, PhysicianOutbox
+
+logger = logging.getLogger(__name__)
+
+ENTRY_MODELS = {
+    'pain': PhysicalPainEntry,
+    'mental': MentalWellnessEntry,
+    'diary': DiaryEntry,
+}
+
+
+class NoPhysicianError(Exception):
+    pass
+
+
+def enqueue_for_physician(entry, entry_type):
+    """Queue `entry` for the next digest.
+
+    Queuing it again while it is still pending, or while its digest is
+    being sent, is a no-op that returns the queued row; the
+    outbox_one_queued_per_entry constraint settles concurrent calls.
+    """
+    if not PhysicianInfo.objects.filter(user_id=entry.user_id).exists():
+        raise NoPhysicianError('No physician information on file.')
+    queued = PhysicianOutbox.objects.filter(entry_type=entry_type, entry_id=entry.pk, status__in=['pending', 'sending'])
+    row = queued.first()
+    if row is None:
+        try:
+            with transaction.atomic():
+                row = PhysicianOutbox.objects.create(user_id=entry.user_id, entry_type=entry_type, entry_id=entry.pk)
+        except IntegrityError:
+            # Another request queued it first. Its row may even have been
+            # sent since, which delivers this entry all the same.
+            row = queued.first()
+    return row
+
+
+def describe_entry(entry_type, entry):
+    when = timezone.localtime(entry.timestamp).strftime('%Y-%m-%d %H:%M')
+    if entry_type == 'pain':
+        line = f'{when}  Pain: {entry.get_pain_level_display()}'
+    elif entry_type == 'mental':
+        line = f'{when}  Mental wellness: {entry.wellness_level}/5'
+    else:
+        return f'{when}  Diary:\n{entry.content}'
+    return f'{line}\n  Notes: {entry.notes}' if entry.notes else line
+
+
+def build_digest(physician, rows, entries):
+    patient = physician.user.get_full_name() or physician.user.username
+    sections = [
+        describe_entry(row.entry_type, entries[row.entry_type, row.entry_id])
+        for row in sorted(rows, key=lambda row: entries[row.entry_type, row.entry_id].timestamp)
+    ]
+    body = (
+        f'Dear {physician.physician_name},\n\n'
+        f'{patient} has shared the following symptom log entries with you:\n\n'
+        + '\n\n'.join(sections)
+        + '\n'
+    )
+    return EmailMessage(
+        subject=f'Symptom update from {patient}',
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[physician.physician_email]
+    )
+
+
+def backoff(attempts):
+    seconds = settings.PHYSICIAN_DELIVERY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.PHYSICIAN_DELIVERY_MAX_BACKOFF_SECONDS))
+
+
+def claim_due(batch_size, now):
+    """Claim up to `batch_size` due outbox rows in one short transaction.
+
+    Claimed rows are marked 'sending' with a lease of
+    PHYSICIAN_DELIVERY_CLAIM_SECONDS: other workers skip them while the
+    emails go out, and take them over should this worker die first. Rows
+    whose entry or physician is gone are cancelled. Returns a list of
+    (user id, physician, rows, {(entry type, id): entry}) digests.
+    """
+    with transaction.atomic():
+        rows = list(
+            PhysicianOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not rows:
+            return []
+
+        by_user = defaultdict(list)
+        for row in rows:
+            by_user[row.user_id].append(row)
+
+        physicians = {
+            physician.user_id: physician
+            for physician in PhysicianInfo.objects.select_related('user').filter(user_id__in=by_user)
+        }
+
+        # One query per entry type for the whole batch
+        entries = {}
+        ids_by_type = defaultdict(list)
+        for row in rows:
+            ids_by_type[row.entry_type].append(row.entry_id)
+        for entry_type, ids in ids_by_type.items():
+            for entry in ENTRY_MODELS[entry_type].objects.filter(pk__in=ids):
+                entries[entry_type, entry.pk] = entry
+
+        digests = []
+        claimed, dropped = [], []
+        for user_id, user_rows in sorted(by_user.items()):
+            physician = physicians.get(user_id)
+            # Entries deleted since they were queued, or no physician left to send to
+            live_rows = [row for row in user_rows if physician and (row.entry_type, row.entry_id) in entries]
+            dropped += [row.pk for row in user_rows if row not in live_rows]
+            if live_rows:
+                claimed += [row.pk for row in live_rows]
+                digests.append((user_id, physician, live_rows, entries))
+
+        if dropped:
+            PhysicianOutbox.objects.filter(pk__in=dropped).update(status='cancelled')
+        PhysicianOutbox.objects.filter(pk__in=claimed).update(
+            status='sending', next_attempt_at=now + timedelta(seconds=settings.PHYSICIAN_DELIVERY_CLAIM_SECONDS)
+        )
+    return digests
+
+
+def record_sent(user_id, rows, entries, now):
+    pks = [row.pk for row in rows]
+    PhysicianOutbox.objects.filter(pk__in=pks).update(status='sent', sent_at=now, attempts=F('attempts') + 1)
+    # Renumbered for sync, since bulk_update skips save()
+    sent_entries = {(row.entry_type, row.entry_id): entries[row.entry_type, row.entry_id] for row in rows}
+    last = ChangeSequence.allocate(user_id, len(sent_entries))
+    for offset, ((entry_type, _), entry) in enumerate(sorted(sent_entries.items()), start=last - len(sent_entries) + 1):
+        entry.sent_to_physician = True
+        entry.change_seq = offset
+    for entry_type in {entry_type for entry_type, _ in sent_entries}:
+        ENTRY_MODELS[entry_type].objects.bulk_update(
+            [entry for (kind, _), entry in sent_entries.items() if kind == entry_type],
+            ['sent_to_physician', 'change_seq']
+        )
+
+
+def record_failed(rows, error, now):
+    # The digest is retried as a unit, so its rows share one attempt count
+    attempts = max(row.attempts for row in rows) + 1
+    given_up = attempts >= settings.PHYSICIAN_DELIVERY_MAX_ATTEMPTS
+    PhysicianOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+        attempts=attempts,
+        status='failed' if given_up else 'pending',
+        next_attempt_at=now + backoff(attempts),
+        last_error=str(error)
+    )
+
+
+def deliver_pending(batch_size=100, now=None, connection=None):
+    """Send one digest per user for up to `batch_size` due outbox rows.
+
+    Returns (digests sent, digests failed). Rows are claimed, and the claim
+    committed, before any email is sent, and the results are recorded in a
+    second transaction afterwards. No database lock is held across the
+    round trips to the mail server, and several workers can run at once.
+    """
+    now = now or timezone.now()
+    digests = claim_due(batch_size, now)
+    if not digests:
+        return 0, 0
+
+    connection = connection or get_connection()
+    results = []
+    for user_id, physician, rows, entries in digests:
+        try:
+            connection.send_messages([build_digest(physician, rows, entries)])
+        except Exception as exc:
+            logger.warning('Physician digest for user %s failed: %s', user_id, exc)
+            results.append((user_id, rows, entries, exc))
+        else:
+            results.append((user_id, rows, entries, None))
+
+    with transaction.atomic():
+        # Users in order, so concurrent workers lock their change counters alike
+        for user_id, rows, entries, error in results:
+            if error is None:
+                record_sent(user_id, rows, entries, now)
+            else:
+                record_failed(rows, error, now)
+    sent = sum(error is None for *_, error in results)
+    return sent, len(results) - sent
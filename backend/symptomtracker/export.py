@@ -0,0 +1,127 @@
+"""Streaming export of a user's full symptom history.
+
+The pain, mental wellness and diary tables, and the user's archived
+entries of each type, are read with server-side iterators and merged by
+timestamp, so only one chunk per stream is held in memory at a time whatever
+the size of the history. Under ASGI the chunks are handed over through
+aiter_chunks(), so they are still sent as they are produced.
+"""
+import csv
+import heapq
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .archive import iter_archived
+from .models import PhysicalPainEntry, MentalWellnessEntry, DiaryEntry
+
+# (type label, model, numeric value field, free-text field)
+EXPORT_SOURCES = [
+    ('pain', PhysicalPainEntry, 'pain_level', 'notes'),
+    ('mental', MentalWellnessEntry, 'wellness_level', 'notes'),
+    ('diary', DiaryEntry, None, 'content'),
+]
+
+EXPORT_COLUMNS = ['type', 'id', 'timestamp', 'value', 'text', 'sent_to_physician']
+
+# Encoded output is buffered up to this many bytes before being yielded
+FLUSH_BYTES = 64 * 1024
+
+
+def iter_source(user, kind, model, value_field, text_field, using=None):
+    fields = ['timestamp', 'id', text_field, 'sent_to_physician']
+    if value_field:
+        fields.append(value_field)
+    rows = model.objects.using(using).filter(user=user).order_by('timestamp', 'id').values_list(*fields)
+    for row in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        timestamp, pk, text, sent = row[:4]
+        yield timestamp, pk, kind, (row[4] if value_field else None), text, sent
+
+
+def iter_history(user, using=None):
+    """Yield (timestamp, id, type, value, text, sent_to_physician) oldest first.
+
+    `using` picks the database alias to read from; None leaves it to the routers.
+    """
+    streams = [iter_source(user, *source, using=using) for source in EXPORT_SOURCES]
+    streams += [iter_archived(user, kind, using=using) for kind, _, _, _ in EXPORT_SOURCES]
+    return heapq.merge(*streams, key=lambda row: row[0])
+
+
+def format_timestamp(value):
+    # Same representation DRF uses for the entry serializers
+    return value.isoformat().replace('+00:00', 'Z')
+
+
+class Echo:
+    """File-like object whose write() hands the encoded line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for timestamp, pk, kind, value, text, sent in rows:
+        yield writer.writerow([kind, pk, format_timestamp(timestamp), '' if value is None else value, text or '', sent])
+
+
+def ndjson_lines(rows):
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for timestamp, pk, kind, value, text, sent in rows:
+        yield encoder.encode({
+            'type': kind,
+            'id': pk,
+            'timestamp': format_timestamp(timestamp),
+            'value': value,
+            'text': text,
+            'sent_to_physician': sent,
+        }) + '\n'
+
+
+ENCODERS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
+
+
+def encode_stream(lines, compress=False):
+    """Turn text lines into reasonably sized byte chunks, gzipped if asked."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(chunks):
+    """Async iterator over the sync iterator `chunks`, one thread hop per chunk.
+
+    StreamingHttpResponse collects a sync iterator in full before an ASGI
+    server sends any of it. The hops are thread sensitive, so the export's
+    server-side cursors stay on the connection of the thread that opened them.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,137 @@
+"""WSGI versus ASGI load test of the read-heavy endpoints under uvicorn.
+
+A throwaway SQLite database is seeded with users and history, then one
+uvicorn process per server configuration serves it while a keep-alive
+asyncio client drives each endpoint with a fixed number of concurrent
+connections. Reports requests per second and p50/p99 latency. Run it with
+``python manage.py load_test``.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .benchmark import percentile, seed_history
+from .stress import create_database, tuned_config
+
+# (label, ASGI/WSGI application, extra uvicorn arguments, ASYNC_READ_VIEWS)
+SERVERS = [
+    ('wsgi', 'backend.wsgi:application', ['--interface', 'wsgi'], '0'),
+    ('asgi, sync views', 'backend.asgi:application', [], '0'),
+    ('asgi, async views', 'backend.asgi:application', [], '1'),
+]
+
+ENDPOINTS = [
+    '/api/home-data/',
+    '/api/physical-pain/recent/',
+    '/api/data-analysis/pain_trends/?days=365',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_database(path, users, size):
+    """Migrate a fresh database at `path`, give `users` users history and return their tokens."""
+    tokens = create_database(path, tuned_config())[:users]
+    for user in User.objects.filter(username__startswith='stress-').order_by('pk')[:users]:
+        seed_history(user, size)
+    return tokens
+
+
+def start_server(app, arguments, async_views, db_name, port):
+    env = dict(os.environ, DB_NAME=str(db_name), ASYNC_READ_VIEWS=async_views)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--port', str(port), '--log-level', 'warning', '--no-access-log', *arguments],
+        cwd=settings.BASE_DIR, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'uvicorn exited with status {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('uvicorn did not start listening within 60 seconds')
+
+
+async def fetch(reader, writer, request):
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def drive(port, path, tokens, concurrency, duration):
+    loop = asyncio.get_running_loop()
+    timings = []
+    errors = 0
+
+    async def connection(token):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        request = f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n\r\n'.encode()
+        # One untimed request per connection warms the caches
+        await fetch(reader, writer, request)
+        await barrier.wait()
+        deadline = loop.time() + duration
+        while loop.time() < deadline:
+            started = time.perf_counter()
+            status = await fetch(reader, writer, request)
+            timings.append(time.perf_counter() - started)
+            errors += status != 200
+        writer.close()
+
+    barrier = asyncio.Barrier(concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(connection(tokens[i % len(tokens)]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(timings),
+        'per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(statistics.median(timings) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'errors': errors,
+    }
+
+
+def run_load_test(db_name, tokens, concurrency=32, duration=5, servers=SERVERS, endpoints=ENDPOINTS, stdout=None):
+    """Return {server label: {endpoint: metrics}}."""
+    results = {}
+    for label, app, arguments, async_views in servers:
+        port = free_port()
+        process = start_server(app, arguments, async_views, db_name, port)
+        try:
+            results[label] = {}
+            for path in endpoints:
+                metrics = asyncio.run(drive(port, path, tokens, concurrency, duration))
+                results[label][path] = metrics
+                if stdout:
+                    stdout.write(
+                        f"{label:<18} {path:<42} {metrics['per_second']:>8.1f} req/s "
+                        f"p50 {metrics['p50_ms']:>7.2f}ms p99 {metrics['p99_ms']:>7.2f}ms errors {metrics['errors']}"
+                    )
+        finally:
+            process.terminate()
+            process.wait()
+    return results
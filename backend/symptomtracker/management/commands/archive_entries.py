@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from symptomtracker.archive import ARCHIVE_SOURCES, archive_entries
+
+
+class Command(BaseCommand):
+    help = (
+        "Move pain, mental wellness and diary entries older than ARCHIVE_AFTER_DAYS into the "
+        "compressed archive table in bounded batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help='Archive entries older than this many days'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE, help='Entries moved per transaction'
+        )
+        parser.add_argument('--codec', default=settings.ARCHIVE_CODEC, help='zlib, or zstd when zstandard is installed')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+        parser.add_argument('--type', action='append', choices=list(ARCHIVE_SOURCES), help='Only archive this entry type')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        totals = archive_entries(
+            cutoff, batch_size=options['batch_size'], codec=options['codec'], pause=options['pause'],
+            entry_types=options['type'], stdout=self.stdout
+        )
+        for entry_type, total in totals.items():
+            self.stdout.write(
+                f"{entry_type}: {total['entries']} entries archived, "
+                f"text {total['text_bytes']} bytes stored in {total['stored_bytes']}"
+            )
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from symptomtracker.benchmark import (
+    BASELINE_PATH, DEFAULT_SIZES, ENDPOINTS, compare, load_baseline, load_results, run_benchmark,
+    save_results, throwaway_database, write_baseline
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway users with history, drive every API endpoint and report query counts, "
+        "p50/p99 latency and peak memory. Fails if an endpoint exceeds its query budget in the "
+        "baseline, or, given --reference, regresses in latency or memory past an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+            help='Comma-separated history sizes (entries per type) to seed, e.g. 10,10000,100000'
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--endpoint', action='append', help='Only run endpoints whose name contains this text')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Query budget JSON to compare against')
+        parser.add_argument(
+            '--write-baseline', action='store_true',
+            help="Overwrite the query budgets with this run's counts; only when a change means to move them"
+        )
+        parser.add_argument('--save', help='Write the full results of this run to this JSON file')
+        parser.add_argument('--reference', help='Full results saved by --save on this machine to compare latency and memory against')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5, help='Allowed fractional p50/p99 growth')
+        parser.add_argument('--memory-tolerance', type=float, default=0.5, help='Allowed fractional peak memory growth')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        endpoints = ENDPOINTS
+        if options['endpoint']:
+            endpoints = [e for e in ENDPOINTS if any(part in e.name for part in options['endpoint'])]
+            if not endpoints:
+                raise CommandError('No endpoints match the given --endpoint filters.')
+
+        # Run against a fresh test database so the real one is never touched
+        with throwaway_database():
+            results = run_benchmark(sizes, options['iterations'], endpoints, stdout=self.stdout)
+
+        if options['save']:
+            save_results(results, options['save'])
+            self.stdout.write(f"Results written to {options['save']}")
+        if options['write_baseline']:
+            write_baseline(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        regressions = compare(
+            results,
+            load_baseline(options['baseline']),
+            reference=load_results(options['reference']) if options['reference'] else None,
+            latency_tolerance=options['latency_tolerance'],
+            memory_tolerance=options['memory_tolerance'],
+        )
+        if regressions:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
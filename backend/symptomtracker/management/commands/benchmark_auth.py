@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from symptomtracker.benchmark import benchmark_authentication, throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stock JWT authentication with EagerJWTAuthentication per request. "
+        "Both load the user on every request; the eager class joins the settings and data version into that query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Authenticated requests per class')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            results = benchmark_authentication(options['iterations'])
+
+        for name, metrics in results.items():
+            self.stdout.write(
+                f"{name:<26} {metrics['us_per_request']:>8.1f}us/request "
+                f"{metrics['queries_per_request']:>6.3f} queries/request"
+            )
+        stock, eager = results['JWTAuthentication'], results['EagerJWTAuthentication']
+        self.stdout.write(
+            f"Joined user query vs stock lookups: {stock['us_per_request'] / eager['us_per_request']:.2f}x faster, "
+            f"{stock['queries_per_request'] - eager['queries_per_request']:.3f} fewer queries/request"
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from symptomtracker.benchmark import benchmark_row_serializers, throwaway_database
+
+
+class Command(BaseCommand):
+    help = "Compare rows per second of the ModelSerializer and .values() RowSerializer read paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated entries per type to seed')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed runs per path, type and size')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        with throwaway_database():
+            results = benchmark_row_serializers(sizes, options['iterations'])
+
+        for size, kinds in results.items():
+            for kind, paths in kinds.items():
+                model, row = paths['model serializer'], paths['row serializer']
+                self.stdout.write(
+                    f"{size:>6} {kind:<7} serialize {model['serialize_rows_per_second']:>8} -> "
+                    f"{row['serialize_rows_per_second']:>8} rows/s "
+                    f"({row['serialize_rows_per_second'] / model['serialize_rows_per_second']:.1f}x), "
+                    f"query+serialize+render {model['total_rows_per_second']:>8} -> "
+                    f"{row['total_rows_per_second']:>8} rows/s "
+                    f"({row['total_rows_per_second'] / model['total_rows_per_second']:.1f}x)"
+                )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from symptomtracker.benchmark import benchmark_trend_encodings
+
+
+class Command(BaseCommand):
+    help = "Compare the size and render throughput of the chart, columnar JSON and msgpack trend payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--windows', default='30,365,3650', help='Comma-separated trend lengths in days')
+        parser.add_argument('--iterations', type=int, default=200, help='Renders per encoding and window')
+        parser.add_argument('--stat', default='mean', help='Per-day statistic to encode')
+
+    def handle(self, *args, **options):
+        windows = [int(window) for window in options['windows'].split(',') if window]
+        results = benchmark_trend_encodings(windows, options['iterations'], options['stat'])
+
+        for window, encodings in results.items():
+            chart = encodings['chart json']
+            for name, metrics in encodings.items():
+                self.stdout.write(
+                    f"{window:>5}d {name:<16} {metrics['bytes']:>8}B ({metrics['bytes'] / chart['bytes']:>4.0%}) "
+                    f"gzip {metrics['gzip_bytes']:>7}B ({metrics['gzip_bytes'] / chart['gzip_bytes']:>4.0%}) "
+                    f"{metrics['us_per_render']:>8.1f}us {metrics['renders_per_second']:>7}/s"
+                )
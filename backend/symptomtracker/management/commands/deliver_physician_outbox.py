@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from symptomtracker.delivery import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued send-to-physician entries as one digest email per patient, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Outbox rows claimed per round')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain what is due now and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_pending(batch_size=options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} digest(s), {failed} failed')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
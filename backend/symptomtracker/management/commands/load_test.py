@@ -0,0 +1,37 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from symptomtracker.loadtest import ENDPOINTS, SERVERS, run_load_test, seed_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a seeded throwaway database with uvicorn as WSGI, as ASGI with the sync views and as "
+        "ASGI with the async views, drive the read-heavy endpoints and report throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent keep-alive connections')
+        parser.add_argument('--duration', type=float, default=5, help='Seconds each endpoint is driven for')
+        parser.add_argument('--users', type=int, default=16, help='Users the connections are spread over')
+        parser.add_argument('--size', type=int, default=1000, help='History entries per type for each user')
+        parser.add_argument('--endpoint', action='append', help='Only run endpoints containing this text')
+
+    def handle(self, *args, **options):
+        endpoints = [path for path in ENDPOINTS if not options['endpoint'] or any(part in path for part in options['endpoint'])]
+        name, saved_options = connection.settings_dict['NAME'], connection.settings_dict['OPTIONS']
+        # The servers read a fresh file, so the real database is never touched
+        with tempfile.TemporaryDirectory() as directory:
+            db_name = Path(directory) / 'load.sqlite3'
+            try:
+                tokens = seed_database(db_name, options['users'], options['size'])
+            finally:
+                connection.close()
+                connection.settings_dict['NAME'], connection.settings_dict['OPTIONS'] = name, saved_options
+            run_load_test(
+                db_name, tokens, options['concurrency'], options['duration'],
+                servers=SERVERS, endpoints=endpoints, stdout=self.stdout
+            )
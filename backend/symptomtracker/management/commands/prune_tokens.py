@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from symptomtracker.tokens import prune_expired_tokens, table_sizes
+
+
+class Command(BaseCommand):
+    help = "Delete expired refresh tokens and their blacklist entries in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Outstanding tokens deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+        parser.add_argument('--interval', type=float, default=None, help='Keep running, pruning every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            outstanding, blacklisted = prune_expired_tokens(batch_size=options['batch_size'], pause=options['pause'])
+            sizes = table_sizes()
+            self.stdout.write(
+                f"Pruned {outstanding} outstanding and {blacklisted} blacklisted token(s); "
+                f"{sizes['outstanding']} outstanding and {sizes['blacklisted']} blacklisted remain"
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from symptomtracker.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS in bounded batches. "
+        "Clients with an older cursor are sent back to a full sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Delete tombstones older than this many days'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tombstones deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        pruned = 0
+        while True:
+            count = Tombstone.prune_batch(cutoff, batch_size=options['batch_size'])
+            if not count:
+                break
+            pruned += count
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f"Pruned {pruned} tombstone(s); {Tombstone.objects.count()} remain")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from symptomtracker.reminders import fire_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Fire due notification reminders in batches. Safe to run in several processes at once."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Reminders claimed per round')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds to sleep when nothing is due')
+        parser.add_argument('--once', action='store_true', help='Fire what is due now and exit')
+        parser.add_argument(
+            '--now',
+            help='ISO 8601 timestamp to use as the current time (implies --once); for deterministic runs'
+        )
+
+    def handle(self, *args, **options):
+        now = None
+        if options['now']:
+            now = parse_datetime(options['now'])
+            if now is None or now.tzinfo is None:
+                raise CommandError('--now must be an ISO 8601 timestamp with a time zone offset.')
+
+        while True:
+            fired = fire_due_reminders(now=now, batch_size=options['batch_size'])
+            if fired:
+                self.stdout.write(f'Fired {fired} reminder(s)')
+                continue
+            if options['once'] or now is not None:
+                return
+            time.sleep(options['interval'])
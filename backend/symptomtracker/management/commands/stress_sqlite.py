@@ -0,0 +1,49 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from symptomtracker.stress import DEFAULT_CONFIG, run_config, tuned_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writer and reader processes against a throwaway SQLite database, first with "
+        "the stock settings and then with SQLITE_PRAGMAS and WAL, and report throughput and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Processes creating entries')
+        parser.add_argument('--readers', type=int, default=4, help='Processes listing entries')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per process')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The stress test only applies to SQLite databases.')
+
+        configs = [('default', DEFAULT_CONFIG), ('tuned', tuned_config())]
+        name, saved_options = connection.settings_dict['NAME'], connection.settings_dict['OPTIONS']
+        # Each configuration gets its own fresh file, so the real database is never touched
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                for label, config in configs:
+                    summary = run_config(
+                        Path(directory) / f'{label}.sqlite3', config,
+                        options['writers'], options['readers'], options['requests']
+                    )
+                    self.report(label, config, summary)
+            finally:
+                connection.close()
+                connection.settings_dict['NAME'], connection.settings_dict['OPTIONS'] = name, saved_options
+
+    def report(self, label, config, summary):
+        pragmas = ', '.join(f'{key}={value}' for key, value in config['pragmas'].items()) or 'none'
+        self.stdout.write(f"{label}: PRAGMAs {pragmas}; {config['options'] or 'deferred transactions'} ({summary['seconds']}s)")
+        for role in ('writer', 'reader'):
+            metrics = summary[role]
+            self.stdout.write(
+                f"  {role + 's':<8} {metrics['ok']:>6} ok {metrics['per_second']:>8.1f}/s "
+                f"locked {metrics['locked']:>5} failed {metrics['failed']:>4} "
+                f"p50 {metrics['p50_ms']}ms p99 {metrics['p99_ms']}ms"
+            )
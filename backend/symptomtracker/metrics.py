@@ -0,0 +1,29 @@
+"""In-process timing metrics for the admin metrics endpoints."""
+import threading
+from collections import deque
+
+
+class LatencyRecorder:
+    """Keeps the last `window` durations for percentile reporting."""
+
+    def __init__(self, window):
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.total += 1
+
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            total = self.total
+        if not samples:
+            return {'count': total, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+
+        def percentile(pct):
+            return round(samples[min(len(samples) - 1, int(len(samples) * pct / 100))] * 1000, 3)
+
+        return {'count': total, 'p50_ms': percentile(50), 'p99_ms': percentile(99), 'max_ms': round(samples[-1] * 1000, 3)}
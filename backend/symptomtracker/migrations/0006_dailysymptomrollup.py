@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    DailySymptomRollup = apps.get_model("symptomtracker", "DailySymptomRollup")
+    sources = [
+        ("pain", apps.get_model("symptomtracker", "PhysicalPainEntry"), "pain_level"),
+        (
+            "mental",
+            apps.get_model("symptomtracker", "MentalWellnessEntry"),
+            "wellness_level",
+        ),
+    ]
+    tz = timezone.get_default_timezone()
+
+    for kind, model, field in sources:
+        # Rows come in (user, time) order, so a day is complete once the next
+        # one starts and only a batch of rollups is held in memory
+        pending = []
+        rollup = None
+        rows = model.objects.order_by("user_id", "timestamp", "id").values_list(
+            "user_id", "timestamp", field
+        )
+        for user_id, timestamp, value in rows.iterator(chunk_size=2000):
+            date = timezone.localtime(timestamp, tz).date()
+            if rollup is not None and (rollup.user_id, rollup.date) == (user_id, date):
+                rollup.count += 1
+                rollup.min_value = min(rollup.min_value, value)
+                rollup.max_value = max(rollup.max_value, value)
+                rollup.total += value
+                rollup.last_value = value
+                rollup.last_timestamp = timestamp
+                continue
+            if rollup is not None:
+                pending.append(rollup)
+                if len(pending) >= BACKFILL_BATCH_SIZE:
+                    DailySymptomRollup.objects.bulk_create(pending)
+                    pending = []
+            rollup = DailySymptomRollup(
+                user_id=user_id,
+                kind=kind,
+                date=date,
+                count=1,
+                min_value=value,
+                max_value=value,
+                total=value,
+                last_value=value,
+                last_timestamp=timestamp,
+            )
+        if rollup is not None:
+            pending.append(rollup)
+        DailySymptomRollup.objects.bulk_create(pending)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0005_userprofile_reddit_username_diaryentry_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySymptomRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("pain", "Physical Pain"),
+                            ("mental", "Mental Wellness"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("min_value", models.IntegerField()),
+                ("max_value", models.IntegerField()),
+                (
+                    "total",
+                    models.IntegerField(
+                        help_text="Sum of the day's values, used to derive the mean"
+                    ),
+                ),
+                ("last_value", models.IntegerField()),
+                ("last_timestamp", models.DateTimeField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "kind", "date"), name="unique_daily_rollup"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
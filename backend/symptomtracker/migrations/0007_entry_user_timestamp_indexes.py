@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0006_dailysymptomrollup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="diaryentry",
+            index=models.Index(
+                fields=["user", "-timestamp"], name="diary_user_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mentalwellnessentry",
+            index=models.Index(
+                fields=["user", "-timestamp"], name="mental_user_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="physicalpainentry",
+            index=models.Index(
+                fields=["user", "-timestamp"], name="pain_user_timestamp_idx"
+            ),
+        ),
+    ]
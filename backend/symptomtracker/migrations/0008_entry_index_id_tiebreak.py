@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0007_entry_user_timestamp_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="diaryentry",
+            name="diary_user_timestamp_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="mentalwellnessentry",
+            name="mental_user_timestamp_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="physicalpainentry",
+            name="pain_user_timestamp_idx",
+        ),
+        migrations.AddIndex(
+            model_name="diaryentry",
+            index=models.Index(
+                fields=["user", "-timestamp", "-id"], name="diary_user_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mentalwellnessentry",
+            index=models.Index(
+                fields=["user", "-timestamp", "-id"], name="mental_user_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="physicalpainentry",
+            index=models.Index(
+                fields=["user", "-timestamp", "-id"], name="pain_user_timestamp_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0008_entry_index_id_tiebreak"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="diaryentry",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Client-generated key that makes batch uploads safe to replay",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="mentalwellnessentry",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Client-generated key that makes batch uploads safe to replay",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="physicalpainentry",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Client-generated key that makes batch uploads safe to replay",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="diaryentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "idempotency_key"), name="diary_unique_idempotency_key"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="mentalwellnessentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "idempotency_key"), name="mental_unique_idempotency_key"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="physicalpainentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "idempotency_key"), name="pain_unique_idempotency_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from symptomtracker.schedule import next_fire_time
+
+
+def schedule_existing_reminders(apps, schema_editor):
+    Notification = apps.get_model("symptomtracker", "Notification")
+    now = timezone.now()
+    reminders = list(Notification.objects.filter(is_active=True))
+    for reminder in reminders:
+        reminder.next_fire_at = next_fire_time(reminder.time, reminder.days, now)
+    Notification.objects.bulk_update(reminders, ["next_fire_at"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0010_physicianoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="last_fired_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="next_fire_at",
+            field=models.DateTimeField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(schedule_existing_reminders, migrations.RunPython.noop),
+    ]
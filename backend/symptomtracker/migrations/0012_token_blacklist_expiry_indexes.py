@@ -0,0 +1,25 @@
+# simplejwt's token tables have no index on expires_at or blacklisted_at,
+# which the prune command and the blacklist filter's delta sync filter on.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0011_notification_next_fire_at"),
+        ("token_blacklist", "0013_alter_blacklistedtoken_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS token_outstanding_expires_idx "
+            "ON token_blacklist_outstandingtoken (expires_at)",
+            "DROP INDEX IF EXISTS token_outstanding_expires_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS token_blacklisted_at_idx "
+            "ON token_blacklist_blacklistedtoken (blacklisted_at)",
+            "DROP INDEX IF EXISTS token_blacklisted_at_idx",
+        ),
+    ]
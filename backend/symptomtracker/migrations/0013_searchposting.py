@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from symptomtracker.search import term_weights
+
+
+def index_existing_entries(apps, schema_editor):
+    SearchPosting = apps.get_model("symptomtracker", "SearchPosting")
+    sources = [
+        ("pain", apps.get_model("symptomtracker", "PhysicalPainEntry"), "notes"),
+        ("mental", apps.get_model("symptomtracker", "MentalWellnessEntry"), "notes"),
+        ("diary", apps.get_model("symptomtracker", "DiaryEntry"), "content"),
+    ]
+    for entry_type, model, field in sources:
+        postings = []
+        rows = model.objects.order_by("id").values_list("id", "user_id", field)
+        for entry_id, user_id, text in rows.iterator(chunk_size=2000):
+            postings.extend(
+                SearchPosting(
+                    user_id=user_id,
+                    term=term,
+                    entry_type=entry_type,
+                    entry_id=entry_id,
+                    weight=weight,
+                )
+                for term, weight in term_weights(text).items()
+            )
+            if len(postings) >= 2000:
+                SearchPosting.objects.bulk_create(postings)
+                postings = []
+        SearchPosting.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0012_token_blacklist_expiry_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchPosting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=64)),
+                (
+                    "entry_type",
+                    models.CharField(
+                        choices=[
+                            ("pain", "Physical Pain"),
+                            ("mental", "Mental Wellness"),
+                            ("diary", "Diary"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("entry_id", models.BigIntegerField()),
+                (
+                    "weight",
+                    models.FloatField(
+                        help_text="Saturated term frequency of the term in the entry"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_postings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "term", "-weight", "-entry_id", "entry_type"],
+                        name="search_user_term_idx",
+                    ),
+                    models.Index(
+                        fields=["entry_type", "entry_id", "term", "weight"],
+                        name="search_entry_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(index_existing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,171 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_change_sequences(apps, schema_editor):
+    """Give every existing synced row its own change number, per user."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    ChangeSequence = apps.get_model("symptomtracker", "ChangeSequence")
+    counters = dict.fromkeys(User.objects.values_list("pk", flat=True), 0)
+
+    for name in (
+        "UserSettings",
+        "PhysicalPainEntry",
+        "MentalWellnessEntry",
+        "DiaryEntry",
+        "Notification",
+    ):
+        model = apps.get_model("symptomtracker", name)
+        batch = []
+        for row in model.objects.order_by("user_id", "id").only("id", "user_id").iterator(chunk_size=2000):
+            counters[row.user_id] += 1
+            row.change_seq = counters[row.user_id]
+            batch.append(row)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ["change_seq"])
+                batch = []
+        model.objects.bulk_update(batch, ["change_seq"])
+
+    ChangeSequence.objects.bulk_create(
+        (ChangeSequence(user_id=user_id, value=value) for user_id, value in counters.items()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0013_searchposting"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entry_type",
+                    models.CharField(
+                        choices=[
+                            ("pain", "pain"),
+                            ("mental", "mental"),
+                            ("diary", "diary"),
+                            ("notification", "notification"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("change_seq", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="diaryentry",
+            name="change_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="mentalwellnessentry",
+            name="change_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="change_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="physicalpainentry",
+            name="change_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="usersettings",
+            name="change_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="diaryentry",
+            index=models.Index(
+                fields=["user", "change_seq"], name="diary_user_change_seq_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mentalwellnessentry",
+            index=models.Index(
+                fields=["user", "change_seq"], name="mental_user_change_seq_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user", "change_seq"], name="notif_user_change_seq_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="physicalpainentry",
+            index=models.Index(
+                fields=["user", "change_seq"], name="pain_user_change_seq_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersettings",
+            index=models.Index(
+                fields=["user", "change_seq"], name="settings_user_change_seq_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="changesequence",
+            name="user",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="change_sequence",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tombstone",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tombstones",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["user", "change_seq"], name="tombstone_user_change_seq_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_change_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0014_change_sequence_and_tombstones"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entry_type",
+                    models.CharField(
+                        choices=[
+                            ("pain", "Physical Pain"),
+                            ("mental", "Mental Wellness"),
+                            ("diary", "Diary"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("entry_id", models.BigIntegerField()),
+                ("timestamp", models.DateTimeField()),
+                (
+                    "value",
+                    models.IntegerField(
+                        help_text="Pain or wellness level; empty for diary entries",
+                        null=True,
+                    ),
+                ),
+                ("text", models.BinaryField(null=True)),
+                ("codec", models.CharField(max_length=8)),
+                ("sent_to_physician", models.BooleanField(default=False)),
+                (
+                    "idempotency_key",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+                ("change_seq", models.BigIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "entry_type", "-timestamp", "-entry_id"],
+                        name="archive_user_timestamp_idx",
+                    ),
+                    models.Index(
+                        fields=["user", "change_seq"],
+                        name="archive_user_change_seq_idx",
+                    ),
+                    models.Index(
+                        fields=["user", "entry_type", "idempotency_key"],
+                        name="archive_user_key_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("entry_type", "entry_id"), name="unique_archived_entry"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0015_archivedentry"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="physicianoutbox",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("sending", "Sending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0016_physicianoutbox_sending"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changesequence",
+            name="pruned_through",
+            field=models.BigIntegerField(
+                default=0,
+                help_text="Newest change number whose tombstone may have been pruned",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(fields=["deleted_at"], name="tombstone_deleted_at_idx"),
+        ),
+    ]
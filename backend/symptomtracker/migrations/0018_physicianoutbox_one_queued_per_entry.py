@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cancel_duplicate_queued_rows(apps, schema_editor):
+    """Keep the oldest pending or sending row per entry; the rest would send it again."""
+    PhysicianOutbox = apps.get_model("symptomtracker", "PhysicianOutbox")
+    seen = set()
+    duplicates = []
+    queued = PhysicianOutbox.objects.filter(status__in=["pending", "sending"]).order_by("id")
+    for pk, entry_type, entry_id in queued.values_list("id", "entry_type", "entry_id").iterator(chunk_size=2000):
+        if (entry_type, entry_id) in seen:
+            duplicates.append(pk)
+        seen.add((entry_type, entry_id))
+    PhysicianOutbox.objects.filter(pk__in=duplicates).update(status="cancelled")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("symptomtracker", "0017_tombstone_retention"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_duplicate_queued_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="physicianoutbox",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "sending"])),
+                fields=("entry_type", "entry_id"),
+                name="outbox_one_queued_per_entry",
+            ),
+        ),
+    ]
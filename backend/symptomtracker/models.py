@@ -1,12 +1,110 @@
-from django.db import models
+import math
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Q, QuerySet, Sum
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .schedule import next_fire_time
+from .search import CANDIDATE_BATCH, DOC_FREQ_CAP, term_weights
+from .tokens import blacklist_filter
 
 # Create your models here.
 
-class UserProfile(models.Model):
+class DirtyFieldsMixin:
+    """Remembers the values a row was loaded with so callers can skip no-op saves."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def get_dirty_fields(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            # Never saved or loaded, so everything is pending
+            return [field.attname for field in self._meta.concrete_fields if not field.primary_key]
+        return [name for name, value in loaded.items() if getattr(self, name) != value]
+
+class ChangeSequence(models.Model):
+    """Per-user counter that orders every change the sync endpoint reports."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='change_sequence')
+    value = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(
+        default=0, help_text="Newest change number whose tombstone may have been pruned"
+    )
+
+    def __str__(self):
+        return f"{self.user_id}'s change sequence at {self.value}"
+
+    @classmethod
+    def allocate(cls, user_id, count=1):
+        """Reserve the next `count` sequence numbers for the user and return the last.
+
+        The counter row stays locked until the surrounding transaction ends,
+        so a user's changes commit in sequence order and a client cursor
+        never skips a change that commits late.
+        """
+        with transaction.atomic(savepoint=False):
+            if not cls.objects.filter(user_id=user_id).update(value=F('value') + count):
+                cls.objects.get_or_create(user_id=user_id)
+                cls.objects.filter(user_id=user_id).update(value=F('value') + count)
+            return cls.objects.filter(user_id=user_id).values_list('value', flat=True).get()
+
+    @classmethod
+    def bump(cls, user_id):
+        """Move the counter on without needing the number, in one query."""
+        if not cls.objects.filter(user_id=user_id).update(value=F('value') + 1):
+            cls.allocate(user_id)
+
+    @classmethod
+    def current(cls, user_id):
+        """The user's last committed sequence number.
+
+        Every write to a row of the user's moves it, so it is also the data
+        version their ETags are built from. Being read from the database,
+        every worker sees a write as soon as it commits.
+        """
+        return cls.objects.filter(user_id=user_id).values_list('value', flat=True).first() or 0
+
+    @classmethod
+    def for_user(cls, user):
+        """current() for `user`, without a query when the user was loaded with
+        the value as `data_version`, as EagerJWTAuthentication does. It then
+        belongs to the same snapshot as the profile and settings loaded with it."""
+        version = getattr(user, 'data_version', None)
+        return cls.current(user.pk) if version is None else version
+
+class ChangeTracked(models.Model):
+    """Rows the sync endpoint reports: every save() stamps the next change sequence.
+
+    Writes that bypass save() (bulk_create, bulk_update, update()) must
+    allocate from ChangeSequence and set change_seq themselves.
+    """
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            self.change_seq = ChangeSequence.allocate(self.user_id)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq'}
+            super().save(*args, **kwargs)
+
+class UserProfile(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     date_of_birth = models.DateField(null=True, blank=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
@@ -29,18 +127,8 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s profile"
 
-# Create UserProfile automatically when User is created
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
-
 
-class UserSettings(models.Model):
+class UserSettings(DirtyFieldsMixin, ChangeTracked):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='settings')
     # Basic settings
     dark_mode = models.BooleanField(default=False)
@@ -65,20 +153,38 @@ class UserSettings(models.Model):
     # Community connection
     community_enabled = models.BooleanField(default=False)
     community_username = models.CharField(max_length=100, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='settings_user_change_seq_idx')
+        ]
     
     def __str__(self):
         return f"{self.user.username}'s settings"
 
+# Create the profile and settings rows once, together, when a User is created.
+# Afterwards a user.save() only writes them if they were loaded and changed.
 @receiver(post_save, sender=User)
-def create_user_settings(sender, instance, created, **kwargs):
+def save_user_profile_and_settings(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
     if created:
-        UserSettings.objects.create(user=instance)
+        # Part of the caller's transaction when there is one, without a savepoint
+        with transaction.atomic(savepoint=False):
+            UserProfile.objects.create(user=instance)
+            ChangeSequence.objects.create(user=instance)
+            UserSettings.objects.create(user=instance)
+        return
 
-@receiver(post_save, sender=User)
-def save_user_settings(sender, instance, **kwargs):
-    instance.settings.save()
+    for accessor in ('profile', 'settings'):
+        related = getattr(User, accessor).related.get_cached_value(instance, default=None)
+        if related is not None:
+            dirty_fields = related.get_dirty_fields()
+            if dirty_fields:
+                related.save(update_fields=dirty_fields)
 
-class PhysicalPainEntry(models.Model):
+class PhysicalPainEntry(ChangeTracked):
     PAIN_LEVEL_CHOICES = [
         (1, '1-3: Mild pain'),
         (2, '4-6: Moderate pain'),
@@ -91,26 +197,62 @@ class PhysicalPainEntry(models.Model):
     notes = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(default=timezone.now)
     sent_to_physician = models.BooleanField(default=False)
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True, help_text="Client-generated key that makes batch uploads safe to replay")
     
+    class Meta:
+        # Every hot query filters by user and orders or ranges by newest first;
+        # -id is the tiebreak the cursor pagination orders on
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='pain_user_timestamp_idx'),
+            models.Index(fields=['user', 'change_seq'], name='pain_user_change_seq_idx')
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='pain_unique_idempotency_key')
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s pain entry on {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
-class MentalWellnessEntry(models.Model):
+class MentalWellnessEntry(ChangeTracked):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mental_wellness_entries')
     wellness_level = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)])  # 1-5 scale
     notes = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(default=timezone.now)
     sent_to_physician = models.BooleanField(default=False)
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True, help_text="Client-generated key that makes batch uploads safe to replay")
     
+    class Meta:
+        # Every hot query filters by user and orders or ranges by newest first;
+        # -id is the tiebreak the cursor pagination orders on
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='mental_user_timestamp_idx'),
+            models.Index(fields=['user', 'change_seq'], name='mental_user_change_seq_idx')
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='mental_unique_idempotency_key')
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s mental wellness entry on {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
-class DiaryEntry(models.Model):
+class DiaryEntry(ChangeTracked):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='diary_entries')
     content = models.TextField()
     timestamp = models.DateTimeField(default=timezone.now)
     sent_to_physician = models.BooleanField(default=False)
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True, help_text="Client-generated key that makes batch uploads safe to replay")
     
+    class Meta:
+        # Every hot query filters by user and orders or ranges by newest first;
+        # -id is the tiebreak the cursor pagination orders on
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='diary_user_timestamp_idx'),
+            models.Index(fields=['user', 'change_seq'], name='diary_user_change_seq_idx')
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='diary_unique_idempotency_key')
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s diary entry on {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
@@ -123,7 +265,49 @@ class PhysicianInfo(models.Model):
     def __str__(self):
         return f"{self.user.username}'s physician: {self.physician_name}"
 
-class Notification(models.Model):
+class PhysicianOutbox(models.Model):
+    """An entry waiting to be included in the next digest email to the user's physician."""
+    ENTRY_TYPE_CHOICES = [
+        ('pain', 'Physical Pain'),
+        ('mental', 'Mental Wellness'),
+        ('diary', 'Diary')
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='physician_outbox')
+    entry_type = models.CharField(max_length=10, choices=ENTRY_TYPE_CHOICES)
+    entry_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The delivery worker polls for due pending rows
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')
+        ]
+        constraints = [
+            # An entry is queued at most once until its digest goes out or fails for good
+            models.UniqueConstraint(
+                fields=['entry_type', 'entry_id'],
+                condition=Q(status__in=['pending', 'sending']),
+                name='outbox_one_queued_per_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}'s {self.entry_type} entry {self.entry_id} ({self.status})"
+
+class Notification(DirtyFieldsMixin, ChangeTracked):
     NOTIFICATION_TYPE_CHOICES = [
         ('medication', 'Medication Reminder'),
         ('appointment', 'Appointment Reminder'),
@@ -137,6 +321,517 @@ class Notification(models.Model):
     time = models.TimeField()
     is_active = models.BooleanField(default=True)
     days = models.CharField(max_length=100, help_text="Comma-separated list of days (e.g., 'Mon,Tue,Wed')")
+    # Materialized from time/days on save so the scheduler only reads due rows.
+    # Scheduler bookkeeping, so neither field is in any payload.
+    next_fire_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+    last_fired_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='notif_user_change_seq_idx')
+        ]
     
     def __str__(self):
-        return f"{self.user.username}'s {self.notification_type} reminder at {self.time}"
\ No newline at end of file
+        return f"{self.user.username}'s {self.notification_type} reminder at {self.time}"
+
+    SCHEDULE_FIELDS = {'time', 'days', 'is_active'}
+
+    def schedule_next(self, after):
+        self.next_fire_at = next_fire_time(self.time, self.days, after) if self.is_active else None
+
+    def save(self, *args, **kwargs):
+        # Rescheduling on any other edit could skip an occurrence already due
+        if self.SCHEDULE_FIELDS.intersection(self.get_dirty_fields()):
+            self.schedule_next(timezone.now())
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'next_fire_at'}
+        super().save(*args, **kwargs)
+
+class DailySymptomRollup(models.Model):
+    """Per-user, per-day summary of pain and mental wellness entries.
+
+    Kept up to date by the entry signals below so the trend endpoints read one
+    row per day instead of every raw entry in the window.
+    """
+    KIND_PAIN = 'pain'
+    KIND_MENTAL = 'mental'
+    KIND_CHOICES = [
+        (KIND_PAIN, 'Physical Pain'),
+        (KIND_MENTAL, 'Mental Wellness')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    min_value = models.IntegerField()
+    max_value = models.IntegerField()
+    total = models.IntegerField(help_text="Sum of the day's values, used to derive the mean")
+    last_value = models.IntegerField()
+    last_timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'date'], name='unique_daily_rollup')
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}'s {self.kind} rollup for {self.date}"
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @staticmethod
+    def bucket_date(timestamp):
+        # Days are bucketed in the project time zone, not the request's
+        return timezone.localtime(timestamp, timezone.get_default_timezone()).date()
+
+    @staticmethod
+    def day_range(date):
+        start = timezone.make_aware(datetime.combine(date, time.min), timezone.get_default_timezone())
+        return start, start + timedelta(days=1)
+
+    @classmethod
+    def record(cls, kind, entry):
+        """Fold a newly created entry into its day's rollup."""
+        value = getattr(entry, ROLLUP_SOURCES[kind][1])
+        with transaction.atomic():
+            rollup, created = cls.objects.select_for_update().get_or_create(
+                user_id=entry.user_id,
+                kind=kind,
+                date=cls.bucket_date(entry.timestamp),
+                defaults={
+                    'count': 1,
+                    'min_value': value,
+                    'max_value': value,
+                    'total': value,
+                    'last_value': value,
+                    'last_timestamp': entry.timestamp,
+                }
+            )
+            if created:
+                return rollup
+
+            rollup.count += 1
+            rollup.min_value = min(rollup.min_value, value)
+            rollup.max_value = max(rollup.max_value, value)
+            rollup.total += value
+            if entry.timestamp >= rollup.last_timestamp:
+                rollup.last_value = value
+                rollup.last_timestamp = entry.timestamp
+            rollup.save()
+        return rollup
+
+    @classmethod
+    def rebuild(cls, kind, user_id, date):
+        """Recompute one day's rollup from the raw entries.
+
+        Used for updates and deletes, where min, max and last value cannot be
+        maintained incrementally. Only the entries of that single day are read,
+        archived ones included.
+        """
+        model, field = ROLLUP_SOURCES[kind]
+        start, end = cls.day_range(date)
+        entries = model.objects.filter(user_id=user_id, timestamp__gte=start, timestamp__lt=end)
+        archived = ArchivedEntry.objects.filter(
+            user_id=user_id, entry_type=kind, timestamp__gte=start, timestamp__lt=end
+        )
+
+        stats = entries.aggregate(
+            count=Count('id'),
+            min_value=Min(field),
+            max_value=Max(field),
+            total=Sum(field)
+        )
+        archived_stats = archived.aggregate(
+            count=Count('id'),
+            min_value=Min('value'),
+            max_value=Max('value'),
+            total=Sum('value')
+        )
+        if archived_stats['count']:
+            if stats['count']:
+                stats = {
+                    'count': stats['count'] + archived_stats['count'],
+                    'min_value': min(stats['min_value'], archived_stats['min_value']),
+                    'max_value': max(stats['max_value'], archived_stats['max_value']),
+                    'total': stats['total'] + archived_stats['total'],
+                }
+            else:
+                stats = archived_stats
+        if not stats['count']:
+            cls.objects.filter(user_id=user_id, kind=kind, date=date).delete()
+            return None
+
+        # The latest of the day by (timestamp, id), whichever table it is in
+        candidates = [
+            (timestamp, pk, value)
+            for value, timestamp, pk in entries.order_by('-timestamp', '-id').values_list(field, 'timestamp', 'id')[:1]
+        ]
+        if archived_stats['count']:
+            candidates += [
+                (timestamp, pk, value)
+                for value, timestamp, pk in archived.order_by('-timestamp', '-entry_id').values_list(
+                    'value', 'timestamp', 'entry_id'
+                )[:1]
+            ]
+        last_timestamp, _, last_value = max(candidates)
+        rollup, _ = cls.objects.update_or_create(
+            user_id=user_id,
+            kind=kind,
+            date=date,
+            defaults=dict(stats, last_value=last_value, last_timestamp=last_timestamp)
+        )
+        return rollup
+
+    @classmethod
+    def rebuild_for_entries(cls, kind, entries):
+        """Rebuild every day touched by `entries` once, such as rows written by
+        bulk_create, which skips the signals, or removed by one delete()."""
+        days = {(entry.user_id, cls.bucket_date(entry.timestamp)) for entry in entries}
+        for user_id, date in days:
+            cls.rebuild(kind, user_id, date)
+
+
+ROLLUP_SOURCES = {
+    DailySymptomRollup.KIND_PAIN: (PhysicalPainEntry, 'pain_level'),
+    DailySymptomRollup.KIND_MENTAL: (MentalWellnessEntry, 'wellness_level'),
+}
+
+ROLLUP_KINDS = {model: kind for kind, (model, _) in ROLLUP_SOURCES.items()}
+
+class SearchPosting(models.Model):
+    """Inverted index over entry text: one row per distinct term of an entry."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_postings')
+    term = models.CharField(max_length=64)
+    entry_type = models.CharField(max_length=10, choices=PhysicianOutbox.ENTRY_TYPE_CHOICES)
+    entry_id = models.BigIntegerField()
+    weight = models.FloatField(help_text="Saturated term frequency of the term in the entry")
+
+    class Meta:
+        indexes = [
+            # Covers ranking, and yields single-term hits already best first
+            models.Index(fields=['user', 'term', '-weight', '-entry_id', 'entry_type'], name='search_user_term_idx'),
+            # Reindexing deletes by entry, and multi-term ranking probes other terms by entry
+            models.Index(fields=['entry_type', 'entry_id', 'term', 'weight'], name='search_entry_idx'),
+        ]
+
+    @classmethod
+    def index_entries(cls, entry_type, entries, replace=True):
+        field = SEARCH_SOURCES[entry_type][1]
+        entries = list(entries)
+        if replace:
+            cls.objects.filter(entry_type=entry_type, entry_id__in=[entry.pk for entry in entries]).delete()
+        cls.objects.bulk_create(
+            [
+                cls(user_id=entry.user_id, term=term, entry_type=entry_type, entry_id=entry.pk, weight=weight)
+                for entry in entries
+                for term, weight in term_weights(getattr(entry, field)).items()
+            ],
+            batch_size=2000
+        )
+
+    @classmethod
+    def rank(cls, user_id, terms, documents, limit, entry_types=None):
+        """[(entry_type, entry_id, score)] of entries containing every term, best first.
+
+        `documents` is the user's total entry count, used for the terms' IDF.
+        """
+        postings = cls.objects.filter(user_id=user_id)
+        if entry_types:
+            postings = postings.filter(entry_type__in=entry_types)
+        if len(terms) == 1:
+            return list(
+                postings.filter(term=terms[0]).order_by('-weight', '-entry_id')
+                .values_list('entry_type', 'entry_id', 'weight')[:limit]
+            )
+
+        # Document frequencies; beyond the cap the exact count barely moves the IDF
+        doc_freq = {term: postings.filter(term=term)[:DOC_FREQ_CAP].count() for term in terms}
+        if not all(doc_freq.values()):
+            return []
+        # The cached entry count may lag behind the index
+        documents = max(documents, *doc_freq.values())
+        idf = {term: math.log(1 + documents / n) for term, n in doc_freq.items()}
+        rarest = min(terms, key=doc_freq.get)
+        others = [term for term in terms if term != rarest]
+        # What the other terms can add to any entry at most
+        ceiling = sum(
+            postings.filter(term=term).order_by('-weight').values_list('weight', flat=True).first() * idf[term]
+            for term in others
+        )
+
+        # Only entries holding the rarest term can match. Walk its postings best
+        # first, probing the other terms for each batch through the
+        # (entry_type, entry_id) index, until no later entry can make the top
+        walk = postings.filter(term=rarest).order_by('-weight', '-entry_id').values_list('entry_type', 'entry_id', 'weight')
+        hits = []
+        offset = 0
+        while True:
+            batch = list(walk[offset:offset + CANDIDATE_BATCH])
+            offset += len(batch)
+            if not batch:
+                return hits
+
+            scores = {(entry_type, entry_id): weight * idf[rarest] for entry_type, entry_id, weight in batch}
+            matched = dict.fromkeys(scores, 0)
+            ids_by_type = {}
+            for entry_type, entry_id in scores:
+                ids_by_type.setdefault(entry_type, []).append(entry_id)
+            candidates = Q()
+            for entry_type, ids in ids_by_type.items():
+                candidates |= Q(entry_type=entry_type, entry_id__in=ids)
+            rows = cls.objects.filter(candidates, term__in=others).values_list('entry_type', 'entry_id', 'term', 'weight')
+            for entry_type, entry_id, term, weight in rows:
+                scores[entry_type, entry_id] += weight * idf[term]
+                matched[entry_type, entry_id] += 1
+
+            hits.extend((key[0], key[1], score) for key, score in scores.items() if matched[key] == len(others))
+            hits.sort(key=lambda hit: (-hit[2], -hit[1]))
+            del hits[limit:]
+            if len(batch) < CANDIDATE_BATCH:
+                return hits
+            if len(hits) == limit and batch[-1][2] * idf[rarest] + ceiling <= hits[-1][2]:
+                return hits
+
+
+# (entry model, text field, numeric value field) per searchable entry type
+SEARCH_SOURCES = {
+    'pain': (PhysicalPainEntry, 'notes', 'pain_level'),
+    'mental': (MentalWellnessEntry, 'notes', 'wellness_level'),
+    'diary': (DiaryEntry, 'content', None),
+}
+
+SEARCH_TYPES = {model: entry_type for entry_type, (model, _, _) in SEARCH_SOURCES.items()}
+
+# Row types the sync endpoint reports changes and deletions of
+SYNC_SOURCES = {
+    'pain': PhysicalPainEntry,
+    'mental': MentalWellnessEntry,
+    'diary': DiaryEntry,
+    'notification': Notification,
+}
+
+SYNC_TYPES = {model: entry_type for entry_type, model in SYNC_SOURCES.items()}
+
+class Tombstone(models.Model):
+    """A deleted synced row, so clients that already have it learn it is gone."""
+    ENTRY_TYPE_CHOICES = [(entry_type, entry_type) for entry_type in SYNC_SOURCES]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='tombstone_user_change_seq_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}'s deleted {self.entry_type} {self.object_id}"
+
+    @classmethod
+    def prune_batch(cls, cutoff, batch_size=1000):
+        """Delete up to `batch_size` of the oldest tombstones before `cutoff` in
+        one transaction, and return how many went.
+
+        Each owner's ChangeSequence.pruned_through is raised to the newest
+        change number removed, so the sync endpoint can send clients whose
+        cursor is older than that back to a full sync.
+        """
+        with transaction.atomic():
+            rows = list(
+                cls.objects.filter(deleted_at__lt=cutoff).order_by('deleted_at', 'id')
+                .values_list('id', 'user_id', 'change_seq')[:batch_size]
+            )
+            newest = {}
+            for _, user_id, change_seq in rows:
+                newest[user_id] = max(newest.get(user_id, 0), change_seq)
+            # Counters are locked in user order, as elsewhere
+            for user_id, change_seq in sorted(newest.items()):
+                ChangeSequence.objects.filter(user_id=user_id, pruned_through__lt=change_seq).update(pruned_through=change_seq)
+            cls.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+        return len(rows)
+
+class ArchivedEntry(models.Model):
+    """A pain, mental wellness or diary entry moved out of its hot table.
+
+    See archive.py. The entry keeps its id (entry_id), timestamp, value and
+    change number; its free text is stored compressed with `codec`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_entries')
+    entry_type = models.CharField(max_length=10, choices=PhysicianOutbox.ENTRY_TYPE_CHOICES)
+    entry_id = models.BigIntegerField()
+    timestamp = models.DateTimeField()
+    value = models.IntegerField(null=True, help_text="Pain or wellness level; empty for diary entries")
+    text = models.BinaryField(null=True)
+    codec = models.CharField(max_length=8)
+    sent_to_physician = models.BooleanField(default=False)
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+    change_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Same order as the hot tables' list index, for the merged list and export
+            models.Index(fields=['user', 'entry_type', '-timestamp', '-entry_id'], name='archive_user_timestamp_idx'),
+            models.Index(fields=['user', 'change_seq'], name='archive_user_change_seq_idx'),
+            # Batch uploads check replayed keys against archived entries too
+            models.Index(fields=['user', 'entry_type', 'idempotency_key'], name='archive_user_key_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['entry_type', 'entry_id'], name='unique_archived_entry')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}'s archived {self.entry_type} {self.entry_id}"
+
+# True while archive.archive_entries deletes the entries it has just copied.
+# That is a move, not a deletion: sync, the rollups and search are handled by
+# the archiver, so the delete receivers below leave them alone.
+archiving = ContextVar('archiving', default=False)
+
+# Record deletions for sync, in the deleting transaction. Rows removed along
+# with their user leave no tombstone, since nobody is left to sync them.
+@receiver(post_delete, sender=PhysicalPainEntry)
+@receiver(post_delete, sender=MentalWellnessEntry)
+@receiver(post_delete, sender=DiaryEntry)
+@receiver(post_delete, sender=Notification)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if archiving.get():
+        return
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        entry_type=SYNC_TYPES[sender],
+        object_id=instance.pk,
+        change_seq=ChangeSequence.allocate(instance.user_id)
+    )
+
+# Deleting an archived entry deletes the entry, so it is tombstoned and
+# taken out of its day's rollup like a hot one
+@receiver(post_delete, sender=ArchivedEntry)
+def forget_archived_entry(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        entry_type=instance.entry_type,
+        object_id=instance.entry_id,
+        change_seq=ChangeSequence.allocate(instance.user_id)
+    )
+    if instance.entry_type in ROLLUP_SOURCES:
+        DailySymptomRollup.rebuild(instance.entry_type, instance.user_id, DailySymptomRollup.bucket_date(instance.timestamp))
+
+# Keep the daily rollups in step with the raw entries
+@receiver(pre_save, sender=PhysicalPainEntry)
+@receiver(pre_save, sender=MentalWellnessEntry)
+def remember_rollup_date(sender, instance, **kwargs):
+    # An update may move the entry to another day, so note where it was
+    instance._previous_rollup_date = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values_list('timestamp', flat=True).first()
+        if previous is not None:
+            instance._previous_rollup_date = DailySymptomRollup.bucket_date(previous)
+
+@receiver(post_save, sender=PhysicalPainEntry)
+@receiver(post_save, sender=MentalWellnessEntry)
+def update_daily_rollup(sender, instance, created, **kwargs):
+    kind = ROLLUP_KINDS[sender]
+    if created:
+        DailySymptomRollup.record(kind, instance)
+        return
+
+    date = DailySymptomRollup.bucket_date(instance.timestamp)
+    DailySymptomRollup.rebuild(kind, instance.user_id, date)
+    previous_date = getattr(instance, '_previous_rollup_date', None)
+    if previous_date and previous_date != date:
+        DailySymptomRollup.rebuild(kind, instance.user_id, previous_date)
+
+# One delete() sends pre_delete for all of its rows before deleting any, and
+# post_delete for each after deleting them all. The rows are collected on the
+# delete's origin in between, so per-day and per-batch work is done once.
+@receiver(pre_delete, sender=PhysicalPainEntry)
+@receiver(pre_delete, sender=MentalWellnessEntry)
+@receiver(pre_delete, sender=DiaryEntry)
+def collect_deleted_entry(sender, instance, origin=None, **kwargs):
+    batches = vars(origin if origin is not None else instance).setdefault('_deleted_entries', {})
+    batches.setdefault(sender, []).append(instance)
+
+def deleted_together(sender, instance, origin):
+    """The `sender` rows deleted by the same delete() call as `instance`,
+    when `instance` is the last of them, and [] otherwise."""
+    batches = vars(origin if origin is not None else instance).get('_deleted_entries', {})
+    entries = batches.get(sender) or [instance]
+    return entries if instance is entries[-1] else []
+
+@receiver(post_delete, sender=PhysicalPainEntry)
+@receiver(post_delete, sender=MentalWellnessEntry)
+def remove_from_daily_rollup(sender, instance, origin=None, **kwargs):
+    if archiving.get():
+        return
+    # The rollups go with their user, and a rebuild while the user's archived
+    # entries are still there would create one for the user being deleted
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    entries = deleted_together(sender, instance, origin)
+    if entries:
+        DailySymptomRollup.rebuild_for_entries(ROLLUP_KINDS[sender], entries)
+
+# Keep the search index in step with entry text
+@receiver(post_save, sender=PhysicalPainEntry)
+@receiver(post_save, sender=MentalWellnessEntry)
+@receiver(post_save, sender=DiaryEntry)
+def index_entry_text(sender, instance, created, update_fields=None, **kwargs):
+    entry_type = SEARCH_TYPES[sender]
+    if update_fields is not None and SEARCH_SOURCES[entry_type][1] not in update_fields:
+        return
+    SearchPosting.index_entries(entry_type, [instance], replace=not created)
+
+@receiver(post_delete, sender=PhysicalPainEntry)
+@receiver(post_delete, sender=MentalWellnessEntry)
+@receiver(post_delete, sender=DiaryEntry)
+def unindex_entry_text(sender, instance, origin=None, **kwargs):
+    if archiving.get():
+        return
+    # The postings go with their user
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    ids = [entry.pk for entry in deleted_together(sender, instance, origin)]
+    for start in range(0, len(ids), GET_ITERATOR_CHUNK_SIZE):
+        SearchPosting.objects.filter(
+            entry_type=SEARCH_TYPES[sender], entry_id__in=ids[start:start + GET_ITERATOR_CHUNK_SIZE]
+        ).delete()
+
+# Any write to a user's rows moves the ChangeSequence their ETags are built
+# from. Synced rows move it as they are saved or deleted; these are the other
+# rows the conditional payloads read.
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=PhysicianInfo)
+@receiver(post_delete, sender=PhysicianInfo)
+def bump_user_data_version(sender, instance, created=False, origin=None, **kwargs):
+    # A profile is created along with its user, before any ETag exists, and
+    # rows deleted along with their user leave nobody to serve
+    if created and sender is UserProfile:
+        return
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    ChangeSequence.bump(instance.user_id)
+
+# Columns of the user row that no payload includes
+UNVERSIONED_USER_FIELDS = {'last_login', 'password'}
+
+@receiver(post_save, sender=User)
+def bump_user_data_version_for_user(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and set(update_fields) <= UNVERSIONED_USER_FIELDS):
+        return
+    ChangeSequence.bump(instance.pk)
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        blacklist_filter.add(instance.token.jti)
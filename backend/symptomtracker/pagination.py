@@ -0,0 +1,135 @@
+from base64 import b64decode
+from functools import reduce
+from operator import or_
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.urls import remove_query_param
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
+
+
+def after(ordering, position):
+    """Q matching the rows that sort after `position` (one value per ordering
+    field), e.g. Q(timestamp__lt=t) | Q(timestamp=t, id__lt=id) for
+    ('-timestamp', '-id').
+
+    It is ANDed with the implied range on the first field alone
+    (timestamp <= t), so any planner can seek to it on the index rather than
+    reading the index from the start and filtering.
+    """
+    conditions = []
+    for index, field in enumerate(ordering):
+        lookup = field.lstrip('-') + ('__lt' if field.startswith('-') else '__gt')
+        ties = {other.lstrip('-'): value for other, value in zip(ordering[:index], position)}
+        conditions.append(Q(**ties, **{lookup: position[index]}))
+    first = ordering[0]
+    bound = Q(**{first.lstrip('-') + ('__lte' if first.startswith('-') else '__gte'): position[0]})
+    return bound & reduce(or_, conditions)
+
+
+class EntryCursorPagination(CursorPagination):
+    """Keyset pagination for the per-user entry lists.
+
+    The cursor holds the (timestamp, id) of the row a page ends on, and the
+    next page is read with Q(timestamp__lt=t) | Q(timestamp=t, id__lt=id) in
+    (-timestamp, -id) order. Every page, however deep and however many
+    entries share a timestamp, is one seek on the (user, -timestamp, -id)
+    index and a LIMIT, with no OFFSET. A previous link walks the same keys
+    the other way from the row a page starts on. Cursors are opaque to
+    clients; pass ?page_size= (at most max_page_size) to override the
+    default page size.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = getattr(settings, 'ENTRY_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(after(ordering, self.position_values(queryset.model, self.cursor.position)))
+
+        # One row more than the page tells whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, self.cursor is not None
+
+        # Pages link on from their own first and last rows. A page left
+        # empty by deletions links back to the first page instead.
+        self.next_position = self.previous_position = None
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            self.has_next = False
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def position_values(self, model, position):
+        try:
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position, strict=True)
+            ]
+        except (ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.previous_position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            # One key value per ordering field
+            position = tokens['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return [str(instance[field.lstrip('-')]) for field in ordering]
+        return [str(getattr(instance, field.lstrip('-'))) for field in ordering]
+
+
+class NotificationCursorPagination(EntryCursorPagination):
+    # Notifications have no timestamp; newest reminders first
+    ordering = ('-id',)
@@ -0,0 +1,183 @@
+"""Password hashing policy and login protection.
+
+The PBKDF2 work factor is PASSWORD_HASH_ITERATIONS, never below Django's
+own PBKDF2 iteration count, so there is no per-host latency target: a
+hash costs what that count costs on the host. The login cost is kept down
+around the hash instead. Repeated failed logins are refused from an
+in-memory counter before any hashing, and hashes stored with a lower work
+factor are upgraded by a background thread after a successful login
+instead of inside the request.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password, must_update_salt
+from django.contrib.auth.models import User
+from django.db import connection
+
+from .metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+class ConfiguredPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor set by PASSWORD_HASH_ITERATIONS.
+
+    It keeps the pbkdf2_sha256 algorithm name, so existing hashes verify
+    unchanged. Only hashes weaker than the current work factor need updating.
+    """
+
+    @property
+    def iterations(self):
+        return max(PBKDF2PasswordHasher.iterations, settings.PASSWORD_HASH_ITERATIONS or 0)
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return decoded['iterations'] < self.iterations or must_update_salt(decoded['salt'], self.salt_entropy)
+
+
+class RehashQueue:
+    """Single background thread that upgrades password hashes after login."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='password-rehash')
+        self.pending = {}
+        self.completed = 0
+
+    def schedule(self, user_id, encoded, password):
+        with self.lock:
+            # A burst of logins by the same user only needs one rehash
+            if user_id not in self.pending:
+                self.pending[user_id] = self.executor.submit(self.rehash, user_id, encoded, password)
+            return self.pending[user_id]
+
+    def rehash(self, user_id, encoded, password):
+        try:
+            # Matching on the old hash leaves a password changed meanwhile alone
+            if User.objects.filter(pk=user_id, password=encoded).update(password=make_password(password)):
+                with self.lock:
+                    self.completed += 1
+        except Exception:
+            logger.exception('Rehashing the password of user %s failed', user_id)
+        finally:
+            with self.lock:
+                self.pending.pop(user_id, None)
+            connection.close()
+
+    def wait(self):
+        with self.lock:
+            futures = list(self.pending.values())
+        wait(futures)
+
+    def stats(self):
+        with self.lock:
+            return {'pending': len(self.pending), 'completed': self.completed}
+
+
+rehash_queue = RehashQueue()
+
+
+class DeferredRehashBackend(ModelBackend):
+    """ModelBackend that leaves hash upgrades to `rehash_queue`."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            # The login response serializes the profile and settings, so load them now
+            user = User._default_manager.select_related('profile', 'settings').get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            User().set_password(password)
+            return
+
+        def setter(raw_password):
+            rehash_queue.schedule(user.pk, user.password, raw_password)
+
+        if check_password(password, user.password, setter) and self.user_can_authenticate(user):
+            return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        return await sync_to_async(self.authenticate)(request, username, password, **kwargs)
+
+
+class FailedLoginLimiter:
+    """Sliding-window count of failed logins per username and per client address.
+
+    Keys are held in an LRU bounded by LOGIN_FAILURE_MAX_KEYS, so a flood of
+    distinct usernames cannot grow it without limit.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.failures = OrderedDict()
+
+    def keys(self, username, address):
+        return [('user', str(username).lower(), settings.LOGIN_FAILURE_LIMIT), ('ip', address, settings.LOGIN_FAILURE_IP_LIMIT)]
+
+    def _recent(self, key, now):
+        window = settings.LOGIN_FAILURE_WINDOW_SECONDS
+        times = self.failures.get(key)
+        while times and now - times[0] >= window:
+            times.popleft()
+        return times
+
+    def retry_after(self, username, address):
+        """Seconds until another attempt is allowed, or 0 if it is allowed now."""
+        now = time.monotonic()
+        wait_for = 0
+        with self.lock:
+            for kind, value, limit in self.keys(username, address):
+                times = self._recent((kind, value), now)
+                if times and len(times) >= limit:
+                    # Allowed again once all but limit - 1 of the failures have aged out
+                    wait_for = max(wait_for, times[-limit] + settings.LOGIN_FAILURE_WINDOW_SECONDS - now)
+        return int(wait_for) + 1 if wait_for else 0
+
+    def record_failure(self, username, address):
+        now = time.monotonic()
+        with self.lock:
+            for kind, value, _ in self.keys(username, address):
+                key = (kind, value)
+                times = self._recent(key, now)
+                if times is None:
+                    times = self.failures[key] = deque(maxlen=max(settings.LOGIN_FAILURE_LIMIT, settings.LOGIN_FAILURE_IP_LIMIT))
+                self.failures.move_to_end(key)
+                times.append(now)
+            while len(self.failures) > settings.LOGIN_FAILURE_MAX_KEYS:
+                self.failures.popitem(last=False)
+
+    def reset(self, username):
+        with self.lock:
+            self.failures.pop(('user', str(username).lower()), None)
+
+    def clear(self):
+        with self.lock:
+            self.failures.clear()
+
+
+failed_logins = FailedLoginLimiter()
+
+# Time spent in authenticate(): CPU on the request thread and wall clock
+login_cpu = LatencyRecorder(settings.AUTH_METRICS_WINDOW)
+login_wall = LatencyRecorder(settings.AUTH_METRICS_WINDOW)
+
+
+def login_metrics():
+    return {
+        'hasher': {
+            'algorithm': ConfiguredPBKDF2PasswordHasher.algorithm,
+            'iterations': ConfiguredPBKDF2PasswordHasher().iterations,
+        },
+        'login_cpu': login_cpu.summary(),
+        'login_wall': login_wall.summary(),
+        'rehash': rehash_queue.stats(),
+    }
@@ -0,0 +1,38 @@
+"""Renderers for the columnar trend layout.
+
+Views check the negotiated renderer's `columnar` flag and build the compact
+column payload instead of the chart payload. Clients ask for it with
+Accept: application/vnd.symptomtracker.columns+json or ?format=columns, or
+with Accept: application/msgpack or ?format=msgpack when the optional
+msgpack package is installed.
+"""
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.symptomtracker.columns+json'
+    format = 'columns'
+    columnar = True
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True)
+
+
+# The chart layout stays first, so it remains the default
+COLUMNAR_RENDERERS = [ColumnarJSONRenderer] + ([MessagePackRenderer] if msgpack else [])
+TREND_RENDERERS = [JSONRenderer, BrowsableAPIRenderer, *COLUMNAR_RENDERERS]
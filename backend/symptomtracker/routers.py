@@ -0,0 +1,70 @@
+"""Routing of read-only requests to the optional read replica.
+
+Settings install ReadReplicaRouter when DB_REPLICA_HOST is set. Writes
+always go to the primary. Reads go to the replica only inside
+``replica_reads()``. That wraps the data-analysis actions, the entry and
+physician lists and the history export. These can tolerate a little
+replication lag; everything else, including the authentication lookups
+that run before them, reads from the primary.
+
+The notification list stays on the primary because it is conditional. Its
+ETag comes from the data version read on the primary, so a body read from
+a lagging replica would be cached under the newer version's ETag and
+revalidated with 304s until the user's next write. conditional_get runs
+its views inside ``primary_reads()``, where ``replica_reads()`` raises.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_primary_reads = ContextVar('primary_reads', default=False)
+
+
+def replica_alias():
+    """The replica's alias, or the primary's when no replica is configured."""
+    return REPLICA_DB_ALIAS if REPLICA_DB_ALIAS in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads():
+    """Send the reads made in this block, or decorated handler, to the replica."""
+    if _primary_reads.get():
+        raise ImproperlyConfigured('replica_reads() inside primary_reads(), such as in a conditional_get view')
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Keep the reads made in this block on the primary, refusing replica_reads()."""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,45 @@
+"""Pure helpers for working out when a Notification reminder fires next.
+
+Kept free of model imports so migrations can use them too.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def parse_days(days):
+    """Turn 'Mon,Tue,Wed' (any case, full names allowed) into weekday numbers.
+
+    A blank string means every day; unknown names are ignored.
+    """
+    tokens = [token.strip().lower()[:3] for token in (days or '').split(',') if token.strip()]
+    if not tokens:
+        return set(range(7))
+    return {WEEKDAYS.index(token) for token in tokens if token in WEEKDAYS}
+
+
+def next_fire_time(time, days, after):
+    """First datetime strictly after `after` that falls on one of `days` at `time`.
+
+    Reminder times are wall-clock times in the project time zone. Returns
+    None if `days` names no valid weekday.
+    """
+    weekdays = parse_days(days)
+    if not weekdays:
+        return None
+    if isinstance(time, str):
+        time = parse_time(time)
+
+    tz = timezone.get_default_timezone()
+    local_after = timezone.localtime(after, tz)
+    for offset in range(8):
+        day = local_after.date() + timedelta(days=offset)
+        if day.weekday() not in weekdays:
+            continue
+        candidate = timezone.make_aware(datetime.combine(day, time), tz)
+        if candidate > after:
+            return candidate
+    return None
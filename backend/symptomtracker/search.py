@@ -0,0 +1,92 @@
+"""Tokenizing, weighting and snippets for the entry search index.
+
+Kept free of model imports so models.py can use it from its signal
+receivers, like schedule.py.
+"""
+import re
+from collections import Counter
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Longest term stored; longer words are truncated to this many characters
+MAX_TERM_LENGTH = 64
+
+# Most terms taken from one query
+MAX_QUERY_TERMS = 8
+
+# Multi-term searches score the rarest term's entries this many at a time
+CANDIDATE_BATCH = 500
+
+# Document frequencies are counted up to this many entries
+DOC_FREQ_CAP = 5000
+
+# BM25 term-frequency saturation
+K1 = 1.2
+
+SNIPPET_CHARS = 160
+
+STOPWORDS = frozenset('''
+    a an and are as at be but by for from had has have he her his i if in into is it its
+    me my of on or our she so that the their them then there they this to was we were
+    what when which who will with you your
+'''.split())
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').casefold())
+        if token not in STOPWORDS
+    ]
+
+
+def term_weights(text):
+    """{term: saturated term frequency} for one entry's text."""
+    return {term: count * (K1 + 1) / (count + K1) for term, count in Counter(tokenize(text)).items()}
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def snippet(text, terms, length=SNIPPET_CHARS):
+    """The `length`-character window of `text` covering the most distinct
+    query terms, with [start, end] offsets of each match inside it."""
+    text = text or ''
+    terms = set(terms)
+    matches = [
+        (match.start(), match.end(), match.group().casefold()[:MAX_TERM_LENGTH])
+        for match in TOKEN_RE.finditer(text)
+        if match.group().casefold()[:MAX_TERM_LENGTH] in terms
+    ]
+    if len(text) <= length:
+        start, end = 0, len(text)
+    else:
+        # Sweep a window over the matches for the most distinct terms
+        best, start, covered_end = 0, 0, 0
+        counts = Counter()
+        j = 0
+        for first, _, term in matches:
+            while j < len(matches) and matches[j][1] <= first + length:
+                counts[matches[j][2]] += 1
+                j += 1
+            if len(counts) > best:
+                best, start, covered_end = len(counts), first, matches[j - 1][1]
+            counts[term] -= 1
+            if not counts[term]:
+                del counts[term]
+        # Open with a little context before the first match, on a word boundary
+        if best:
+            start -= min(length // 4, start + length - covered_end)
+        start = max(0, min(start, len(text) - length))
+        if start:
+            space = text.rfind(' ', 0, start)
+            start = space + 1 if space != -1 and start - space < 20 else start
+        end = min(len(text), start + length)
+
+    prefix = '…' if start else ''
+    suffix = '…' if end < len(text) else ''
+    offset = len(prefix) - start
+    return {
+        'text': prefix + text[start:end] + suffix,
+        'matches': [[s + offset, e + offset] for s, e, _ in matches if start <= s and e <= end],
+    }
@@ -2,10 +2,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from .models import (
     PhysicalPainEntry, MentalWellnessEntry, DiaryEntry, 
     PhysicianInfo, Notification, UserProfile, UserSettings
 )
+from .tokens import FilteredRefreshToken
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -68,18 +71,19 @@ class RegisterSerializer(serializers.ModelSerializer):
         
         validated_data.pop('password2')
 
-        user = User.objects.create(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', '')
-        )
-        user.set_password(validated_data['password'])
-        user.save()
+        with transaction.atomic():
+            user = User.objects.create_user(
+                validated_data['username'],
+                validated_data['email'],
+                validated_data['password'],
+                first_name=validated_data.get('first_name', ''),
+                last_name=validated_data.get('last_name', '')
+            )
+            # The post_save signal has just created the profile, and left it
+            # cached on the user; no client can have synced it yet
+            UserProfile.objects.filter(user=user).update(date_of_birth=date_of_birth)
+            user.profile.date_of_birth = date_of_birth
 
-        user.profile.date_of_birth = date_of_birth
-        user.profile.save()
-        
         return user
     
 class ChangePasswordSerializer(serializers.Serializer):
@@ -110,6 +114,26 @@ class DiaryEntrySerializer(serializers.ModelSerializer):
         fields = ['id', 'content', 'timestamp', 'sent_to_physician']
         read_only_fields = ['id', 'timestamp']
 
+# Batch upload variants: offline clients supply their own timestamps and an
+# idempotency key per entry so a replayed upload never duplicates rows
+class PhysicalPainEntryBatchSerializer(PhysicalPainEntrySerializer):
+    class Meta(PhysicalPainEntrySerializer.Meta):
+        fields = PhysicalPainEntrySerializer.Meta.fields + ['idempotency_key']
+        read_only_fields = ['id']
+        extra_kwargs = {'idempotency_key': {'required': True, 'allow_null': False, 'allow_blank': False}}
+
+class MentalWellnessEntryBatchSerializer(MentalWellnessEntrySerializer):
+    class Meta(MentalWellnessEntrySerializer.Meta):
+        fields = MentalWellnessEntrySerializer.Meta.fields + ['idempotency_key']
+        read_only_fields = ['id']
+        extra_kwargs = {'idempotency_key': {'required': True, 'allow_null': False, 'allow_blank': False}}
+
+class DiaryEntryBatchSerializer(DiaryEntrySerializer):
+    class Meta(DiaryEntrySerializer.Meta):
+        fields = DiaryEntrySerializer.Meta.fields + ['idempotency_key']
+        read_only_fields = ['id']
+        extra_kwargs = {'idempotency_key': {'required': True, 'allow_null': False, 'allow_blank': False}}
+
 class PhysicianInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = PhysicianInfo
@@ -120,4 +144,7 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'notification_type', 'title', 'message', 'time', 'is_active', 'days']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
@@ -0,0 +1,133 @@
+"""Multi-process SQLite write stress test.
+
+Creates a fresh database file per configuration, then starts writer
+processes that create pain and mental wellness entries through the API and
+reader processes that page through the entry list, all at once. Each
+configuration reports throughput and how many requests failed with
+"database is locked". Run it with ``python manage.py stress_sqlite``.
+
+Workers are started with the spawn method and set Django up themselves, so
+nothing here imports models at module level.
+"""
+import multiprocessing
+import statistics
+import time
+from pathlib import Path
+
+# The stock settings: rollback journal, deferred transactions, no PRAGMAs
+DEFAULT_CONFIG = {'pragmas': {}, 'options': {}}
+
+PASSWORD = 'Stress-test-2024!'
+
+
+def tuned_config():
+    from django.conf import settings
+    from django.db import connection
+
+    return {
+        # The stress databases are throwaway files, so WAL is always on here
+        'pragmas': {**settings.SQLITE_PRAGMAS, **settings.SQLITE_WAL_PRAGMAS},
+        'options': {key: value for key, value in connection.settings_dict['OPTIONS'].items() if key == 'transaction_mode'},
+    }
+
+
+def worker(db_name, config, token, role, requests, barrier, results):
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import OperationalError, connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    setup_test_environment(debug=False)
+    settings.SQLITE_PRAGMAS = config['pragmas']
+    connection.settings_dict['NAME'] = db_name
+    connection.settings_dict['OPTIONS'] = dict(config['options'])
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    ok = locked = failed = 0
+    timings = []
+    barrier.wait()
+    for i in range(requests):
+        started = time.perf_counter()
+        try:
+            if role == 'writer' and i % 2:
+                response = client.post('/api/mental-wellness/', {'wellness_level': i % 5 + 1, 'notes': f'stress {i}'}, format='json')
+            elif role == 'writer':
+                response = client.post('/api/physical-pain/', {'pain_level': i % 4 + 1, 'notes': f'stress {i}'}, format='json')
+            else:
+                response = client.get('/api/physical-pain/')
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+        else:
+            if response.status_code < 400:
+                ok += 1
+            else:
+                failed += 1
+        timings.append(time.perf_counter() - started)
+    connection.close()
+    results.put({'role': role, 'ok': ok, 'locked': locked, 'failed': failed, 'timings': timings})
+
+
+def create_database(path, config):
+    """Migrate a fresh database at `path` under `config` and add one user per worker."""
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import override_settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    path = Path(path)
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{path}{suffix}').unlink(missing_ok=True)
+
+    connection.close()
+    connection.settings_dict['NAME'] = str(path)
+    connection.settings_dict['OPTIONS'] = dict(config['options'])
+    with override_settings(SQLITE_PRAGMAS=config['pragmas']):
+        call_command('migrate', verbosity=0, interactive=False)
+        users = [User.objects.create_user(f'stress-{i}', password=PASSWORD) for i in range(64)]
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+        connection.close()
+    return tokens
+
+
+def run_config(path, config, writers, readers, requests):
+    """Drive one configuration and return its summary."""
+    tokens = create_database(path, config)
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(writers + readers + 1)
+    results = context.Queue()
+    roles = ['writer'] * writers + ['reader'] * readers
+    processes = [
+        context.Process(target=worker, args=(str(path), config, tokens[i % len(tokens)], role, requests, barrier, results))
+        for i, role in enumerate(roles)
+    ]
+    for process in processes:
+        process.start()
+    # Every worker has set Django up once the barrier opens
+    barrier.wait()
+    started = time.perf_counter()
+    reports = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    summary = {'seconds': round(elapsed, 2)}
+    for role in ('writer', 'reader'):
+        mine = [report for report in reports if report['role'] == role]
+        timings = sorted(t for report in mine for t in report['timings'])
+        ok = sum(report['ok'] for report in mine)
+        summary[role] = {
+            'ok': ok,
+            'locked': sum(report['locked'] for report in mine),
+            'failed': sum(report['failed'] for report in mine),
+            'per_second': round(ok / elapsed, 1),
+            'p50_ms': round(statistics.median(timings) * 1000, 2) if timings else None,
+            'p99_ms': round(timings[min(len(timings) - 1, round(0.99 * (len(timings) - 1)))] * 1000, 2) if timings else None,
+        }
+    return summary
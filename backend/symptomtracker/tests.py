@@ -1,3 +1,1983 @@
-from django.test import TestCase
+import csv
+import gzip
+from contextlib import contextmanager
+from importlib import import_module
+import tempfile
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from itertools import accumulate
+import json
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, transaction
+from django.db.models import Q, QuerySet
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy as np
+    from . import analytics
+except ImportError:
+    np = analytics = None
+
+# The statistics action computes with NumPy; without it, it is left out
+STATISTICS_PATH = '/api/data-analysis/statistics/'
+
+from .async_views import AsyncHomeScreenDataView, AsyncRecentEntriesView, AsyncTrendView
+from .benchmark import ENDPOINTS, compare, load_baseline, run_benchmark
+from .cache import home_data_cache_key
+from .conditional import conditional_get
+from .delivery import claim_due, deliver_pending, enqueue_for_physician
+from .models import (
+    ArchivedEntry, ChangeSequence, ChangeTracked, PhysicalPainEntry, MentalWellnessEntry, DiaryEntry, UserProfile,
+    PhysicianInfo, PhysicianOutbox, Notification, SearchPosting, DailySymptomRollup, Tombstone, ROLLUP_SOURCES
+)
+from .reminders import fire_due_reminders
+from .routers import ReadReplicaRouter, replica_reads
+from .passwords import ConfiguredPBKDF2PasswordHasher, failed_logins, rehash_queue
+from .schedule import next_fire_time
+from .rows import RowSerializer
+from .serializers import DiaryEntrySerializer, MentalWellnessEntrySerializer, PhysicalPainEntrySerializer
+from .tokens import blacklist_filter
+from .views import HistoryExportView
+
+# Tables whose queries must always be served from an index
+ENTRY_TABLES = (
+    PhysicalPainEntry._meta.db_table,
+    MentalWellnessEntry._meta.db_table,
+    DiaryEntry._meta.db_table,
+    'symptomtracker_dailysymptomrollup',
+    'symptomtracker_searchposting',
+    'symptomtracker_tombstone',
+    'symptomtracker_archivedentry',
+)
+
+# Query budgets for the auth endpoints
+REGISTER_QUERIES = 11
+LOGIN_QUERIES = 2
+CHANGE_PASSWORD_QUERIES = 1
+PROFILE_UPDATE_QUERIES = 5
+SETTINGS_UPDATE_QUERIES = 4
+SETTINGS_USERNAME_UPDATE_QUERIES = 7
+
+
+def seed_entries(user, count, start=None):
+    """Create `count` pain, mental wellness and diary entries an hour apart."""
+    start = start or timezone.now()
+    PhysicalPainEntry.objects.bulk_create(
+        PhysicalPainEntry(user=user, pain_level=i % 4 + 1, timestamp=start - timedelta(hours=i))
+        for i in range(count)
+    )
+    MentalWellnessEntry.objects.bulk_create(
+        MentalWellnessEntry(user=user, wellness_level=i % 5 + 1, timestamp=start - timedelta(hours=i))
+        for i in range(count)
+    )
+    diary = DiaryEntry.objects.bulk_create(
+        DiaryEntry(user=user, content=f'Entry {i}', timestamp=start - timedelta(hours=i))
+        for i in range(count)
+    )
+    SearchPosting.index_entries('diary', diary, replace=False)
+
+
+class DailyRollupTests(TestCase):
+    DAY = datetime(2025, 1, 6).date()
+
+    def setUp(self):
+        self.user = User.objects.create_user('rolled', password='Str0ng-pass!')
+
+    def at(self, hour, days=0):
+        return datetime.combine(self.DAY + timedelta(days=days), dt_time(hour), tzinfo=dt_timezone.utc)
+
+    def rollups(self, kind=DailySymptomRollup.KIND_PAIN):
+        return {
+            rollup.date: (rollup.count, rollup.min_value, rollup.max_value, rollup.total, rollup.last_value, rollup.last_timestamp)
+            for rollup in DailySymptomRollup.objects.filter(user=self.user, kind=kind)
+        }
+
+    def from_scratch(self, kind=DailySymptomRollup.KIND_PAIN):
+        """The rollups aggregated afresh from every raw entry, in Python."""
+        model, field = ROLLUP_SOURCES[kind]
+        days = {}
+        for entry in model.objects.filter(user=self.user).order_by('timestamp', 'id'):
+            days.setdefault(DailySymptomRollup.bucket_date(entry.timestamp), []).append(entry)
+        return {
+            date: (
+                len(entries),
+                min(getattr(entry, field) for entry in entries),
+                max(getattr(entry, field) for entry in entries),
+                sum(getattr(entry, field) for entry in entries),
+                getattr(entries[-1], field),
+                entries[-1].timestamp,
+            )
+            for date, entries in days.items()
+        }
+
+    def test_create(self):
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=2, timestamp=self.at(9))
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=4, timestamp=self.at(18))
+        # Logged late, for earlier in the day: the last value stays the 18:00 one
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=1, timestamp=self.at(12))
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=3, timestamp=self.at(9, days=1))
+        self.assertEqual(self.rollups(), {
+            self.DAY: (3, 1, 4, 7, 4, self.at(18)),
+            self.DAY + timedelta(days=1): (1, 3, 3, 3, 3, self.at(9, days=1)),
+        })
+        self.assertEqual(self.rollups(), self.from_scratch())
+
+    def test_update(self):
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=2, timestamp=self.at(9))
+        latest = PhysicalPainEntry.objects.create(user=self.user, pain_level=4, timestamp=self.at(18))
+        latest.pain_level = 1
+        latest.save()
+        self.assertEqual(self.rollups(), {self.DAY: (2, 1, 2, 3, 1, self.at(18))})
+
+        mood = MentalWellnessEntry.objects.create(user=self.user, wellness_level=2, timestamp=self.at(9))
+        mood.wellness_level = 5
+        mood.save()
+        self.assertEqual(self.rollups(DailySymptomRollup.KIND_MENTAL), {self.DAY: (1, 5, 5, 5, 5, self.at(9))})
+
+    def test_moving_an_entry_to_another_day(self):
+        stays = PhysicalPainEntry.objects.create(user=self.user, pain_level=2, timestamp=self.at(9))
+        moves = PhysicalPainEntry.objects.create(user=self.user, pain_level=4, timestamp=self.at(18))
+        moves.timestamp = self.at(8, days=-1)
+        moves.save()
+        self.assertEqual(self.rollups(), {
+            self.DAY: (1, 2, 2, 2, 2, self.at(9)),
+            self.DAY - timedelta(days=1): (1, 4, 4, 4, 4, self.at(8, days=-1)),
+        })
+
+        # Moving the last entry off a day removes that day's rollup
+        stays.timestamp = self.at(10, days=-1)
+        stays.save()
+        self.assertEqual(self.rollups(), {self.DAY - timedelta(days=1): (2, 2, 4, 6, 2, self.at(10, days=-1))})
+
+    def test_delete(self):
+        low = PhysicalPainEntry.objects.create(user=self.user, pain_level=1, timestamp=self.at(9))
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=3, timestamp=self.at(12))
+        latest = PhysicalPainEntry.objects.create(user=self.user, pain_level=2, timestamp=self.at(18))
+        latest.delete()
+        self.assertEqual(self.rollups(), {self.DAY: (2, 1, 3, 4, 3, self.at(12))})
+        low.delete()
+        self.assertEqual(self.rollups(), {self.DAY: (1, 3, 3, 3, 3, self.at(12))})
+        PhysicalPainEntry.objects.filter(user=self.user).delete()
+        self.assertEqual(self.rollups(), {})
+
+    def test_rebuild_matches_a_from_scratch_aggregate(self):
+        for kind in (DailySymptomRollup.KIND_PAIN, DailySymptomRollup.KIND_MENTAL):
+            with self.subTest(kind=kind):
+                model, field = ROLLUP_SOURCES[kind]
+                # bulk_create skips the signals, so these days have no rollups yet
+                model.objects.bulk_create(
+                    model(user=self.user, timestamp=self.at(hour, days=hour % 3), **{field: hour % 4 + 1})
+                    for hour in range(24)
+                )
+                # Ties on the last timestamp go to the highest id
+                model.objects.create(user=self.user, timestamp=self.at(23, days=2), **{field: 1})
+                DailySymptomRollup.objects.filter(user=self.user, kind=kind).update(total=0, last_value=0)
+
+                for date in self.from_scratch(kind):
+                    DailySymptomRollup.rebuild(kind, self.user.pk, date)
+                self.assertEqual(self.rollups(kind), self.from_scratch(kind))
+                self.assertEqual(len(self.rollups(kind)), 3)
+
+                # A day with no entries left loses its rollup
+                model.objects.filter(user=self.user, timestamp__date=self.DAY).delete()
+                DailySymptomRollup.rebuild(kind, self.user.pk, self.DAY)
+                self.assertEqual(self.rollups(kind), self.from_scratch(kind))
+
+    def test_deletes_rebuild_each_day_once(self):
+        PhysicalPainEntry.objects.bulk_create(
+            PhysicalPainEntry(user=self.user, pain_level=hour % 4 + 1, timestamp=self.at(hour, days=hour % 2))
+            for hour in range(20)
+        )
+        DailySymptomRollup.rebuild_for_entries(DailySymptomRollup.KIND_PAIN, PhysicalPainEntry.objects.all())
+        rebuild = DailySymptomRollup.rebuild
+        with patch.object(DailySymptomRollup, 'rebuild', wraps=rebuild) as rebuilt:
+            PhysicalPainEntry.objects.filter(timestamp__hour__gte=4).delete()
+            self.assertEqual(rebuilt.call_count, 2)
+            self.assertEqual(self.rollups(), self.from_scratch())
+
+            # Rollups are deleted with their user, not rebuilt
+            rebuilt.reset_mock()
+            self.user.delete()
+            rebuilt.assert_not_called()
+        self.assertFalse(DailySymptomRollup.objects.exists())
+
+    def test_backfill_migration_matches_a_from_scratch_aggregate(self):
+        migration = import_module('symptomtracker.migrations.0006_dailysymptomrollup')
+        other = User.objects.create_user('other', password='Str0ng-pass!')
+        for kind, (model, field) in ROLLUP_SOURCES.items():
+            model.objects.bulk_create(
+                model(user=user, timestamp=self.at(hour, days=hour % 3), **{field: hour % 4 + 1})
+                for user in (self.user, other) for hour in range(24)
+            )
+        DailySymptomRollup.objects.all().delete()
+
+        # A batch per day, so the rollups are written as the rows stream past
+        with patch.object(migration, 'BACKFILL_BATCH_SIZE', 1):
+            migration.backfill_daily_rollups(apps, None)
+        for kind in ROLLUP_SOURCES:
+            with self.subTest(kind=kind):
+                self.assertEqual(self.rollups(kind), self.from_scratch(kind))
+                self.assertEqual(len(self.rollups(kind)), 3)
+        self.assertEqual(DailySymptomRollup.objects.filter(user=other).count(), 6)
+
+
+class QueryPlanTests(APITestCase):
+    """Run each hot endpoint, EXPLAIN every entry query it issued and reject
+    plans that scan a whole table or sort in a temporary B-tree."""
+
+    HOT_ENDPOINTS = [
+        '/api/physical-pain/',
+        '/api/physical-pain/recent/',
+        '/api/mental-wellness/',
+        '/api/mental-wellness/recent/',
+        '/api/diary/',
+        '/api/home-data/',
+        '/api/data-analysis/pain_trends/?days=365',
+        '/api/data-analysis/mental_wellness_trends/?days=365',
+        '/api/data-analysis/statistics/?days=365',
+        '/api/search/?q=entry',
+        '/api/search/?q=entry+7',
+        '/api/sync/',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='Str0ng-pass!')
+        other = User.objects.create_user('neighbour', password='Str0ng-pass!')
+        seed_entries(cls.user, 50)
+        seed_entries(other, 50)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan assertions are written against SQLite EXPLAIN QUERY PLAN output')
+
+        for url in self.HOT_ENDPOINTS:
+            if np is None and url.startswith(STATISTICS_PATH):
+                continue
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+                entry_queries = [
+                    q['sql'] for q in ctx.captured_queries
+                    if q['sql'].startswith('SELECT') and any(table in q['sql'] for table in ENTRY_TABLES)
+                ]
+                self.assertTrue(entry_queries, f'{url} issued no entry queries')
+
+                for sql in entry_queries:
+                    plan = self.explain(sql)
+                    for step in plan:
+                        # SCAN subquery reads a derived table, e.g. a capped COUNT(*)
+                        self.assertFalse(step.startswith('SCAN') and step != 'SCAN subquery', f'Full scan in {url}: {plan}\n{sql}')
+                        self.assertNotIn('TEMP B-TREE', step, f'In-memory sort in {url}: {plan}\n{sql}')
+
+    def test_deep_pages_seek_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan assertions are written against SQLite EXPLAIN QUERY PLAN output')
+
+        second = self.client.get('/api/physical-pain/?page_size=10').json()['next']
+        for link, url in (('next', second), ('previous', self.client.get(second).json()['previous'])):
+            with self.subTest(link=link):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.client.get(url)
+                sql = next(q['sql'] for q in ctx.captured_queries if 'symptomtracker_physicalpainentry' in q['sql'])
+                self.assertNotIn('OFFSET', sql)
+                # One range seek on the (user, -timestamp, -id) index, in index order
+                [step] = self.explain(sql)
+                self.assertRegex(step, r'^SEARCH .* USING INDEX pain_user_timestamp_idx \(user_id=\? AND timestamp[<>]\?\)$')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserSaveQueryCountTests(APITestCase):
+    """Profile and settings rows are written once at registration and never
+    re-saved by an unrelated user.save()."""
+
+    password = 'Str0ng-pass!'
+
+    def setUp(self):
+        self.user = User.objects.create_user('counted', password=self.password)
+
+    def test_register(self):
+        payload = {
+            'username': 'newcomer',
+            'password': self.password,
+            'password2': self.password,
+            'email': 'newcomer@example.com',
+            'first_name': 'New',
+            'last_name': 'Comer',
+            'date_of_birth': '1990-01-01',
+        }
+        # Unique username check, user/profile/change counter/settings INSERTs,
+        # the settings' change number and the date of birth UPDATE in one
+        # transaction, outstanding refresh token INSERT
+        with self.assertNumQueries(REGISTER_QUERIES):
+            response = self.client.post('/api/auth/register/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user']['profile']['date_of_birth'], '1990-01-01')
+
+    def test_login(self):
+        # User lookup joined to its profile and settings, outstanding token INSERT
+        with self.assertNumQueries(LOGIN_QUERIES):
+            response = self.client.post('/api/auth/login/', {'username': 'counted', 'password': self.password}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_change_password(self):
+        self.client.force_authenticate(self.user)
+        payload = {'old_password': self.password, 'new_password': 'An0ther-pass!', 'confirm_password': 'An0ther-pass!'}
+        # A single UPDATE of the user row; profile and settings are untouched
+        with self.assertNumQueries(CHANGE_PASSWORD_QUERIES):
+            response = self.client.put('/api/auth/change-password/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def authenticate(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_profile_update(self):
+        self.authenticate()
+        # Auth lookup with profile and settings, then an UPDATE of only the
+        # changed user column and of only the changed profile column, each
+        # moving the user's data version on
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                '/api/profile/', {'first_name': 'Counted', 'profile': {'phone_number': '555-0100'}}, format='json'
+            )
+        self.assertEqual(len(queries), PROFILE_UPDATE_QUERIES)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['first_name'], 'Counted')
+        self.assertEqual(response.data['profile']['phone_number'], '555-0100')
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE') and 'symptomtracker_changesequence' not in query['sql']
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('password' not in sql and 'user_id' not in sql for sql in updates))
+        self.assertEqual(User.objects.get(pk=self.user.pk).profile.phone_number, '555-0100')
+
+        # Invalid profile data leaves the user fields unwritten
+        response = self.client.patch('/api/profile/', {'first_name': 'Changed', 'profile': {'date_of_birth': 'soon'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Counted')
+
+    def test_settings_update(self):
+        self.authenticate()
+        with self.assertNumQueries(SETTINGS_UPDATE_QUERIES):
+            response = self.client.patch('/api/settings/', {'dark_mode': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['settings']['dark_mode'])
+        # Plus the taken-username check, an UPDATE of the username alone and
+        # the data version it moves
+        with self.assertNumQueries(SETTINGS_USERNAME_UPDATE_QUERIES):
+            response = self.client.patch('/api/settings/', {'dark_mode': False, 'username': 'renamed'}, format='json')
+        self.assertEqual(response.data['username'], 'renamed')
+        self.assertFalse(User.objects.get(pk=self.user.pk).settings.dark_mode)
+
+    def test_user_save_persists_dirty_profile_only(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.profile.phone_number = '555-0100'
+        self.assertFalse(user.settings.dark_mode)  # loaded but left unchanged
+        # UPDATE of the user and of the changed profile column only, and of
+        # the data version after each
+        with self.assertNumQueries(4):
+            user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).phone_number, '555-0100')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchmarkQueryRegressionTests(APITestCase):
+    """Query counts are deterministic, so the benchmark's small sizes run as a
+    test: no endpoint may issue more queries than its checked-in budget, or
+    more queries for a longer history (an N+1)."""
+
+    def test_query_counts_against_baseline(self):
+        endpoints = [endpoint for endpoint in ENDPOINTS if np is not None or not endpoint.path.startswith(STATISTICS_PATH)]
+        results = run_benchmark(sizes=(10, 60), iterations=1, endpoints=endpoints)
+        baseline = load_baseline()
+
+        self.assertEqual(set(results['10']) - set(baseline), set(), 'endpoints without a query budget')
+        self.assertEqual(compare({'10': results['10']}, baseline), [])
+        for name, metrics in results['60'].items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(metrics['queries'], results['10'][name]['queries'])
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class ObservingEmailBackend(BaseEmailBackend):
+    """Notes, at each send, whether a transaction is open and the outbox statuses."""
+    observed = []
+
+    def send_messages(self, email_messages):
+        statuses = sorted(PhysicianOutbox.objects.values_list('status', flat=True))
+        self.observed.append((connection.in_atomic_block, statuses))
+        return len(email_messages)
+
+
+class ObservingReminderBackend(BaseEmailBackend):
+    """Notes, at each send, whether a transaction is open and which reminders are due."""
+    observed = []
+
+    def send_messages(self, email_messages):
+        due = list(Notification.objects.filter(next_fire_at__lte=ReminderSchedulerTests.MONDAY_9AM).values_list('title', flat=True))
+        self.observed.append((connection.in_atomic_block, due))
+        return len(email_messages)
+
+
+class PhysicianDeliveryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('patient', password='Str0ng-pass!', first_name='Pat')
+        PhysicianInfo.objects.create(user=self.user, physician_name='Dr Who', physician_email='doctor@example.com')
+        self.client.force_authenticate(self.user)
+        self.pain = PhysicalPainEntry.objects.create(user=self.user, pain_level=3, notes='Sharp')
+        self.mood = MentalWellnessEntry.objects.create(user=self.user, wellness_level=2)
+        self.diary = DiaryEntry.objects.create(user=self.user, content='Rough night')
+
+    def queue_all(self):
+        for url in (
+            f'/api/physical-pain/{self.pain.pk}/send_to_physician/',
+            f'/api/mental-wellness/{self.mood.pk}/send_to_physician/',
+            f'/api/diary/{self.diary.pk}/send_to_physician/',
+        ):
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, 202)
+
+    def test_action_only_enqueues(self):
+        self.queue_all()
+        self.queue_all()
+        self.assertEqual(PhysicianOutbox.objects.filter(status='pending').count(), 3)
+        self.assertEqual(len(mail.outbox), 0)
+        self.pain.refresh_from_db()
+        self.assertFalse(self.pain.sent_to_physician)
+
+    def test_an_entry_is_queued_once_until_its_digest_goes_out(self):
+        self.queue_all()
+        claim_due(100, timezone.now())
+        # Queuing again while the digest is being sent changes nothing
+        self.queue_all()
+        self.assertEqual(list(PhysicianOutbox.objects.values_list('status', flat=True)), ['sending'] * 3)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PhysicianOutbox.objects.create(user=self.user, entry_type='pain', entry_id=self.pain.pk)
+        # A concurrent request that queued it between the lookup and the insert
+        queued = PhysicianOutbox.objects.get(entry_type='pain')
+        with patch('django.db.models.QuerySet.first', side_effect=[None, queued]):
+            self.assertEqual(enqueue_for_physician(self.pain, 'pain'), queued)
+        self.assertEqual(PhysicianOutbox.objects.count(), 3)
+
+    def test_requires_physician(self):
+        PhysicianInfo.objects.all().delete()
+        response = self.client.post(f'/api/diary/{self.diary.pk}/send_to_physician/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batches_entries_into_one_digest(self):
+        self.queue_all()
+        self.assertEqual(deliver_pending(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['doctor@example.com'])
+        self.assertIn('Severe pain', message.body)
+        self.assertIn('Rough night', message.body)
+        self.assertEqual(PhysicianOutbox.objects.filter(status='sent').count(), 3)
+        self.pain.refresh_from_db()
+        self.assertTrue(self.pain.sent_to_physician)
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    @override_settings(
+        EMAIL_BACKEND='symptomtracker.tests.FailingEmailBackend',
+        PHYSICIAN_DELIVERY_MAX_ATTEMPTS=2,
+        PHYSICIAN_DELIVERY_BACKOFF_SECONDS=60
+    )
+    def test_failures_back_off_then_give_up(self):
+        self.queue_all()
+        now = timezone.now()
+        self.assertEqual(deliver_pending(now=now), (0, 1))
+        row = PhysicianOutbox.objects.first()
+        self.assertEqual((row.status, row.attempts), ('pending', 1))
+        self.assertEqual(row.next_attempt_at, now + timedelta(seconds=60))
+
+        # Not due again until the backoff has elapsed
+        self.assertEqual(deliver_pending(now=now + timedelta(seconds=30)), (0, 0))
+        self.assertEqual(deliver_pending(now=now + timedelta(seconds=61)), (0, 1))
+        self.assertEqual(PhysicianOutbox.objects.filter(status='failed').count(), 3)
+
+
+class PhysicianDeliveryTransactionTests(TransactionTestCase):
+    """The mail server round trip happens outside any database transaction."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('patient', password='Str0ng-pass!')
+        PhysicianInfo.objects.create(user=self.user, physician_name='Dr Who', physician_email='doctor@example.com')
+        entry = PhysicalPainEntry.objects.create(user=self.user, pain_level=3)
+        PhysicianOutbox.objects.create(user=self.user, entry_type='pain', entry_id=entry.pk)
+
+    @override_settings(EMAIL_BACKEND='symptomtracker.tests.ObservingEmailBackend')
+    def test_claim_commits_before_sending(self):
+        ObservingEmailBackend.observed = []
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual(ObservingEmailBackend.observed, [(False, ['sending'])])
+        self.assertEqual(PhysicianOutbox.objects.get().status, 'sent')
+
+    @override_settings(PHYSICIAN_DELIVERY_CLAIM_SECONDS=300)
+    def test_an_abandoned_claim_is_taken_over(self):
+        now = timezone.now()
+        # A worker claims the row, then dies before recording anything
+        self.assertEqual(len(claim_due(100, now)), 1)
+        self.assertEqual(deliver_pending(now=now + timedelta(seconds=60)), (0, 0))
+        self.assertEqual(deliver_pending(now=now + timedelta(seconds=301)), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class ReminderSchedulerTests(TestCase):
+    # A Monday
+    MONDAY_9AM = datetime(2025, 3, 3, 9, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = User.objects.create_user('reminded', password='Str0ng-pass!', email='me@example.com')
+
+    def reminder(self, **kwargs):
+        fields = dict(
+            user=self.user, notification_type='medication', title='Pills',
+            message='Take your pills', time=dt_time(8, 30), days='Mon,Wed'
+        )
+        fields.update(kwargs)
+        return Notification.objects.create(**fields)
+
+    def test_next_fire_time(self):
+        self.assertEqual(next_fire_time(dt_time(8, 30), 'Mon,Wed', self.MONDAY_9AM), datetime(2025, 3, 5, 8, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_fire_time(dt_time(10, 0), 'monday', self.MONDAY_9AM), datetime(2025, 3, 3, 10, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_fire_time(dt_time(8, 30), 'Mon', self.MONDAY_9AM), datetime(2025, 3, 10, 8, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_fire_time(dt_time(8, 30), '', self.MONDAY_9AM), datetime(2025, 3, 4, 8, 30, tzinfo=dt_timezone.utc))
+        self.assertIsNone(next_fire_time(dt_time(8, 30), 'Someday', self.MONDAY_9AM))
+
+    def test_save_maintains_next_fire_at(self):
+        reminder = self.reminder()
+        self.assertIsNotNone(reminder.next_fire_at)
+        reminder.is_active = False
+        reminder.save(update_fields=['is_active'])
+        reminder.refresh_from_db()
+        self.assertIsNone(reminder.next_fire_at)
+
+    def test_only_schedule_edits_reschedule(self):
+        reminder = self.reminder()
+        Notification.objects.filter(pk=reminder.pk).update(next_fire_at=self.MONDAY_9AM)
+        reminder.refresh_from_db()
+        # A due occurrence survives an edit to the wording
+        reminder.title = 'Vitamins'
+        reminder.save()
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.next_fire_at, self.MONDAY_9AM)
+
+        reminder.days = 'Tue'
+        reminder.save(update_fields=['days'])
+        reminder.refresh_from_db()
+        self.assertGreater(reminder.next_fire_at, timezone.now())
+
+    def test_firing_leaves_the_data_version_alone(self):
+        reminder = self.reminder()
+        Notification.objects.filter(pk=reminder.pk).update(next_fire_at=self.MONDAY_9AM)
+        version = ChangeSequence.current(self.user.pk)
+        self.assertEqual(fire_due_reminders(now=self.MONDAY_9AM), 1)
+        self.assertEqual(ChangeSequence.current(self.user.pk), version)
+        self.assertEqual(Notification.objects.get(pk=reminder.pk).change_seq, reminder.change_seq)
+
+    def test_fires_due_reminders_and_reschedules(self):
+        due = self.reminder()
+        later = self.reminder(title='Later')
+        Notification.objects.filter(pk=due.pk).update(next_fire_at=self.MONDAY_9AM - timedelta(minutes=30))
+        Notification.objects.filter(pk=later.pk).update(next_fire_at=self.MONDAY_9AM + timedelta(hours=1))
+
+        call_command('run_reminder_scheduler', now=self.MONDAY_9AM.isoformat(), stdout=StringIO())
+
+        self.assertEqual([message.subject for message in mail.outbox], ['Pills'])
+        due.refresh_from_db()
+        self.assertEqual(due.last_fired_at, self.MONDAY_9AM)
+        self.assertEqual(due.next_fire_at, datetime(2025, 3, 5, 8, 30, tzinfo=dt_timezone.utc))
+        # Nothing left due at the same instant
+        self.assertEqual(fire_due_reminders(now=self.MONDAY_9AM), 0)
+
+    def test_respects_notification_preferences(self):
+        self.user.profile.notification_preference = 'sms'
+        self.user.profile.save()
+        reminder = self.reminder()
+        Notification.objects.filter(pk=reminder.pk).update(next_fire_at=self.MONDAY_9AM)
+
+        self.assertEqual(fire_due_reminders(now=self.MONDAY_9AM), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class ReminderTransactionTests(TransactionTestCase):
+    @override_settings(EMAIL_BACKEND='symptomtracker.tests.ObservingReminderBackend')
+    def test_claim_commits_before_sending(self):
+        user = User.objects.create_user('reminded', password='Str0ng-pass!', email='me@example.com')
+        reminder = Notification.objects.create(
+            user=user, notification_type='medication', title='Pills',
+            message='Take your pills', time=dt_time(8, 30), days='Mon,Wed'
+        )
+        Notification.objects.filter(pk=reminder.pk).update(next_fire_at=ReminderSchedulerTests.MONDAY_9AM)
+        ObservingReminderBackend.observed = []
+
+        self.assertEqual(fire_due_reminders(now=ReminderSchedulerTests.MONDAY_9AM), 1)
+        # Sent outside any transaction, with the reminder already moved on
+        self.assertEqual(ObservingReminderBackend.observed, [(False, [])])
+
+
+class EagerJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('eager', password='Str0ng-pass!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_one_query_loads_the_user_settings_and_data_version(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/settings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        for table in ('symptomtracker_userprofile', 'symptomtracker_usersettings', 'symptomtracker_changesequence'):
+            self.assertIn(f'JOIN "{table}"', queries[0]['sql'])
+
+    def test_writes_by_other_workers_apply_at_once(self):
+        etag = self.client.get('/api/profile/')['ETag']
+        # A queryset update skips the signals, as a write in another process
+        # would; only the change sequence it moves is shared
+        UserProfile.objects.filter(user=self.user).update(phone_number='555-0100')
+        ChangeSequence.bump(self.user.pk)
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['profile']['phone_number'], '555-0100')
+
+    # simplejwt modules keep the api_settings they imported, so override_settings cannot reach them
+    @patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_credentials_changed_by_other_workers_apply_at_once(self):
+        view = AsyncTrendView.as_view(kind=DailySymptomRollup.KIND_PAIN, label='Pain Level')
+        # Carries the password hash claim that a password change revokes
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        def sync_status():
+            return self.client.get('/api/settings/').status_code
+
+        def async_status():
+            request = AsyncRequestFactory().get('/api/data-analysis/pain_trends/', headers={'Authorization': f'Bearer {token}'})
+            return async_to_sync(view)(request).status_code
+
+        for get_status in (sync_status, async_status):
+            with self.subTest(view=get_status.__name__):
+                User.objects.filter(pk=self.user.pk).update(is_active=True, password=self.user.password)
+                self.assertEqual(get_status(), 200)
+                # A queryset update skips the signals, as a write in another process would
+                User.objects.filter(pk=self.user.pk).update(is_active=False)
+                self.assertEqual(get_status(), 401)
+                User.objects.filter(pk=self.user.pk).update(is_active=True, password=make_password('An0ther-pass!'))
+                self.assertEqual(get_status(), 401)
+
+
+class ConditionalGetTests(APITestCase):
+    PATHS = [
+        '/api/profile/',
+        '/api/settings/',
+        '/api/home-data/',
+        '/api/notifications/',
+        '/api/physical-pain/recent/',
+        '/api/mental-wellness/recent/',
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('etag', password='Str0ng-pass!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        seed_entries(self.user, 10)
+
+    def etags(self):
+        return {path: self.client.get(path)['ETag'] for path in self.PATHS}
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_resources_answer_304_without_reading_them(self):
+        for path, etag in self.etags().items():
+            with self.subTest(path=path):
+                # Just the authentication query, which reads the data version
+                with self.assertNumQueries(1):
+                    response = self.revalidate(path, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(self.revalidate(path, f'"stale", W/{etag}').status_code, 304)
+                self.assertEqual(self.revalidate(path, '"stale"').status_code, 200)
+
+    def test_writes_to_the_users_rows_change_the_etag(self):
+        other = User.objects.create_user('other', password='Str0ng-pass!')
+        writes = [
+            lambda: PhysicalPainEntry.objects.create(user=other, pain_level=2),
+            lambda: PhysicalPainEntry.objects.create(user=self.user, pain_level=2),
+            lambda: self.client.post('/api/mental-wellness/batch/', [
+                {'wellness_level': 3, 'timestamp': timezone.now().isoformat(), 'idempotency_key': 'etag-1'}
+            ], format='json'),
+            lambda: self.client.patch('/api/settings/', {'dark_mode': True}, format='json'),
+            lambda: self.client.post('/api/notifications/', {
+                'notification_type': 'medication', 'title': 'Pill', 'message': 'Take it', 'time': '08:00', 'days': 'Mon'
+            }, format='json'),
+            lambda: DiaryEntry.objects.filter(user=self.user).first().delete(),
+            lambda: self.client.patch('/api/profile/', {'first_name': 'Renamed'}, format='json'),
+            lambda: self.client.patch('/api/settings/', {'username': 'etag-renamed'}, format='json'),
+            lambda: PhysicianInfo.objects.create(user=self.user, physician_name='Dr Who', physician_email='dr@example.com'),
+        ]
+        etags = self.etags()
+        for index, write in enumerate(writes):
+            write()
+            # Another user's write leaves these ETags alone
+            expected = 304 if index == 0 else 200
+            for path, etag in etags.items():
+                with self.subTest(write=index, path=path):
+                    self.assertEqual(self.revalidate(path, etag).status_code, expected)
+            etags = self.etags()
+        self.assertEqual(self.client.get('/api/settings/', HTTP_IF_NONE_MATCH=etags['/api/settings/']).status_code, 304)
+
+    def test_versions_survive_a_cache_flush(self):
+        etags = self.etags()
+        cache.clear()
+        for path, etag in etags.items():
+            self.assertEqual(self.revalidate(path, etag).status_code, 304)
+
+    def test_a_write_on_another_worker_changes_the_etag(self):
+        etags = self.etags()
+        # A second worker process has a cache of its own
+        other_worker = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other-worker'}}
+        with override_settings(CACHES=other_worker):
+            self.client.patch('/api/settings/', {'dark_mode': True}, format='json')
+            PhysicalPainEntry.objects.create(user=self.user, pain_level=3)
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.revalidate(path, etag).status_code, 200)
+
+    def test_logging_in_keeps_the_etags(self):
+        etags = self.etags()
+        self.client.post('/api/login/', {'username': 'etag', 'password': 'Str0ng-pass!'}, format='json')
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.revalidate(path, etag).status_code, 304)
+
+
+class HomeDataCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('home', password='Str0ng-pass!', first_name='Hana')
+        self.client.force_authenticate(self.user)
+
+    def latest_pain(self):
+        return self.client.get('/api/home-data/').json()['latest_entries']['physical']
+
+    def test_entry_writes_refresh_the_cached_payload(self):
+        self.assertIsNone(self.latest_pain())
+        entry = self.client.post('/api/physical-pain/', {'pain_level': 2, 'notes': 'first'}, format='json').json()
+        self.assertEqual(self.latest_pain()['notes'], 'first')
+        # Served from the cache: only the data version is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.latest_pain()['notes'], 'first')
+
+        self.client.patch(f"/api/physical-pain/{entry['id']}/", {'notes': 'edited'}, format='json')
+        self.assertEqual(self.latest_pain()['notes'], 'edited')
+        self.client.delete(f"/api/physical-pain/{entry['id']}/")
+        self.assertIsNone(self.latest_pain())
+
+    def test_a_write_on_another_worker_refreshes_the_payload(self):
+        self.assertIsNone(self.latest_pain())
+        other_worker = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other-worker'}}
+        with override_settings(CACHES=other_worker):
+            PhysicalPainEntry.objects.create(user=self.user, pain_level=3, notes='elsewhere')
+        self.assertEqual(self.latest_pain()['notes'], 'elsewhere')
+
+
+class BootstrapTests(APITestCase):
+    SECTIONS = {
+        'profile': '/api/profile/',
+        'settings': '/api/settings/',
+        'home_data': '/api/home-data/',
+        'physician_info': '/api/physician-info/',
+        'notifications': '/api/notifications/',
+        'emergency_contact': '/api/emergency-contact/',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bootstrap', first_name='Boot', password='Str0ng-pass!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        seed_entries(self.user, 5)
+        Notification.objects.bulk_create(
+            Notification(user=self.user, notification_type='medication', title=f'Pill {i}', message='Take it', time='08:00', days='Mon')
+            for i in range(60)
+        )
+
+    def test_sections_match_the_individual_endpoints(self):
+        for physician in (False, True):
+            if physician:
+                PhysicianInfo.objects.create(user=self.user, physician_name='Dr. Who', physician_email='dr@example.com')
+            data = self.client.get('/api/bootstrap/').json()
+            for key, path in self.SECTIONS.items():
+                with self.subTest(physician=physician, section=key):
+                    self.assertEqual(data[key], self.client.get(path).json())
+        self.assertIsNotNone(data['notifications']['next'])
+
+    def test_query_ceiling(self):
+        # Auth with the data version, the joined user fetch, today's entries
+        # and the notification page
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get('/api/bootstrap/').status_code, 200)
+        # Warm caches leave auth, the user fetch and the notification page
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/bootstrap/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/bootstrap/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class SyncTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('sync', password='Str0ng-pass!', email='sync@example.com')
+        PhysicianInfo.objects.create(user=self.user, physician_name='Dr Who', physician_email='doctor@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def sync(self, cursor=None, **params):
+        if cursor is not None:
+            params['cursor'] = cursor
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, data, section='changes'):
+        return {entry_type: [item if section == 'deleted' else item['id'] for item in items]
+                for entry_type, items in data[section].items() if items}
+
+    def test_full_then_incremental_sync(self):
+        pain = self.client.post('/api/physical-pain/', {'pain_level': 2, 'notes': 'knee'}, format='json').json()
+        diary = self.client.post('/api/diary/', {'content': 'Long day'}, format='json').json()
+        reminder = self.client.post('/api/notifications/', {
+            'notification_type': 'medication', 'title': 'Pill', 'message': 'Take it', 'time': '08:00', 'days': 'Mon'
+        }, format='json').json()
+
+        full = self.sync()
+        self.assertFalse(full['has_more'])
+        self.assertEqual(self.ids(full), {'pain': [pain['id']], 'diary': [diary['id']], 'notification': [reminder['id']]})
+        self.assertEqual(full['changes']['pain'][0], self.client.get(f"/api/physical-pain/{pain['id']}/").json())
+        self.assertEqual(full['changes']['notification'][0], self.client.get(f"/api/notifications/{reminder['id']}/").json())
+        self.assertEqual(full['settings'], self.client.get('/api/settings/').json())
+
+        # Nothing changed: only the authentication query, with the change counter
+        with self.assertNumQueries(1):
+            unchanged = self.sync(full['cursor'])
+        self.assertEqual(unchanged['cursor'], full['cursor'])
+        self.assertEqual(self.ids(unchanged), {})
+        self.assertIsNone(unchanged['settings'])
+
+        # Edits, deletes, batch uploads and the bulk writers all show up
+        self.client.patch(f"/api/physical-pain/{pain['id']}/", {'pain_level': 3}, format='json')
+        self.client.delete(f"/api/diary/{diary['id']}/")
+        batch = self.client.post('/api/mental-wellness/batch/', [
+            {'wellness_level': 4, 'timestamp': timezone.now().isoformat(), 'idempotency_key': 'sync-1'}
+        ], format='json').json()
+        self.client.patch('/api/settings/', {'dark_mode': True}, format='json')
+        # Firing is scheduler bookkeeping, so it is not a change
+        version = ChangeSequence.current(self.user.pk)
+        self.assertEqual(fire_due_reminders(now=timezone.now() + timedelta(days=8)), 1)
+        self.assertEqual(ChangeSequence.current(self.user.pk), version)
+        self.client.post(f"/api/physical-pain/{pain['id']}/send_to_physician/")
+        deliver_pending(now=timezone.now() + timedelta(minutes=1))
+
+        delta = self.sync(full['cursor'])
+        self.assertEqual(self.ids(delta), {'pain': [pain['id']], 'mental': [batch['results'][0]['id']]})
+        self.assertEqual(self.ids(delta, 'deleted'), {'diary': [diary['id']]})
+        self.assertEqual(delta['changes']['pain'][0]['pain_level'], 3)
+        self.assertTrue(delta['changes']['pain'][0]['sent_to_physician'])
+        self.assertTrue(delta['settings']['dark_mode'])
+        self.assertEqual(self.sync(delta['cursor'])['cursor'], delta['cursor'])
+
+    def test_pages_are_ordered_and_complete(self):
+        created = [self.client.post('/api/physical-pain/', {'pain_level': 1}, format='json').json()['id'] for _ in range(4)]
+        self.client.delete(f'/api/physical-pain/{created[0]}/')
+        created.append(self.client.post('/api/diary/', {'content': 'later'}, format='json').json()['id'])
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            data = self.sync(cursor, limit=2)
+            pages += 1
+            seen.extend((entry_type, item['id']) for entry_type, items in data['changes'].items() for item in items)
+            seen.extend(('deleted', object_id) for object_id in data['deleted']['pain'])
+            cursor = data['cursor']
+            if not data['has_more']:
+                break
+        # The settings row, three live pain entries, a tombstone and the diary entry
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            sorted(seen),
+            sorted([('pain', pk) for pk in created[1:4]] + [('deleted', created[0]), ('diary', created[4])])
+        )
+        self.assertEqual(self.client.get('/api/sync/', {'cursor': 'x'}).status_code, 400)
+
+    def test_deleting_the_user_leaves_no_tombstones(self):
+        self.client.post('/api/physical-pain/', {'pain_level': 1}, format='json')
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_pruned_tombstones_require_a_full_resync(self):
+        entries = [self.client.post('/api/physical-pain/', {'pain_level': 2}, format='json').json() for _ in range(3)]
+        before = self.sync()['cursor']
+        self.client.delete(f"/api/physical-pain/{entries[0]['id']}/")
+        self.client.delete(f"/api/physical-pain/{entries[1]['id']}/")
+        between = self.sync(before)['cursor']
+        self.client.delete(f"/api/physical-pain/{entries[2]['id']}/")
+        after = self.sync(between)['cursor']
+        # The first two deletions fall outside the retention window
+        first_two = Tombstone.objects.filter(object_id__in=[entries[0]['id'], entries[1]['id']])
+        first_two.update(deleted_at=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1))
+        other = User.objects.create_user('other', password='Str0ng-pass!')
+        PhysicalPainEntry.objects.create(user=other, pain_level=1).delete()
+
+        out = StringIO()
+        call_command('prune_tombstones', batch_size=1, stdout=out)
+        self.assertIn('Pruned 2 tombstone(s); 2 remain', out.getvalue())
+
+        response = self.client.get('/api/sync/', {'cursor': before})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['code'], 'resync_required')
+        # Cursors past the pruned deletions still sync incrementally
+        self.assertEqual(self.ids(self.sync(between), 'deleted'), {'pain': [entries[2]['id']]})
+        self.assertEqual(self.sync(after)['cursor'], after)
+        # A full sync needs no tombstones
+        full = self.sync()
+        self.assertEqual(self.ids(full), {})
+        self.assertEqual(self.ids(full, 'deleted'), {'pain': [entries[2]['id']]})
+        self.assertEqual(other.change_sequence.pruned_through, 0)
+
+
+class EntryPaginationTests(APITestCase):
+    START = datetime(2025, 1, 6, 8, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = User.objects.create_user('pager', password='Str0ng-pass!')
+        self.client.force_authenticate(self.user)
+
+    def create(self, timestamps):
+        PhysicalPainEntry.objects.bulk_create(
+            PhysicalPainEntry(user=self.user, pain_level=2, timestamp=timestamp) for timestamp in timestamps
+        )
+        return list(PhysicalPainEntry.objects.filter(user=self.user).order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def get(self, url):
+        return self.client.get(url).json()
+
+    def ids(self, page):
+        return [entry['id'] for entry in page['results']]
+
+    def walk(self, url, link='next'):
+        pages = []
+        while url:
+            page = self.get(url)
+            pages.append(self.ids(page))
+            url = page[link]
+        return pages
+
+    def test_first_page_and_links(self):
+        expected = self.create(self.START - timedelta(hours=i) for i in range(7))
+        first = self.get('/api/physical-pain/?page_size=3')
+        self.assertEqual(self.ids(first), expected[:3])
+        self.assertIsNone(first['previous'])
+        self.assertNotIn('count', first)
+
+        second = self.get(first['next'])
+        self.assertEqual(self.ids(second), expected[3:6])
+        self.assertEqual(self.ids(self.get(second['previous'])), expected[:3])
+        third = self.get(second['next'])
+        self.assertEqual(self.ids(third), expected[6:])
+        self.assertIsNone(third['next'])
+        self.assertEqual(self.ids(self.get(third['previous'])), expected[3:6])
+
+    def test_page_size_is_capped(self):
+        expected = self.create(self.START - timedelta(minutes=i) for i in range(510))
+        for page_size, count in (('1000', 500), ('500', 500), ('7', 7), ('0', 50), ('many', 50)):
+            with self.subTest(page_size=page_size):
+                page = self.get(f'/api/physical-pain/?page_size={page_size}')
+                self.assertEqual(self.ids(page), expected[:count])
+                self.assertIsNotNone(page['next'])
+
+    def test_entries_sharing_a_timestamp(self):
+        # Ties straddle page boundaries, and one fills whole pages by itself
+        timestamps = [self.START] * 5 + [self.START - timedelta(hours=1)] * 2 + [self.START - timedelta(hours=2)]
+        expected = self.create(timestamps)
+        for page_size in (1, 2, 3, 4):
+            with self.subTest(page_size=page_size):
+                pages = self.walk(f'/api/physical-pain/?page_size={page_size}')
+                self.assertEqual(sum(pages, []), expected)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+                # And back again from the last page
+                last = self.get(f'/api/physical-pain/?page_size={page_size}')
+                while last['next']:
+                    last = self.get(last['next'])
+                self.assertEqual(self.walk(last['previous'], link='previous'), pages[-2::-1])
+
+    def test_malformed_cursors_are_rejected(self):
+        self.create([self.START])
+        for cursor in ('not-base64!', 'cj0x', 'cD0xJnA9Mg==', 'bz0yJnA9MQ==', 'cD1ub3QtYS1kYXRlJnA9MQ=='):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/physical-pain/', {'cursor': cursor}).status_code, 404)
+
+
+class BatchCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('offline', password='Str0ng-pass!')
+        self.client.force_authenticate(self.user)
+        self.timestamp = timezone.now() - timedelta(hours=2)
+
+    def item(self, key, level=3, **extra):
+        return {'pain_level': level, 'timestamp': self.timestamp.isoformat(), 'idempotency_key': key, **extra}
+
+    def post(self, items):
+        return self.client.post('/api/physical-pain/batch/', items, format='json')
+
+    def test_created_duplicate_and_invalid_results(self):
+        first = self.post([self.item('a'), self.item('b', level=2)]).json()['results']
+        self.assertEqual([result['status'] for result in first], ['created', 'created'])
+
+        response = self.post([
+            self.item('b'),
+            self.item('c', level=9),
+            {'pain_level': 1, 'timestamp': self.timestamp.isoformat()},
+            'not an entry',
+            self.item('d', notes='Back'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([(result['index'], result['status']) for result in results], [
+            (0, 'duplicate'), (1, 'invalid'), (2, 'invalid'), (3, 'invalid'), (4, 'created'),
+        ])
+        # A duplicate reports the entry its first upload created
+        self.assertEqual(results[0]['id'], first[1]['id'])
+        self.assertIn('pain_level', results[1]['errors'])
+        self.assertIn('idempotency_key', results[2]['errors'])
+        created = PhysicalPainEntry.objects.get(pk=results[4]['id'])
+        self.assertEqual((created.user, created.notes, created.idempotency_key), (self.user, 'Back', 'd'))
+        self.assertEqual(
+            sorted(PhysicalPainEntry.objects.filter(user=self.user).values_list('idempotency_key', 'pain_level')),
+            [('a', 3), ('b', 2), ('d', 3)]
+        )
+
+        # The bulk insert still keeps the daily rollup in step
+        rollup = DailySymptomRollup.objects.get(user=self.user, kind=DailySymptomRollup.KIND_PAIN)
+        self.assertEqual((rollup.count, rollup.total), (3, 8))
+
+    def test_the_same_key_twice_in_one_batch(self):
+        results = self.post([self.item('same'), self.item('same', level=1)]).json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'duplicate'])
+        self.assertEqual(results[0]['id'], results[1]['id'])
+        self.assertEqual(PhysicalPainEntry.objects.get(user=self.user).pain_level, 3)
+
+    def test_keys_taken_by_a_concurrent_upload_are_duplicates(self):
+        bulk_create = QuerySet.bulk_create
+        rivals = []
+
+        def racing_bulk_create(queryset, objs, **kwargs):
+            # Another upload inserts 'raced' after this one looked the keys up
+            if queryset.model is PhysicalPainEntry and not rivals:
+                rivals.append(PhysicalPainEntry.objects.create(
+                    user=self.user, pain_level=1, notes='Rival knee', timestamp=self.timestamp, idempotency_key='raced'
+                ))
+            return bulk_create(queryset, objs, **kwargs)
+
+        with patch.object(QuerySet, 'bulk_create', racing_bulk_create):
+            results = self.post([self.item('raced', notes='Mine elbow'), self.item('fresh')]).json()['results']
+        rival = rivals[0]
+        self.assertEqual([result['status'] for result in results], ['duplicate', 'created'])
+        self.assertEqual(results[0]['id'], rival.pk)
+
+        # The rival row keeps its change number, and its postings are its own
+        stored = PhysicalPainEntry.objects.get(pk=rival.pk)
+        self.assertEqual((stored.notes, stored.change_seq), ('Rival knee', rival.change_seq))
+        terms = set(SearchPosting.objects.filter(entry_type='pain', entry_id=rival.pk).values_list('term', flat=True))
+        self.assertEqual(terms, {'rival', 'knee'})
+        rollup = DailySymptomRollup.objects.get(user=self.user, kind=DailySymptomRollup.KIND_PAIN)
+        self.assertEqual((rollup.count, rollup.total), (2, 4))
+
+    def test_keys_are_per_user(self):
+        other = User.objects.create_user('other', password='Str0ng-pass!')
+        PhysicalPainEntry.objects.create(user=other, pain_level=1, idempotency_key='shared')
+        results = self.post([self.item('shared')]).json()['results']
+        self.assertEqual(results[0]['status'], 'created')
+
+    @override_settings(BATCH_CREATE_MAX_ITEMS=2)
+    def test_rejects_oversized_batches(self):
+        response = self.post([self.item(str(i)) for i in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'A batch may contain at most 2 entries.'})
+        self.assertFalse(PhysicalPainEntry.objects.exists())
+        self.assertEqual(self.post([self.item(str(i)) for i in range(2)]).status_code, 200)
+
+    def test_rejects_a_body_that_is_not_a_list(self):
+        for body in (self.item('a'), {}):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Expected a list of entries.'})
+        self.assertFalse(PhysicalPainEntry.objects.exists())
+        self.assertEqual(self.post([]).json(), {'results': []})
+
+
+class HistoryExportTests(APITestCase):
+    START = datetime(2025, 1, 6, 8, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', password='Str0ng-pass!')
+        self.client.force_authenticate(self.user)
+
+    def seed(self):
+        # Interleaved across the three tables, and created out of time order
+        at = lambda minutes: self.START + timedelta(minutes=minutes)
+        diary = DiaryEntry.objects.create(user=self.user, content='Line one\nsaid "ouch", twice', timestamp=at(30))
+        pain = PhysicalPainEntry.objects.create(user=self.user, pain_level=3, notes='Knee', timestamp=at(0))
+        mood = MentalWellnessEntry.objects.create(user=self.user, wellness_level=4, timestamp=at(20))
+        later = PhysicalPainEntry.objects.create(user=self.user, pain_level=1, timestamp=at(40), sent_to_physician=True)
+        other = User.objects.create_user('someone-else', password='Str0ng-pass!')
+        PhysicalPainEntry.objects.create(user=other, pain_level=4, timestamp=at(10))
+        return [
+            {'type': 'pain', 'id': pain.pk, 'timestamp': '2025-01-06T08:00:00Z', 'value': 3, 'text': 'Knee', 'sent_to_physician': False},
+            {'type': 'mental', 'id': mood.pk, 'timestamp': '2025-01-06T08:20:00Z', 'value': 4, 'text': None, 'sent_to_physician': False},
+            {'type': 'diary', 'id': diary.pk, 'timestamp': '2025-01-06T08:30:00Z', 'value': None, 'text': 'Line one\nsaid "ouch", twice', 'sent_to_physician': False},
+            {'type': 'pain', 'id': later.pk, 'timestamp': '2025-01-06T08:40:00Z', 'value': 1, 'text': None, 'sent_to_physician': True},
+        ]
+
+    def export(self, query='', **headers):
+        response = self.client.get(f'/api/export/{query}', **headers)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_is_the_default_and_ordered_across_types(self):
+        expected = self.seed()
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="symptom-history-\d{4}-\d{2}-\d{2}\.ndjson"$')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual([json.loads(line) for line in body.decode().splitlines()], expected)
+
+    def test_csv(self):
+        expected = self.seed()
+        response, body = self.export('?output=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(body.decode())))
+        self.assertEqual(rows[0], ['type', 'id', 'timestamp', 'value', 'text', 'sent_to_physician'])
+        self.assertEqual(rows[1:], [
+            [row['type'], str(row['id']), row['timestamp'], '' if row['value'] is None else str(row['value']),
+             row['text'] or '', str(row['sent_to_physician'])]
+            for row in expected
+        ])
+
+    def test_gzip_is_negotiated(self):
+        self.seed()
+        _, plain = self.export()
+        for query, headers in (('', {'HTTP_ACCEPT_ENCODING': 'gzip, deflate'}), ('?gzip=1', {})):
+            with self.subTest(query=query, headers=headers):
+                response, body = self.export(query, **headers)
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(gzip.decompress(body), plain)
+
+    def test_large_exports_are_streamed_in_chunks(self):
+        seed_entries(self.user, 40, start=self.START)
+        _, plain = self.export()
+        with patch('symptomtracker.export.FLUSH_BYTES', 256):
+            for query, decode in (('', bytes), ('?gzip=1', gzip.decompress)):
+                chunks = list(self.client.get(f'/api/export/{query}').streaming_content)
+                self.assertGreater(len(chunks), 1)
+                self.assertEqual(decode(b''.join(chunks)), plain)
+        timestamps = [json.loads(line)['timestamp'] for line in plain.decode().splitlines()]
+        self.assertEqual(len(timestamps), 120)
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_empty_export(self):
+        self.assertEqual(self.export()[1], b'')
+        self.assertEqual(self.export('?output=csv')[1], b'type,id,timestamp,value,text,sent_to_physician\r\n')
+        self.assertEqual(gzip.decompress(self.export('?gzip=1')[1]), b'')
+
+    def test_unknown_output(self):
+        response = self.client.get('/api/export/?output=xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': "Unknown output 'xml'. Choose from: csv, ndjson."})
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('archive', password='Str0ng-pass!')
+        self.client.force_authenticate(self.user)
+        # Morning, so all of the old entries fall on one day
+        old = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=400), dt_time(8)))
+        for i in range(5):
+            PhysicalPainEntry.objects.create(
+                user=self.user, pain_level=i % 4 + 1, notes=None if i == 2 else f'knee {i}', timestamp=old + timedelta(hours=i)
+            )
+            MentalWellnessEntry.objects.create(user=self.user, wellness_level=i + 1, timestamp=old + timedelta(hours=i))
+        DiaryEntry.objects.create(user=self.user, content='Slept badly again. ' * 20, timestamp=old)
+        for i in range(3):
+            PhysicalPainEntry.objects.create(user=self.user, pain_level=2, notes='recent', timestamp=timezone.now() - timedelta(hours=i))
+
+    def archive(self):
+        call_command('archive_entries', stdout=StringIO())
+
+    def pages(self, url, page_size):
+        items, url = [], f'{url}?page_size={page_size}'
+        while url:
+            data = self.client.get(url).json()
+            items.extend(data['results'])
+            url = data['next']
+        return items
+
+    def export(self):
+        return b''.join(self.client.get('/api/export/').streaming_content)
+
+    def test_archiving_moves_old_entries_and_reads_merge_them_back(self):
+        pain_list = self.pages('/api/physical-pain/', 50)
+        diary_list = self.pages('/api/diary/', 50)
+        export = self.export()
+        statistics = self.client.get(STATISTICS_PATH, {'days': 730}).json() if np is not None else None
+        trends = self.client.get('/api/data-analysis/pain_trends/', {'days': 730}).json()
+        synced = self.client.get('/api/sync/').json()['changes']
+
+        self.archive()
+
+        self.assertEqual(PhysicalPainEntry.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(MentalWellnessEntry.objects.exists())
+        self.assertFalse(DiaryEntry.objects.exists())
+        self.assertEqual(ArchivedEntry.objects.filter(user=self.user).count(), 11)
+        diary = ArchivedEntry.objects.get(entry_type='diary')
+        self.assertEqual(diary.codec, settings.ARCHIVE_CODEC)
+        self.assertLess(len(diary.text), len('Slept badly again. ' * 20))
+        # A move, not a deletion: no tombstones, and search no longer covers them
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertFalse(SearchPosting.objects.exclude(entry_type='pain').exists())
+
+        # Every page size walks across the hot rows into the archive the same way
+        for page_size in (50, 3, 2, 1):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.pages('/api/physical-pain/', page_size), pain_list)
+        self.assertEqual(self.pages('/api/diary/', 50), diary_list)
+        self.assertEqual(self.export(), export)
+        if np is not None:
+            self.assertEqual(self.client.get(STATISTICS_PATH, {'days': 730}).json(), statistics)
+        self.assertEqual(self.client.get('/api/data-analysis/pain_trends/', {'days': 730}).json(), trends)
+        self.assertEqual(self.client.get('/api/sync/').json()['changes'], synced)
+
+        # Archiving again finds nothing left to move
+        self.archive()
+        self.assertEqual(ArchivedEntry.objects.count(), 11)
+
+    def test_writes_next_to_archived_entries(self):
+        old = PhysicalPainEntry.objects.order_by('timestamp').first()
+        old.idempotency_key = 'offline-1'
+        old.save()
+        self.archive()
+
+        # A replayed upload of an archived entry is still a duplicate
+        timestamp = old.timestamp + timedelta(minutes=30)
+        results = self.client.post('/api/physical-pain/batch/', [
+            {'pain_level': 4, 'timestamp': old.timestamp.isoformat(), 'idempotency_key': 'offline-1'},
+            {'pain_level': 4, 'timestamp': timestamp.isoformat(), 'idempotency_key': 'offline-2'},
+        ], format='json').json()['results']
+        self.assertEqual([result['status'] for result in results], ['duplicate', 'created'])
+        self.assertEqual(results[0]['id'], old.pk)
+
+        # The backdated entry's day is rebuilt over its archived entries too
+        rollup = DailySymptomRollup.objects.get(
+            user=self.user, kind='pain', date=DailySymptomRollup.bucket_date(old.timestamp)
+        )
+        self.assertEqual((rollup.count, rollup.max_value, rollup.total), (6, 4, 15))
+        self.assertEqual(rollup.last_timestamp, old.timestamp + timedelta(hours=4))
+
+        # Archived entries cannot be edited
+        self.assertEqual(self.client.patch(f'/api/physical-pain/{old.pk}/', {'pain_level': 1}).status_code, 404)
+        with self.assertRaises(ImproperlyConfigured):
+            call_command('archive_entries', codec='brotli', stdout=StringIO())
+
+    def test_deleting_a_user_with_archived_and_live_entries_on_one_day(self):
+        old = PhysicalPainEntry.objects.order_by('timestamp').first().timestamp
+        self.archive()
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=3, timestamp=old + timedelta(minutes=30))
+        user_id = self.user.pk
+
+        self.user.delete()
+        self.assertFalse(DailySymptomRollup.objects.filter(user_id=user_id).exists())
+        self.assertFalse(ArchivedEntry.objects.filter(user_id=user_id).exists())
+        self.assertFalse(PhysicalPainEntry.objects.filter(user_id=user_id).exists())
+
+    def test_retrieving_and_deleting_archived_entries(self):
+        old_pain = PhysicalPainEntry.objects.order_by('timestamp', 'id').first()
+        old_diary = DiaryEntry.objects.get()
+        details = {
+            url: self.client.get(url).json()
+            for url in (f'/api/physical-pain/{old_pain.pk}/', f'/api/diary/{old_diary.pk}/')
+        }
+        day = DailySymptomRollup.bucket_date(old_pain.timestamp)
+        self.archive()
+
+        for url, detail in details.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).json(), detail)
+        # Another user's archive stays out of reach
+        self.client.force_authenticate(User.objects.create_user('stranger', password='Str0ng-pass!'))
+        self.assertEqual(self.client.get(f'/api/physical-pain/{old_pain.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/physical-pain/{old_pain.pk}/').status_code, 404)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/physical-pain/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/diary/99999/').status_code, 404)
+
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        self.assertEqual(self.client.delete(f'/api/physical-pain/{old_pain.pk}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/physical-pain/{old_pain.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/physical-pain/{old_pain.pk}/').status_code, 404)
+        self.assertNotIn(old_pain.pk, [entry['id'] for entry in self.pages('/api/physical-pain/', 50)])
+        self.assertEqual(ArchivedEntry.objects.filter(user=self.user, entry_type='pain').count(), 4)
+
+        # Synced clients learn it is gone, and its day's rollup drops it
+        self.assertEqual(self.client.get('/api/sync/', {'cursor': cursor}).json()['deleted']['pain'], [old_pain.pk])
+        rollup = DailySymptomRollup.objects.get(user=self.user, kind='pain', date=day)
+        self.assertEqual((rollup.count, rollup.total), (4, 10))
+
+
+class SQLitePragmaTests(TestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('PRAGMAs only apply to SQLite')
+
+    def pragmas(self, **overrides):
+        with tempfile.TemporaryDirectory() as directory:
+            tuned = connection.copy()
+            tuned.settings_dict['NAME'] = str(Path(directory) / 'pragmas.sqlite3')
+            with override_settings(SQLITE_PRAGMAS=dict(settings.SQLITE_PRAGMAS, **overrides)):
+                try:
+                    with tuned.cursor() as cursor:
+                        values = {}
+                        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                            cursor.execute(f'PRAGMA {name}')
+                            values[name] = cursor.fetchone()[0]
+                        return values
+                finally:
+                    tuned.close()
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 5000, 'mmap_size': 256 * 1024 * 1024, 'cache_size': -64000})
+    def test_new_connections_are_tuned_from_settings(self):
+        # The journal mode is left alone unless WAL is asked for
+        self.assertEqual(self.pragmas(), {
+            'journal_mode': 'delete',
+            'synchronous': 2,
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,
+        })
+        self.assertEqual(self.pragmas(busy_timeout=250)['busy_timeout'], 250)
+        wal = self.pragmas(**settings.SQLITE_WAL_PRAGMAS)
+        self.assertEqual((wal['journal_mode'], wal['synchronous']), ('wal', 1))
+
+
+@contextmanager
+def lagging_replica(user):
+    """Route replica reads to a 'lagging' alias that misses the user's
+    changes made from here on, served from the primary's tables."""
+    seen = ChangeSequence.current(user.pk)
+    fetch_all = QuerySet._fetch_all
+
+    def lagging_fetch_all(queryset):
+        if queryset._result_cache is None and queryset.db == 'lagging':
+            if issubclass(queryset.model, ChangeTracked):
+                queryset.query.add_q(Q(change_seq__lte=seen))
+            queryset._db = DEFAULT_DB_ALIAS
+        fetch_all(queryset)
+
+    with patch('symptomtracker.routers.replica_alias', return_value='lagging'), \
+            patch.object(QuerySet, '_fetch_all', lagging_fetch_all):
+        yield
+
+
+@override_settings(DATABASE_ROUTERS=['symptomtracker.routers.ReadReplicaRouter'])
+class ReadReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('replica', password='Str0ng-pass!')
+        self.client.force_authenticate(self.user)
+        seed_entries(self.user, 3)
+
+    def test_router_sends_only_marked_reads_to_the_replica(self):
+        router = ReadReplicaRouter()
+        with patch.dict(settings.DATABASES, replica=settings.DATABASES['default']):
+            self.assertEqual(router.db_for_read(PhysicalPainEntry), 'default')
+            with replica_reads():
+                self.assertEqual(router.db_for_read(PhysicalPainEntry), 'replica')
+                self.assertEqual(router.db_for_write(PhysicalPainEntry), 'default')
+            self.assertFalse(router.allow_migrate('replica', 'symptomtracker'))
+        # Without a replica the marked reads stay on the primary
+        with replica_reads():
+            self.assertEqual(router.db_for_read(PhysicalPainEntry), 'default')
+
+    def test_lists_analysis_and_export_read_from_the_replica(self):
+        pain = PhysicalPainEntry.objects.filter(user=self.user).first()
+        routed = {
+            '/api/physical-pain/': True,
+            '/api/diary/': True,
+            '/api/notifications/': False,
+            '/api/data-analysis/pain_trends/': True,
+            STATISTICS_PATH: True,
+            '/api/export/': True,
+            f'/api/physical-pain/{pain.pk}/': False,
+            '/api/physical-pain/recent/': False,
+            '/api/settings/': False,
+        }
+        if np is None:
+            del routed[STATISTICS_PATH]
+        for path, expected in routed.items():
+            with self.subTest(path=path), patch('symptomtracker.routers.replica_alias', return_value='default') as alias, \
+                    patch('symptomtracker.views.replica_alias', new=alias):
+                response = self.client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(alias.called, expected)
+
+    def test_conditional_reads_never_come_from_a_lagging_replica(self):
+        with lagging_replica(self.user):
+            self.client.post('/api/notifications/', {
+                'notification_type': 'medication', 'title': 'Pill', 'message': 'Take it', 'time': '08:00', 'days': 'Mon'
+            }, format='json')
+            pain = PhysicalPainEntry.objects.create(user=self.user, pain_level=2)
+            MentalWellnessEntry.objects.create(user=self.user, wellness_level=3)
+            self.assertNotIn(pain.pk, [row['id'] for row in self.client.get('/api/physical-pain/').json()['results']])
+            lagged = {path: self.client.get(path) for path in ConditionalGetTests.PATHS}
+        # Each ETag is answered with 304 from now on, so its body must be current
+        for path, response in lagged.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+                self.assertEqual(response.json(), self.client.get(path).json())
+
+    def test_conditional_views_cannot_read_from_the_replica(self):
+        class ReplicaConditionalView(APIView):
+            @conditional_get()
+            def get(self, request):
+                with replica_reads():
+                    return Response(list(PhysicalPainEntry.objects.values_list('id', flat=True)))
+
+        request = APIRequestFactory().get('/replica-conditional/')
+        force_authenticate(request, user=self.user)
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaConditionalView.as_view()(request)
+        # The guard ends with the handler
+        with replica_reads():
+            pass
+
+
+class AsyncReadViewTests(TestCase):
+    VIEWS = {
+        '/api/home-data/': AsyncHomeScreenDataView.as_view(),
+        '/api/physical-pain/recent/': AsyncRecentEntriesView.as_view(
+            model=PhysicalPainEntry, row_serializer=RowSerializer(PhysicalPainEntrySerializer)
+        ),
+        '/api/mental-wellness/recent/': AsyncRecentEntriesView.as_view(
+            model=MentalWellnessEntry, row_serializer=RowSerializer(MentalWellnessEntrySerializer)
+        ),
+        '/api/data-analysis/pain_trends/?days=7&stat=max': AsyncTrendView.as_view(
+            kind=DailySymptomRollup.KIND_PAIN, label='Pain Level'
+        ),
+        '/api/data-analysis/mental_wellness_trends/': AsyncTrendView.as_view(
+            kind=DailySymptomRollup.KIND_MENTAL, label='Mental Wellness'
+        ),
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async', password='Str0ng-pass!', first_name='Ada')
+        self.auth = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        seed_entries(self.user, 10)
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=3, notes='now')
+        MentalWellnessEntry.objects.create(user=self.user, wellness_level=4, notes='now')
+
+    def call(self, path, **headers):
+        request = AsyncRequestFactory().get(path, headers={name.replace('_', '-'): value for name, value in headers.items()})
+        return async_to_sync(self.VIEWS[path])(request)
+
+    def test_matches_the_sync_views(self):
+        for path in self.VIEWS:
+            with self.subTest(path=path):
+                cache.delete(home_data_cache_key(self.user.pk))
+                expected = self.client.get(path, HTTP_AUTHORIZATION=self.auth)
+                cache.delete(home_data_cache_key(self.user.pk))
+                response = self.call(path, Authorization=self.auth)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+                unauthenticated = self.call(path)
+                self.assertEqual(unauthenticated.status_code, 401)
+                self.assertEqual(unauthenticated.content, self.client.get(path).content)
+                self.assertEqual(unauthenticated['WWW-Authenticate'], 'Bearer realm="api"')
+
+    def test_home_screen_lookups_and_revalidation(self):
+        self.call('/api/physical-pain/recent/', Authorization=self.auth)
+        # Auth with the data version, and both entry lookups in one query
+        with self.assertNumQueries(2):
+            response = self.call('/api/home-data/', Authorization=self.auth)
+        self.assertEqual(json.loads(response.content)['latest_entries']['physical']['notes'], 'now')
+        with self.assertNumQueries(1):
+            revalidated = self.call('/api/home-data/', Authorization=self.auth, If_None_Match=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_export_streams_asynchronously_under_asgi(self):
+        expected = b''.join(self.client.get('/api/export/', HTTP_AUTHORIZATION=self.auth).streaming_content)
+        request = AsyncRequestFactory().get('/api/export/', headers={'Authorization': self.auth})
+        response = HistoryExportView.as_view()(request)
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(async_to_sync(read)(), expected)
+
+
+class RowSerializerTests(APITestCase):
+    SOURCES = [
+        ('/api/physical-pain/', PhysicalPainEntry, PhysicalPainEntrySerializer),
+        ('/api/mental-wellness/', MentalWellnessEntry, MentalWellnessEntrySerializer),
+        ('/api/diary/', DiaryEntry, DiaryEntrySerializer),
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user('rows', password='Str0ng-pass!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        seed_entries(self.user, 7, start=datetime(2024, 3, 10, 12, 30, 15, 250000, tzinfo=dt_timezone.utc))
+        PhysicalPainEntry.objects.create(user=self.user, pain_level=2, notes='Knee, "sharp" \u00e9')
+        MentalWellnessEntry.objects.filter(user=self.user).update(sent_to_physician=True)
+
+    def test_output_is_byte_identical_to_the_model_serializers(self):
+        renderer = JSONRenderer()
+        for zone in ('UTC', 'America/New_York'):
+            with timezone.override(zone):
+                for path, model, serializer_class in self.SOURCES:
+                    with self.subTest(zone=zone, model=model.__name__):
+                        queryset = model.objects.filter(user=self.user).order_by('-timestamp', '-id')
+                        rows = RowSerializer(serializer_class)
+                        self.assertEqual(
+                            renderer.render(rows.serialize(rows.values(queryset))),
+                            renderer.render(serializer_class(queryset, many=True).data)
+                        )
+
+    def test_list_and_recent_endpoints(self):
+        for path, model, serializer_class in self.SOURCES:
+            queryset = model.objects.filter(user=self.user).order_by('-timestamp', '-id')
+            expected = serializer_class(queryset, many=True).data
+            with self.subTest(path=path):
+                results, url = [], f'{path}?page_size=3'
+                while url:
+                    page = self.client.get(url).json()
+                    results.extend(page['results'])
+                    url = page['next']
+                self.assertEqual(results, json.loads(JSONRenderer().render(expected)))
+                if model is not DiaryEntry:
+                    self.assertEqual(self.client.get(f'{path}recent/').content, JSONRenderer().render(expected[:5]))
+
+
+class TrendEncodingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('columns', password='Str0ng-pass!')
+        self.auth = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        now = timezone.now()
+        for days_ago, levels in [(0, [3, 4]), (1, [2]), (4, [1, 2, 2]), (9, [5])]:
+            for level in levels:
+                PhysicalPainEntry.objects.create(user=self.user, pain_level=level, timestamp=now - timedelta(days=days_ago))
+
+    def test_days_is_validated_and_clamped(self):
+        for path in ('/api/data-analysis/pain_trends/', '/api/data-analysis/mental_wellness_trends/'):
+            with self.subTest(path=path):
+                response = self.client.get(path, {'days': 'abc'})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'days must be an integer.'})
+                # Far past the supported range, which once overflowed the date arithmetic
+                self.assertEqual(
+                    self.client.get(path, {'days': 10 ** 12}).json(),
+                    self.client.get(path, {'days': settings.ANALYTICS_MAX_DAYS}).json()
+                )
+        self.assertEqual(self.client.get('/api/data-analysis/pain_trends/', {'days': -5}).json()['labels'], [timezone.localdate().isoformat()])
+
+    def test_columns_carry_the_chart_data(self):
+        for stat in ('mean', 'max', 'count'):
+            with self.subTest(stat=stat):
+                chart = self.client.get(f'/api/data-analysis/pain_trends/?days=30&stat={stat}')
+                self.assertEqual(chart['Content-Type'], 'application/json')
+                chart = chart.data
+                columns = self.client.get(f'/api/data-analysis/pain_trends/?days=30&stat={stat}&format=columns').data
+                self.assertEqual(columns['label'], 'Pain Level')
+                self.assertEqual(columns['gaps'], [0, 5, 3, 1])
+
+                start = datetime.strptime(columns['start'], '%Y-%m-%d').date()
+                offsets = accumulate(columns['gaps'])
+                self.assertEqual([(start + timedelta(days=int(offset))).isoformat() for offset in offsets], chart['labels'])
+                self.assertEqual([value / columns['scale'] for value in columns['values']], chart['datasets'][0]['data'])
+
+        self.assertEqual(self.client.get('/api/data-analysis/pain_trends/?stat=mean&format=columns').data['values'], [500, 167, 200, 350])
+        columns = self.client.get('/api/data-analysis/mental_wellness_trends/?format=columns')
+        self.assertEqual(columns.data, {'label': 'Mental Wellness', 'start': None, 'gaps': [], 'scale': 100, 'values': []})
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack_is_negotiated_on_sync_and_async_views(self):
+        packed = self.client.get('/api/data-analysis/pain_trends/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        expected = self.client.get('/api/data-analysis/pain_trends/?format=columns').data
+        self.assertEqual(msgpack.unpackb(packed.content), expected)
+
+        view = AsyncTrendView.as_view(kind=DailySymptomRollup.KIND_PAIN, label='Pain Level')
+        request = AsyncRequestFactory().get('/api/data-analysis/pain_trends/', headers={
+            'Authorization': self.auth, 'Accept': 'application/msgpack'
+        })
+        response = async_to_sync(view)(request)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(response.content, packed.content)
+
+
+class RefreshTokenStoreTests(APITestCase):
+    def setUp(self):
+        blacklist_filter.clear()
+        self.user = User.objects.create_user('rotating', password='Str0ng-pass!')
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': str(token)})
+
+    def test_filter_skips_blacklist_query_but_rejects_rotated_tokens(self):
+        first = RefreshToken.for_user(self.user)
+        second = self.refresh(first).data['refresh']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.refresh(second)
+        self.assertEqual(response.status_code, 200)
+        lookups = [q['sql'] for q in queries if q['sql'].startswith('SELECT 1 AS "a" FROM "token_blacklist_blacklistedtoken"')]
+        self.assertEqual(lookups, [])
+
+        # Both rotated-out tokens are in the filter, so reuse falls through to the table
+        self.assertEqual(self.refresh(first).status_code, 401)
+        self.assertEqual(self.refresh(second).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_SYNC_SECONDS=0)
+    def test_tokens_blacklisted_by_other_workers_are_synced(self):
+        token = RefreshToken.for_user(self.user)
+        self.refresh(RefreshToken.for_user(self.user))
+        # bulk_create skips post_save, as if another process had blacklisted it
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))])
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_SYNC_SECONDS=3600)
+    def test_replays_within_the_sync_window_are_refused(self):
+        token = RefreshToken.for_user(self.user)
+        self.refresh(RefreshToken.for_user(self.user))
+        # Blacklisted by another worker after this one's filter last synced
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))])
+        outstanding = OutstandingToken.objects.count()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.refresh(token)
+        # The stale filter let the token through, but rotating it did not
+        lookups = [q['sql'] for q in queries if q['sql'].startswith('SELECT 1 AS "a" FROM "token_blacklist_blacklistedtoken"')]
+        self.assertEqual(lookups, [])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'token_not_valid')
+        self.assertEqual(OutstandingToken.objects.count(), outstanding)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': str(token)}).status_code, 400)
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        expired = [
+            OutstandingToken.objects.create(user=self.user, jti=f'expired-{n}', token='', expires_at=past)
+            for n in range(5)
+        ]
+        for token in expired[:3]:
+            BlacklistedToken.objects.create(token=token)
+        live = RefreshToken.for_user(self.user)
+        self.client.force_authenticate(self.user)
+        self.client.post('/api/auth/logout/', {'refresh': str(live)})
+
+        out = StringIO()
+        call_command('prune_tokens', batch_size=2, stdout=out)
+
+        self.assertIn('Pruned 5 outstanding and 3 blacklisted', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+    def test_metrics_are_admin_only(self):
+        self.refresh(RefreshToken.for_user(self.user))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/auth/token-metrics/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get('/api/auth/token-metrics/').data
+        self.assertEqual(data['tables'], {'outstanding': 2, 'blacklisted': 1, 'expired': 0})
+        self.assertGreaterEqual(data['refresh_latency']['count'], 1)
+        self.assertTrue(data['blacklist_filter']['enabled'])
+
+
+class LoginProtectionTests(APITestCase):
+    password = 'Str0ng-pass!'
+
+    def setUp(self):
+        failed_logins.clear()
+        self.user = User.objects.create_user('guarded', password=self.password)
+
+    def login(self, username='guarded', password=None, address='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/login/', {'username': username, 'password': password or self.password},
+            format='json', REMOTE_ADDR=address
+        )
+
+    @override_settings(LOGIN_FAILURE_LIMIT=3)
+    def test_failed_logins_are_refused_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login(password='wrong').status_code, 401)
+
+        # Refused from the counter alone: no user lookup, no hash
+        with self.assertNumQueries(0):
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Other accounts from the same address are still allowed
+        User.objects.create_user('neighbour', password=self.password)
+        self.assertEqual(self.login('neighbour').status_code, 200)
+
+    @override_settings(LOGIN_FAILURE_LIMIT=3)
+    def test_success_resets_the_username_count(self):
+        self.login(password='wrong')
+        self.login(password='wrong')
+        self.assertEqual(self.login().status_code, 200)
+        self.login(password='wrong')
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_iterations_come_from_settings_and_never_drop_below_djangos(self):
+        floor = PBKDF2PasswordHasher.iterations
+        hasher = ConfiguredPBKDF2PasswordHasher()
+        self.assertEqual(hasher.iterations, floor)
+        with self.settings(PASSWORD_HASH_ITERATIONS=floor // 2):
+            self.assertEqual(hasher.iterations, floor)
+        with self.settings(PASSWORD_HASH_ITERATIONS=floor + 100_000):
+            user = User.objects.create_user('configured', password=self.password)
+            self.assertEqual(hasher.decode(user.password)['iterations'], floor + 100_000)
+        # A stronger stored hash is not downgraded
+        self.assertFalse(hasher.must_update(user.password))
+
+    def test_login_metrics_are_admin_only(self):
+        self.login()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/auth/login-metrics/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get('/api/auth/login-metrics/').data
+        self.assertEqual(data['hasher']['iterations'], ConfiguredPBKDF2PasswordHasher().iterations)
+        self.assertGreaterEqual(data['login_cpu']['count'], 1)
+
+
+class DeferredRehashTests(TransactionTestCase):
+    password = 'Str0ng-pass!'
+
+    def test_weak_hashes_are_upgraded_outside_the_request(self):
+        hasher = ConfiguredPBKDF2PasswordHasher()
+        weak = hasher.encode(self.password, hasher.salt(), hasher.iterations - 100_000)
+        user = User.objects.create_user('legacy')
+        User.objects.filter(pk=user.pk).update(password=weak)
+
+        # Same queries as a login that needs no upgrade; the UPDATE happens elsewhere
+        with self.assertNumQueries(LOGIN_QUERIES):
+            response = self.client.post('/api/auth/login/', {'username': 'legacy', 'password': self.password}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        rehash_queue.wait()
+        user.refresh_from_db()
+        self.assertEqual(hasher.decode(user.password)['iterations'], hasher.iterations)
+        self.assertTrue(user.check_password(self.password))
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', password='Str0ng-pass!')
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        return self.client.get('/api/search/', {'q': query, **params})
+
+    def hits(self, query, **params):
+        return [(hit['type'], hit['id']) for hit in self.search(query, **params).data['results']]
+
+    def test_ranked_hits_across_types_scoped_to_user(self):
+        knee = PhysicalPainEntry.objects.create(user=self.user, pain_level=3, notes='Left knee swollen after the walk')
+        knees = DiaryEntry.objects.create(user=self.user, content='Knee, knee and more knee. ' + 'Filler text. ' * 30 + 'Took ibuprofen for the knee.')
+        mood = MentalWellnessEntry.objects.create(user=self.user, wellness_level=2, notes='Anxious about the knee scan')
+        other = User.objects.create_user('other', password='Str0ng-pass!')
+        DiaryEntry.objects.create(user=other, content='My knee hurts')
+
+        # Repeated terms rank higher; other users' entries never appear
+        hits = self.hits('knee')
+        self.assertEqual(hits[0], ('diary', knees.pk))
+        self.assertEqual(set(hits), {('diary', knees.pk), ('mental', mood.pk), ('pain', knee.pk)})
+        self.assertEqual(self.hits('knee', type='pain'), [('pain', knee.pk)])
+        self.assertEqual(self.hits('knee ibuprofen'), [('diary', knees.pk)])
+        self.assertEqual(self.hits('elbow'), [])
+
+        hit = self.search('swollen knee').data['results'][0]
+        self.assertEqual(hit['value'], 3)
+        text = hit['snippet']['text']
+        self.assertEqual([text[start:end] for start, end in hit['snippet']['matches']], ['knee', 'swollen'])
+
+        long_hit = self.search('ibuprofen').data['results'][0]['snippet']
+        self.assertTrue(long_hit['text'].startswith('…'))
+        self.assertIn('ibuprofen', [long_hit['text'][start:end] for start, end in long_hit['matches']])
+
+    def test_index_follows_entry_changes(self):
+        entry = PhysicalPainEntry.objects.create(user=self.user, pain_level=2, notes='Migraine behind the eyes')
+        self.assertEqual(self.hits('migraine'), [('pain', entry.pk)])
+
+        self.client.patch(f'/api/physical-pain/{entry.pk}/', {'notes': 'Tension headache'}, format='json')
+        self.assertEqual(self.hits('migraine'), [])
+        self.assertEqual(self.hits('headache'), [('pain', entry.pk)])
+
+        self.client.delete(f'/api/physical-pain/{entry.pk}/')
+        self.assertEqual(self.hits('headache'), [])
+        self.assertFalse(SearchPosting.objects.filter(entry_id=entry.pk, entry_type='pain').exists())
+
+    def test_deletes_unindex_once_per_call(self):
+        DiaryEntry.objects.bulk_create(DiaryEntry(user=self.user, content=f'insomnia night {i}') for i in range(12))
+        SearchPosting.index_entries('diary', DiaryEntry.objects.all(), replace=False)
+        kept = DiaryEntry.objects.create(user=self.user, content='insomnia again')
+
+        def posting_deletes(delete):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            return [query for query in queries if query['sql'].startswith('DELETE FROM "symptomtracker_searchposting"')]
+
+        self.assertEqual(len(posting_deletes(DiaryEntry.objects.exclude(pk=kept.pk).delete)), 1)
+        self.assertEqual(self.hits('insomnia'), [('diary', kept.pk)])
+        # The postings go in the user's cascade, not entry by entry
+        self.assertEqual(['user_id' in query['sql'] for query in posting_deletes(self.user.delete)], [True])
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_batch_uploads_are_indexed(self):
+        response = self.client.post('/api/diary/batch/', [
+            {'content': 'Slept badly, restless legs', 'idempotency_key': 'a'},
+            {'content': 'Restless again', 'idempotency_key': 'b'},
+        ], format='json')
+        ids = {result['id'] for result in response.data['results']}
+        self.assertEqual({entry_id for _, entry_id in self.hits('restless')}, ids)
+
+    def test_multi_term_ranking_walks_candidates_in_batches(self):
+        for i in range(12):
+            DiaryEntry.objects.create(user=self.user, content=f'fatigue day {i}' + (' fever' if i % 5 == 0 else ''))
+        expected = {('diary', entry.pk) for entry in DiaryEntry.objects.filter(content__contains='fever')}
+
+        with patch('symptomtracker.models.CANDIDATE_BATCH', 2):
+            self.assertEqual(set(self.hits('fatigue fever')), expected)
+            self.assertEqual(len(self.hits('fatigue day', limit=3)), 3)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.search('').status_code, 400)
+        self.assertEqual(self.search('the and').status_code, 400)
+        self.assertEqual(self.search('knee', type='sleep').status_code, 400)
+        self.assertEqual(self.search('knee', limit='many').status_code, 400)
+
+
+@skipUnless(np, 'NumPy is not installed')
+class AnalyticsTests(APITestCase):
+    def test_window_statistics_match_a_direct_computation(self):
+        rng = np.random.default_rng(7)
+        series = rng.uniform(1, 4, 60)
+        series[rng.choice(60, 20, replace=False)] = np.nan
+
+        for window in (7, 30):
+            for day in range(60):
+                values = series[max(0, day - window + 1):day + 1]
+                values = values[~np.isnan(values)]
+                mean = analytics.rolling_mean(series, window)[day]
+                std = analytics.rolling_std(series, window)[day]
+                if len(values):
+                    self.assertAlmostEqual(mean, values.mean())
+                else:
+                    self.assertTrue(np.isnan(mean))
+                if len(values) > 1:
+                    self.assertAlmostEqual(std, values.std(ddof=1))
+                else:
+                    self.assertTrue(np.isnan(std))
+
+    def test_lagged_correlation_finds_the_delay(self):
+        rng = np.random.default_rng(3)
+        pain = rng.uniform(1, 4, 40)
+        # Mood mirrors pain two days later
+        mental = np.full(40, np.nan)
+        mental[2:] = 6 - pain[:-2]
+
+        lags, r, n = analytics.lagged_correlation(pain, mental, 3)
+        self.assertEqual(lags.tolist(), [-3, -2, -1, 0, 1, 2, 3])
+        self.assertAlmostEqual(r[lags.tolist().index(2)], -1.0)
+        self.assertEqual(n[lags.tolist().index(2)], 38)
+        self.assertLess(abs(r[lags.tolist().index(0)]), 0.5)
+
+    def test_statistics_action(self):
+        user = User.objects.create_user('analyst', password='Str0ng-pass!')
+        self.client.force_authenticate(user)
+        now = timezone.now()
+        for days_ago, pain, mood in [(0, 3, 2), (1, 1, 4), (1, 3, 4), (3, 4, 1), (5, 2, 3)]:
+            PhysicalPainEntry.objects.create(user=user, pain_level=pain, timestamp=now - timedelta(days=days_ago))
+            MentalWellnessEntry.objects.create(user=user, wellness_level=mood, timestamp=now - timedelta(days=days_ago))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/data-analysis/statistics/?days=7&max_lag=2')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(len(data['labels']), 7)
+        self.assertEqual(data['labels'][-1], DailySymptomRollup.bucket_date(now).isoformat())
+
+        pain = data['series']['pain']
+        self.assertEqual(pain['daily'], [None, 2.0, None, 4.0, None, 2.0, 3.0])
+        self.assertEqual(pain['rolling_mean']['7'][-1], 2.75)
+        self.assertEqual(pain['summary'], {'days_logged': 4, 'mean': 2.75, 'std': 0.957})
+        self.assertEqual([point['lag'] for point in data['correlation']], [-2, -1, 0, 1, 2])
+        same_day = data['correlation'][2]
+        self.assertEqual(same_day['days'], 4)
+        self.assertAlmostEqual(same_day['r'], -0.9, places=1)
+
+        self.assertEqual(self.client.get('/api/data-analysis/statistics/?days=week').status_code, 400)
@@ -0,0 +1,187 @@
+"""Refresh-token store: blacklist filter, pruning and metrics.
+
+ROTATE_REFRESH_TOKENS and BLACKLIST_AFTER_ROTATION mean every refresh adds
+an OutstandingToken and a BlacklistedToken row, and every refresh checks the
+presented token against the blacklist. An in-process Bloom filter over the
+blacklisted jtis answers the common "not blacklisted" case without a query;
+``prune_expired_tokens`` keeps both tables bounded.
+
+The filter can be up to TOKEN_BLACKLIST_SYNC_SECONDS behind other workers,
+so it is never what stops a replay. Blacklisting the presented token on
+rotation is: only the first request to insert its BlacklistedToken row
+gets a new token pair.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .metrics import LatencyRecorder
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class BlacklistFilter:
+    """Bloom filter over the jtis of unexpired blacklisted refresh tokens.
+
+    A negative answer skips the database read; a positive one (true or
+    false) falls through to simplejwt's BlacklistedToken query. Tokens
+    blacklisted in this process are added straight away, those blacklisted
+    by other workers are picked up by a delta query at most
+    TOKEN_BLACKLIST_SYNC_SECONDS later. A token blacklisted elsewhere within
+    that window still passes the check, and is then refused by
+    FilteredRefreshToken.blacklist().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.bloom = None
+        self.synced_at = 0.0
+        self.synced_since = None
+        self.skipped = 0
+        self.checked = 0
+
+    def load(self, now):
+        jtis = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=now).values_list('token__jti', flat=True)
+        )
+        self.bloom = BloomFilter(
+            max(len(jtis) * 2, settings.TOKEN_BLACKLIST_FILTER_CAPACITY),
+            settings.TOKEN_BLACKLIST_FILTER_ERROR_RATE
+        )
+        for jti in jtis:
+            self.bloom.add(jti)
+
+    def sync(self):
+        now = timezone.now()
+        # Rebuilding once the filter is over capacity also drops expired jtis
+        if self.bloom is None or self.bloom.count > self.bloom.capacity:
+            self.load(now)
+        else:
+            for jti in BlacklistedToken.objects.filter(blacklisted_at__gte=self.synced_since).values_list('token__jti', flat=True):
+                self.bloom.add(jti)
+        # Overlap the next window by one interval so rows committed late are not missed
+        self.synced_since = now - timedelta(seconds=settings.TOKEN_BLACKLIST_SYNC_SECONDS)
+        self.synced_at = time.monotonic()
+
+    def might_contain(self, jti):
+        if not settings.TOKEN_BLACKLIST_FILTER:
+            return True
+        with self.lock:
+            if self.bloom is None or time.monotonic() - self.synced_at >= settings.TOKEN_BLACKLIST_SYNC_SECONDS:
+                self.sync()
+            found = jti in self.bloom
+            if found:
+                self.checked += 1
+            else:
+                self.skipped += 1
+            return found
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'enabled': settings.TOKEN_BLACKLIST_FILTER,
+                'entries': self.bloom.count if self.bloom else 0,
+                'capacity': self.bloom.capacity if self.bloom else 0,
+                'skipped_queries': self.skipped,
+                'database_checks': self.checked,
+            }
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted, created = super().blacklist()
+        if not created:
+            # Blacklisted since the filter last synced, or by a concurrent
+            # refresh of the same token: the unique row settles who won
+            raise TokenError(_('Token is blacklisted'))
+        return blacklisted, created
+
+
+refresh_latency = LatencyRecorder(settings.AUTH_METRICS_WINDOW)
+
+
+def table_sizes(now=None):
+    now = now or timezone.now()
+    return {
+        'outstanding': OutstandingToken.objects.count(),
+        'blacklisted': BlacklistedToken.objects.count(),
+        'expired': OutstandingToken.objects.filter(expires_at__lte=now).count(),
+    }
+
+
+def token_store_metrics():
+    return {
+        'tables': table_sizes(),
+        'blacklist_filter': blacklist_filter.stats(),
+        'refresh_latency': refresh_latency.summary(),
+    }
+
+
+def prune_expired_tokens(batch_size=1000, now=None, pause=0):
+    """Delete expired outstanding tokens, and their blacklist rows, in batches.
+
+    Each batch is its own short transaction walking the expires_at index, so
+    pruning a large backlog never holds a long lock. Returns
+    (outstanding deleted, blacklisted deleted).
+    """
+    now = now or timezone.now()
+    outstanding = blacklisted = 0
+    while True:
+        pks = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by('expires_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return outstanding, blacklisted
+        with transaction.atomic():
+            blacklisted += BlacklistedToken.objects.filter(token_id__in=pks).delete()[0]
+            outstanding += OutstandingToken.objects.filter(pk__in=pks).delete()[0]
+        if pause:
+            time.sleep(pause)
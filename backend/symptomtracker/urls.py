@@ -1,12 +1,15 @@
+from django.conf import settings
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncHomeScreenDataView, AsyncRecentEntriesView, AsyncTrendView
+from .models import PhysicalPainEntry, MentalWellnessEntry, DailySymptomRollup
 from .views import (
     RegisterView, LoginView, UserProfileView, UserSettingsView,
     ChangePasswordView, LogoutView, PhysicalPainEntryViewSet,
     MentalWellnessEntryViewSet, DiaryEntryViewSet, PhysicianInfoViewSet,
     NotificationViewSet, DataAnalysisView, NotificationSettingsView, HealthAppSettingsView,
-    CommunitySettingsView, EmergencyContactView, HomeScreenDataView
+    CommunitySettingsView, EmergencyContactView, HomeScreenDataView, HistoryExportView,
+    TimedTokenRefreshView, TokenStoreMetricsView, LoginMetricsView, SearchView, BootstrapView, SyncView
 )
 
 router = DefaultRouter()
@@ -20,7 +23,9 @@ router.register(r'data-analysis', DataAnalysisView, basename='data-analysis')
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/refresh/', TimedTokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/login-metrics/', LoginMetricsView.as_view(), name='login_metrics'),
+    path('auth/token-metrics/', TokenStoreMetricsView.as_view(), name='token_metrics'),
     path('auth/change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('profile/', UserProfileView.as_view(), name='profile'),
@@ -30,4 +35,35 @@ urlpatterns = [
     path('settings/community/', CommunitySettingsView.as_view(), name='community_settings'),
     path('emergency-contact/', EmergencyContactView.as_view(), name='emergency_contact'),
     path('home-data/', HomeScreenDataView.as_view(), name='home-data'),
-]
\ No newline at end of file
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('export/', HistoryExportView.as_view(), name='export'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('', include(router.urls)),
+]
+
+# Native async replacements for the read-heavy routes, ahead of the sync ones
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path('home-data/', AsyncHomeScreenDataView.as_view(), name='home-data'),
+        path(
+            'physical-pain/recent/',
+            AsyncRecentEntriesView.as_view(model=PhysicalPainEntry, row_serializer=PhysicalPainEntryViewSet.row_serializer),
+            name='physical-pain-recent'
+        ),
+        path(
+            'mental-wellness/recent/',
+            AsyncRecentEntriesView.as_view(model=MentalWellnessEntry, row_serializer=MentalWellnessEntryViewSet.row_serializer),
+            name='mental-wellness-recent'
+        ),
+        path(
+            'data-analysis/pain_trends/',
+            AsyncTrendView.as_view(kind=DailySymptomRollup.KIND_PAIN, label='Pain Level'),
+            name='data-analysis-pain-trends'
+        ),
+        path(
+            'data-analysis/mental_wellness_trends/',
+            AsyncTrendView.as_view(kind=DailySymptomRollup.KIND_MENTAL, label='Mental Wellness'),
+            name='data-analysis-mental-wellness-trends'
+        ),
+    ] + urlpatterns
@@ -2,20 +2,43 @@ from rest_framework import generics, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes, action
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, IntegerField, Subquery, Value
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
 from datetime import datetime, timedelta
+import time
 from django.contrib.auth import authenticate, update_session_auth_hash
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from django.contrib.auth.models import User
 from .models import (
-    PhysicalPainEntry, MentalWellnessEntry, DiaryEntry,
-    PhysicianInfo, Notification
+    ArchivedEntry, ChangeSequence, UserSettings, PhysicalPainEntry, MentalWellnessEntry, DiaryEntry,
+    PhysicianInfo, Notification, DailySymptomRollup, SearchPosting, Tombstone,
+    ROLLUP_KINDS, SEARCH_SOURCES, SEARCH_TYPES, SYNC_SOURCES
 )
+from .archive import ROW_FIELDS as ARCHIVE_ROW_FIELDS, entry_row, with_archived
+from .cache import home_data_cache_key, search_documents_cache_key
+from .conditional import conditional_get
+from .delivery import NoPhysicianError, enqueue_for_physician
+from .export import ENCODERS, aiter_chunks, encode_stream, format_timestamp, iter_history
+from .passwords import failed_logins, login_cpu, login_metrics, login_wall
+from .tokens import FilteredRefreshToken, refresh_latency, token_store_metrics
+from .search import query_terms, snippet
+from .renderers import TREND_RENDERERS
+from .routers import replica_alias, replica_reads
+from .rows import RowSerializer
+from .pagination import EntryCursorPagination, NotificationCursorPagination
 from .serializers import (
     PhysicalPainEntrySerializer, MentalWellnessEntrySerializer, DiaryEntrySerializer,
     PhysicianInfoSerializer, NotificationSerializer, RegisterSerializer, UserSerializer, 
-    UserSettingsSerializer, ChangePasswordSerializer, UserProfileSerializer
+    UserSettingsSerializer, ChangePasswordSerializer, UserProfileSerializer,
+    PhysicalPainEntryBatchSerializer, MentalWellnessEntryBatchSerializer, DiaryEntryBatchSerializer
 )
 
 class RegisterView(generics.CreateAPIView):
@@ -42,10 +65,23 @@ class LoginView(APIView):
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
-        
+        address = request.META.get('REMOTE_ADDR')
+
+        retry_after = failed_logins.retry_after(username, address)
+        if retry_after:
+            return Response(
+                {'error': 'Too many failed login attempts. Try again later.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(retry_after)}
+            )
+
+        cpu_started, wall_started = time.thread_time(), time.perf_counter()
         user = authenticate(username=username, password=password)
+        login_cpu.record(time.thread_time() - cpu_started)
+        login_wall.record(time.perf_counter() - wall_started)
         
         if user:
+            failed_logins.reset(username)
             refresh = RefreshToken.for_user(user)
             
             return Response({
@@ -54,6 +90,7 @@ class LoginView(APIView):
                 'access': str(refresh.access_token),
             })
         
+        failed_logins.record_failure(username, address)
         return Response({'error': 'Invalid Credentials'}, status=status.HTTP_401_UNAUTHORIZED)
     
 
@@ -63,18 +100,42 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data.get('refresh')
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Logout successful"}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class TimedTokenRefreshView(TokenRefreshView):
+    def post(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().post(request, *args, **kwargs)
+        finally:
+            refresh_latency.record(time.perf_counter() - started)
+
+class LoginMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(login_metrics())
+
+class TokenStoreMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(token_store_metrics())
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserSerializer
     
     def get_object(self):
         return self.request.user
+
+    @conditional_get()
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
         
     def update(self, request, *args, **kwargs):
         user = self.get_object()
@@ -85,23 +146,31 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
             if field in request.data:
                 user_data[field] = request.data.get(field)
         
-        if user_data:
-            user_serializer = UserSerializer(user, data=user_data, partial=True)
-            if user_serializer.is_valid():
-                user_serializer.save()
-            else:
-                return Response(user_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_serializer = UserSerializer(user, data=user_data, partial=True)
+        if not user_serializer.is_valid():
+            return Response(user_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         # Handle profile fields
-        if 'profile' in request.data and isinstance(request.data['profile'], dict):
-            profile_data = request.data['profile']
-            profile_serializer = UserProfileSerializer(user.profile, data=profile_data, partial=True)
-            if profile_serializer.is_valid():
-                profile_serializer.save()
-            else:
-                return Response(profile_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        profile_data = request.data.get('profile')
+        profile_serializer = UserProfileSerializer(
+            user.profile, data=profile_data if isinstance(profile_data, dict) else {}, partial=True
+        )
+        if not profile_serializer.is_valid():
+            return Response(profile_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Both are validated before anything is written, and only changed
+        # columns are. The user's post_save signal saves a dirty profile.
+        for field, value in profile_serializer.validated_data.items():
+            setattr(user.profile, field, value)
+        changed = [field for field, value in user_serializer.validated_data.items() if getattr(user, field) != value]
+        for field in changed:
+            setattr(user, field, user_serializer.validated_data[field])
+        if changed:
+            user.save(update_fields=changed)
+        elif user.profile.get_dirty_fields():
+            user.profile.save(update_fields=user.profile.get_dirty_fields())
         
-        # Return the updated user
+        # The saved instances are already cached on the user, so nothing is re-read
         return Response(UserSerializer(user).data)
 
 class UserSettingsView(generics.RetrieveUpdateAPIView):
@@ -110,6 +179,10 @@ class UserSettingsView(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         return self.request.user.settings
+
+    @conditional_get()
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
     
     def update(self, request, *args, **kwargs):
         # Handle regular settings updates
@@ -119,7 +192,11 @@ class UserSettingsView(generics.RetrieveUpdateAPIView):
             partial=True
         )
         settings_serializer.is_valid(raise_exception=True)
-        settings_serializer.save()
+        user_settings = settings_serializer.instance
+        for field, value in settings_serializer.validated_data.items():
+            setattr(user_settings, field, value)
+        if user_settings.get_dirty_fields():
+            user_settings.save(update_fields=user_settings.get_dirty_fields())
         
         # Check if username is included in the request
         if 'username' in request.data:
@@ -135,7 +212,7 @@ class UserSettingsView(generics.RetrieveUpdateAPIView):
                     )
                 
                 user.username = new_username
-                user.save()
+                user.save(update_fields=['username'])
             except Exception as e:
                 return Response(
                     {'error': f'Failed to update username: {str(e)}'},
@@ -165,10 +242,12 @@ class ChangePasswordView(generics.UpdateAPIView):
             
             # Set new password
             user.set_password(serializer.data.get("new_password"))
-            user.save()
+            user.save(update_fields=['password'])
             
-            # Update session auth hash to keep user logged in
-            update_session_auth_hash(request, user)
+            # Update session auth hash to keep session-based logins alive;
+            # JWT clients have no session, so don't create one for them
+            if request.session.session_key:
+                update_session_auth_hash(request, user)
             
             return Response(
                 {"message": "Password updated successfully"}, 
@@ -270,67 +349,215 @@ class EmergencyContactView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, *args, **kwargs):
-        profile = request.user.profile
-        return Response({
+        return Response(self.emergency_contact(request.user.profile))
+
+    @staticmethod
+    def emergency_contact(profile):
+        return {
             'emergency_contact_name': profile.emergency_contact_name,
             'emergency_contact_phone': profile.emergency_contact_phone,
             'emergency_contact_relationship': profile.emergency_contact_relationship
-        })
+        }
     
-class PhysicalPainEntryViewSet(viewsets.ModelViewSet):
+class BatchCreateMixin:
+    """Adds POST <list>/batch/ for clients replaying entries logged offline.
+
+    The body is a JSON array of entries, each carrying its own timestamp and
+    idempotency_key. Every item is validated, the new ones are inserted with a
+    single bulk_create in one transaction, and the response reports a result
+    per item: created, duplicate (key already uploaded) or invalid.
+    """
+    batch_serializer_class = None
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected a list of entries.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BATCH_CREATE_MAX_ITEMS:
+            return Response(
+                {'error': f'A batch may contain at most {settings.BATCH_CREATE_MAX_ITEMS} entries.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        model = self.batch_serializer_class.Meta.model
+        user = request.user
+
+        # Keys this user has already uploaded, fetched once for the whole batch;
+        # the entries of old uploads may since have been archived
+        keys = [item.get('idempotency_key') for item in items if isinstance(item, dict)]
+        keys = [key for key in keys if key]
+        seen = set(model.objects.filter(user=user, idempotency_key__in=keys).values_list('idempotency_key', flat=True))
+        archived_ids = dict(ArchivedEntry.objects.filter(
+            user=user, entry_type=SEARCH_TYPES[model], idempotency_key__in=keys
+        ).values_list('idempotency_key', 'entry_id'))
+        seen.update(archived_ids)
+
+        results = []
+        new_entries = []
+        for index, item in enumerate(items):
+            serializer = self.batch_serializer_class(data=item)
+            if not serializer.is_valid():
+                results.append({'index': index, 'status': 'invalid', 'errors': serializer.errors})
+                continue
+
+            key = serializer.validated_data['idempotency_key']
+            results.append({'index': index, 'status': 'duplicate' if key in seen else 'created', 'idempotency_key': key})
+            if key not in seen:
+                seen.add(key)
+                new_entries.append(model(user=user, **serializer.validated_data))
+
+        with transaction.atomic():
+            # bulk_create skips save(), so number the new entries for sync here
+            if new_entries:
+                last = ChangeSequence.allocate(user.pk, len(new_entries))
+                for offset, entry in enumerate(new_entries, start=last - len(new_entries) + 1):
+                    entry.change_seq = offset
+            # A concurrent replay of the same keys is absorbed by the unique constraint
+            model.objects.bulk_create(new_entries, ignore_conflicts=True)
+            ids = dict(archived_ids)
+            stored = {}
+            for key, pk, change_seq in model.objects.filter(
+                user=user,
+                idempotency_key__in=[result['idempotency_key'] for result in results if 'idempotency_key' in result]
+            ).values_list('idempotency_key', 'id', 'change_seq'):
+                ids[key] = pk
+                stored[key] = change_seq
+            # Change numbers are unique, so a row with another one was inserted
+            # by the concurrent request and is a duplicate here
+            lost = {entry.idempotency_key for entry in new_entries if stored.get(entry.idempotency_key) != entry.change_seq}
+            new_entries = [entry for entry in new_entries if entry.idempotency_key not in lost]
+
+            # bulk_create skips the post_save signals, so catch up the derived data
+            if new_entries and model in ROLLUP_KINDS:
+                DailySymptomRollup.rebuild_for_entries(ROLLUP_KINDS[model], new_entries)
+            if new_entries:
+                for entry in new_entries:
+                    entry.pk = ids[entry.idempotency_key]
+                SearchPosting.index_entries(SEARCH_TYPES[model], new_entries)
+
+        for result in results:
+            if 'idempotency_key' in result:
+                result['id'] = ids.get(result['idempotency_key'])
+                if result['idempotency_key'] in lost:
+                    result['status'] = 'duplicate'
+
+        return Response({'results': results})
+
+class ReplicaListMixin:
+    """Serves the list action from the read replica, when one is configured."""
+
+    @replica_reads()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+class RowListMixin:
+    """Serves list and recent from .values() rows through `row_serializer`
+    instead of building model instances and ModelSerializer fields per row.
+    The list pages on into the user's archived entries (see archive.py)."""
+    row_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = with_archived(self.row_serializer, self.filter_queryset(self.get_queryset()), request.user)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.row_serializer.serialize(page))
+        return Response(self.row_serializer.serialize(queryset))
+
+    def recent_rows(self):
+        return self.row_serializer.serialize(self.row_serializer.values(self.get_queryset())[:5])
+
+class ArchivedDetailMixin:
+    """Retrieve and destroy fall back to the user's archived entries, which
+    the list shows among the hot ones. Archived entries are not edited, so
+    update and send_to_physician still answer 404 for them."""
+
+    def archived_entries(self):
+        return ArchivedEntry.objects.filter(user=self.request.user, entry_type=SEARCH_TYPES[self.get_queryset().model])
+
+    def archived_lookup(self):
+        return {'entry_id': self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            row = generics.get_object_or_404(self.archived_entries().values(*ARCHIVE_ROW_FIELDS), **self.archived_lookup())
+            return Response(self.row_serializer.serialize([entry_row(row, self.row_serializer.field_names)])[0])
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except Http404:
+            # The delete receivers tombstone it and update its day's rollup
+            generics.get_object_or_404(self.archived_entries(), **self.archived_lookup()).delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+class PhysicalPainEntryViewSet(ReplicaListMixin, RowListMixin, ArchivedDetailMixin, BatchCreateMixin, viewsets.ModelViewSet):
     serializer_class = PhysicalPainEntrySerializer
+    batch_serializer_class = PhysicalPainEntryBatchSerializer
+    row_serializer = RowSerializer(PhysicalPainEntrySerializer)
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EntryCursorPagination
     
     def get_queryset(self):
-        return PhysicalPainEntry.objects.filter(user=self.request.user).order_by('-timestamp')
+        return PhysicalPainEntry.objects.filter(user=self.request.user).order_by('-timestamp', '-id')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @conditional_get()
     def recent(self, request):
-        recent_entries = self.get_queryset()[:5]
-        serializer = self.get_serializer(recent_entries, many=True)
-        return Response(serializer.data)
+        return Response(self.recent_rows())
     
     @action(detail=True, methods=['post'])
     def send_to_physician(self, request, pk=None):
         entry = self.get_object()
-        # Implement email sending logic here
-        entry.sent_to_physician = True
-        entry.save()
-        return Response({'status': 'sent to physician'})
+        # Queued for the delivery worker, which marks it sent once emailed
+        try:
+            enqueue_for_physician(entry, 'pain')
+        except NoPhysicianError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'queued for physician'}, status=status.HTTP_202_ACCEPTED)
 
-class MentalWellnessEntryViewSet(viewsets.ModelViewSet):
+class MentalWellnessEntryViewSet(ReplicaListMixin, RowListMixin, ArchivedDetailMixin, BatchCreateMixin, viewsets.ModelViewSet):
     serializer_class = MentalWellnessEntrySerializer
+    batch_serializer_class = MentalWellnessEntryBatchSerializer
+    row_serializer = RowSerializer(MentalWellnessEntrySerializer)
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EntryCursorPagination
     
     def get_queryset(self):
-        return MentalWellnessEntry.objects.filter(user=self.request.user).order_by('-timestamp')
+        return MentalWellnessEntry.objects.filter(user=self.request.user).order_by('-timestamp', '-id')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @conditional_get()
     def recent(self, request):
-        recent_entries = self.get_queryset()[:5]
-        serializer = self.get_serializer(recent_entries, many=True)
-        return Response(serializer.data)
+        return Response(self.recent_rows())
     
     @action(detail=True, methods=['post'])
     def send_to_physician(self, request, pk=None):
         entry = self.get_object()
-        # Implement email sending logic here
-        entry.sent_to_physician = True
-        entry.save()
-        return Response({'status': 'sent to physician'})
+        # Queued for the delivery worker, which marks it sent once emailed
+        try:
+            enqueue_for_physician(entry, 'mental')
+        except NoPhysicianError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'queued for physician'}, status=status.HTTP_202_ACCEPTED)
 
-class DiaryEntryViewSet(viewsets.ModelViewSet):
+class DiaryEntryViewSet(ReplicaListMixin, RowListMixin, ArchivedDetailMixin, BatchCreateMixin, viewsets.ModelViewSet):
     serializer_class = DiaryEntrySerializer
+    batch_serializer_class = DiaryEntryBatchSerializer
+    row_serializer = RowSerializer(DiaryEntrySerializer)
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EntryCursorPagination
     
     def get_queryset(self):
-        return DiaryEntry.objects.filter(user=self.request.user).order_by('-timestamp')
+        return DiaryEntry.objects.filter(user=self.request.user).order_by('-timestamp', '-id')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -338,12 +565,14 @@ class DiaryEntryViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def send_to_physician(self, request, pk=None):
         entry = self.get_object()
-        # Implement email sending logic here
-        entry.sent_to_physician = True
-        entry.save()
-        return Response({'status': 'sent to physician'})
+        # Queued for the delivery worker, which marks it sent once emailed
+        try:
+            enqueue_for_physician(entry, 'diary')
+        except NoPhysicianError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'queued for physician'}, status=status.HTTP_202_ACCEPTED)
 
-class PhysicianInfoViewSet(viewsets.ModelViewSet):
+class PhysicianInfoViewSet(ReplicaListMixin, viewsets.ModelViewSet):
     serializer_class = PhysicianInfoSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -358,87 +587,340 @@ class PhysicianInfoViewSet(viewsets.ModelViewSet):
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
+
+    # Conditional, so read from the primary its ETag's version comes from
+    @conditional_get()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+class SearchView(APIView):
+    """Ranked full-text search over the user's pain notes, mental wellness
+    notes and diary entries.
+
+    ?q= terms (all must match), optional ?type=pain|mental|diary (repeatable)
+    and ?limit= (default 20, at most 100).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        terms = query_terms(request.query_params.get('q', ''))
+        if not terms:
+            return Response({'error': 'Provide search terms in the q parameter.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entry_types = request.query_params.getlist('type')
+        unknown = [entry_type for entry_type in entry_types if entry_type not in SEARCH_SOURCES]
+        if unknown:
+            return Response(
+                {'error': f"Unknown type '{unknown[0]}'. Choose from: {', '.join(SEARCH_SOURCES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        # Only the IDF of multi-term queries needs the entry count, and only roughly
+        documents = 0
+        if len(terms) > 1:
+            documents = cache.get_or_set(
+                search_documents_cache_key(user.pk),
+                lambda: sum(model.objects.filter(user=user).count() for model, _, _ in SEARCH_SOURCES.values()),
+                settings.SEARCH_DOCUMENT_COUNT_TIMEOUT
+            )
+        hits = SearchPosting.rank(user.pk, terms, documents, limit, entry_types)
+
+        # One UNION ALL fetches the text of the hits whatever their types
+        ids_by_type = {}
+        for entry_type, entry_id, _ in hits:
+            ids_by_type.setdefault(entry_type, []).append(entry_id)
+        rows = None
+        for entry_type, ids in ids_by_type.items():
+            model, text_field, value_field = SEARCH_SOURCES[entry_type]
+            part = model.objects.filter(user=user, pk__in=ids).values(
+                'id', 'timestamp',
+                kind=Value(entry_type),
+                text=F(text_field),
+                value=F(value_field) if value_field else Value(None, output_field=IntegerField())
+            )
+            rows = part if rows is None else rows.union(part, all=True)
+        entries = {(row['kind'], row['id']): row for row in rows} if rows is not None else {}
+
+        results = []
+        for entry_type, entry_id, score in hits:
+            row = entries.get((entry_type, entry_id))
+            if row is None:
+                continue
+            results.append({
+                'type': entry_type,
+                'id': entry_id,
+                'timestamp': format_timestamp(row['timestamp']),
+                'value': row['value'],
+                'score': round(score, 4),
+                'snippet': snippet(row['text'], terms),
+            })
+        return Response({'query': terms, 'results': results})
+
+class HistoryExportView(APIView):
+    """Stream the user's pain, mental wellness and diary history, oldest first.
+
+    ?output=ndjson (default) or csv. The body is gzipped when the client
+    sends Accept-Encoding: gzip or passes ?gzip=1.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ENCODERS:
+            return Response(
+                {'error': f"Unknown output '{output}'. Choose from: {', '.join(ENCODERS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        encode_lines, content_type = ENCODERS[output]
+
+        compress = (
+            request.query_params.get('gzip') in ('1', 'true')
+            or 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+
+        # The body is read after get() returns, so the replica is picked here
+        chunks = encode_stream(encode_lines(iter_history(request.user, using=replica_alias())), compress=compress)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f'symptom-history-{timezone.localdate().isoformat()}.{output}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
 # Data analysis view
 class DataAnalysisView(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
-    
-    @action(detail=False, methods=['get'])
-    def pain_trends(self, request):
+
+    # Which per-day statistic a trend chart plots, selectable with ?stat=
+    ROLLUP_STATS = {
+        'mean': lambda rollup: round(rollup['total'] / rollup['count'], 2),
+        'min': lambda rollup: rollup['min_value'],
+        'max': lambda rollup: rollup['max_value'],
+        'last': lambda rollup: rollup['last_value'],
+        'count': lambda rollup: rollup['count'],
+    }
+
+    # Columnar values are sent as integers; means carry two decimals
+    COLUMN_SCALES = {'mean': 100}
+
+    def rollup_trend(self, request, kind, label):
+        params = self.trend_params(request.query_params)
+        if isinstance(params, Response):
+            return params
+        start_date, stat = params
+        rollups = self.trend_rollups(request.user, kind, start_date)
+        if getattr(request.accepted_renderer, 'columnar', False):
+            return Response(self.trend_columns(rollups, label, stat))
+        return Response(self.trend_data(rollups, label, self.ROLLUP_STATS[stat]))
+
+    @classmethod
+    def trend_params(cls, query_params):
+        """(start date, stat name) from the query string, or an error Response."""
         # Get date range from query params or default to last 30 days
-        days = int(request.query_params.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
-        
-        entries = PhysicalPainEntry.objects.filter(
-            user=request.user,
-            timestamp__gte=start_date
-        ).order_by('timestamp')
-        
+        try:
+            days = int(query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        days = min(max(days, 0), settings.ANALYTICS_MAX_DAYS)
+        start_date = DailySymptomRollup.bucket_date(timezone.now() - timedelta(days=days))
+
+        stat = query_params.get('stat', 'mean')
+        if stat not in cls.ROLLUP_STATS:
+            return Response(
+                {'error': f"Unknown stat '{stat}'. Choose from: {', '.join(cls.ROLLUP_STATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return start_date, stat
+
+    @staticmethod
+    def trend_rollups(user, kind, start_date):
+        # One pre-aggregated row per day, so cost follows the window length
+        return DailySymptomRollup.objects.filter(
+            user=user,
+            kind=kind,
+            date__gte=start_date
+        ).order_by('date').values('date', 'count', 'min_value', 'max_value', 'total', 'last_value')
+
+    @staticmethod
+    def trend_data(rollups, label, value_for):
         # Prepare data for frontend visualization
         data = {
             'labels': [],
             'datasets': [{
-                'label': 'Pain Level',
+                'label': label,
                 'data': []
             }]
         }
-        
-        for entry in entries:
-            data['labels'].append(entry.timestamp.strftime('%Y-%m-%d'))
-            data['datasets'][0]['data'].append(entry.pain_level)
-        
-        return Response(data)
-    
-    @action(detail=False, methods=['get'])
+
+        for rollup in rollups:
+            data['labels'].append(rollup['date'].isoformat())
+            data['datasets'][0]['data'].append(value_for(rollup))
+
+        return data
+
+    @classmethod
+    def trend_columns(cls, rollups, label, stat):
+        """The trend as columns for the compact renderers.
+
+        `start` is the first day plotted and `gaps` the days between
+        consecutive points, so point i falls on start + sum(gaps[:i + 1]).
+        `values` are integers to divide by `scale`.
+        """
+        value_for = cls.ROLLUP_STATS[stat]
+        scale = cls.COLUMN_SCALES.get(stat, 1)
+        start = previous = None
+        gaps, values = [], []
+        for rollup in rollups:
+            date = rollup['date']
+            if start is None:
+                start = previous = date
+            gaps.append((date - previous).days)
+            previous = date
+            values.append(round(value_for(rollup) * scale))
+        return {
+            'label': label,
+            'start': start.isoformat() if start else None,
+            'gaps': gaps,
+            'scale': scale,
+            'values': values,
+        }
+
+    @action(detail=False, methods=['get'], renderer_classes=TREND_RENDERERS)
+    @replica_reads()
+    def pain_trends(self, request):
+        return self.rollup_trend(request, DailySymptomRollup.KIND_PAIN, 'Pain Level')
+
+    @action(detail=False, methods=['get'], renderer_classes=TREND_RENDERERS)
+    @replica_reads()
     def mental_wellness_trends(self, request):
-        # Get date range from query params or default to last 30 days
-        days = int(request.query_params.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
-        
-        entries = MentalWellnessEntry.objects.filter(
+        return self.rollup_trend(request, DailySymptomRollup.KIND_MENTAL, 'Mental Wellness')
+
+    @action(detail=False, methods=['get'])
+    @replica_reads()
+    def statistics(self, request):
+        """Daily means, 7/30-day rolling means and volatility of both series,
+        and the pain-versus-mental-wellness correlation at each day lag.
+
+        ?days= (default 90) sets the reported range, ?max_lag= (default 7) the
+        largest lag. A positive lag pairs each day's pain with the mental
+        wellness that many days later.
+        """
+        try:
+            days = int(request.query_params.get('days', 90))
+            max_lag = int(request.query_params.get('max_lag', 7))
+        except ValueError:
+            return Response({'error': 'days and max_lag must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        days = min(max(days, 1), settings.ANALYTICS_MAX_DAYS)
+        max_lag = min(max(max_lag, 0), settings.ANALYTICS_MAX_LAG)
+        # NumPy is only needed here, so the rest of the API imports without it
+        import numpy as np
+        from . import analytics
+
+        # Load enough days before the range for its first windows to be full
+        windows = (7, 30)
+        lookback = max(windows) - 1
+        end = DailySymptomRollup.bucket_date(timezone.now())
+        first = end - timedelta(days=days - 1 + lookback)
+        length = days + lookback
+
+        # One pre-aggregated row per logged day, loaded as columns
+        rows = list(DailySymptomRollup.objects.filter(
             user=request.user,
-            timestamp__gte=start_date
-        ).order_by('timestamp')
-        
-        # Prepare data for frontend visualization
+            kind__in=[DailySymptomRollup.KIND_PAIN, DailySymptomRollup.KIND_MENTAL],
+            date__gte=first,
+            date__lte=end
+        ).values_list('kind', 'date', 'total', 'count'))
+        kinds, dates, totals, counts = zip(*rows) if rows else ((), (), (), ())
+        kinds = np.array(kinds, dtype=object)
+        offsets = np.array([(date - first).days for date in dates], dtype=int)
+        totals = np.array(totals, dtype=float)
+        counts = np.array(counts, dtype=float)
+
+        series = {}
+        for kind in (DailySymptomRollup.KIND_PAIN, DailySymptomRollup.KIND_MENTAL):
+            mask = kinds == kind
+            series[kind] = analytics.daily_series(offsets[mask], totals[mask], counts[mask], length)
+
         data = {
-            'labels': [],
-            'datasets': [{
-                'label': 'Mental Wellness',
-                'data': []
-            }]
+            'labels': [(end - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)],
+            'series': {},
         }
-        
-        for entry in entries:
-            data['labels'].append(entry.timestamp.strftime('%Y-%m-%d'))
-            data['datasets'][0]['data'].append(entry.wellness_level)
-        
+        for kind, values in series.items():
+            reported = values[lookback:]
+            logged = reported[~np.isnan(reported)]
+            data['series'][kind] = {
+                'daily': analytics.to_list(reported),
+                'rolling_mean': {str(window): analytics.to_list(analytics.rolling_mean(values, window)[lookback:]) for window in windows},
+                'rolling_std': {str(window): analytics.to_list(analytics.rolling_std(values, window)[lookback:]) for window in windows},
+                'summary': {
+                    'days_logged': int(len(logged)),
+                    'mean': round(float(logged.mean()), 3) if len(logged) else None,
+                    'std': round(float(logged.std(ddof=1)), 3) if len(logged) > 1 else None,
+                },
+            }
+
+        lags, r, n = analytics.lagged_correlation(
+            series[DailySymptomRollup.KIND_PAIN][lookback:], series[DailySymptomRollup.KIND_MENTAL][lookback:], max_lag
+        )
+        data['correlation'] = [
+            {'lag': int(lag), 'r': coefficient, 'days': int(paired)}
+            for lag, coefficient, paired in zip(lags, analytics.to_list(r), n)
+        ]
         return Response(data)
-    
+
 class HomeScreenDataView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    
+
+    ENTRY_FIELDS = ('id', 'notes', 'timestamp', 'sent_to_physician')
+
+    # The payload also changes at midnight, when "today" moves on
+    @conditional_get(extra=lambda request: (DailySymptomRollup.bucket_date(timezone.now()),))
     def get(self, request):
-        user = request.user
+        return Response(self.cached_home_data(request.user, request.data_version))
+
+    @classmethod
+    def cached_home_data(cls, user, version=None):
+        """The home payload, reused while the user's data version and the day
+        are those it was built at.
+
+        `version` is the user's ChangeSequence value, when the caller has
+        already read it. It is read before the entries, so a payload is never
+        cached under a newer version than the rows it was built from, and a
+        write committed on any worker moves it, whichever cache the payload
+        sits in.
+        """
+        if version is None:
+            version = ChangeSequence.current(user.pk)
         today = timezone.now()
-        
-        # Get today's data
-        today_pain = PhysicalPainEntry.objects.filter(
-            user=user, 
-            timestamp__date=today.date()
-        ).order_by('-timestamp').first()
-        
-        today_mental = MentalWellnessEntry.objects.filter(
-            user=user, 
-            timestamp__date=today.date()
-        ).order_by('-timestamp').first()
-        
+        today_date = DailySymptomRollup.bucket_date(today)
+
+        cache_key = home_data_cache_key(user.pk)
+        cached = cache.get(cache_key)
+        if cached and cached[:2] == (today_date, version):
+            return cached[2]
+
+        today_pain, today_mental = cls.latest_entries_today(user, today_date)
+        data = cls.home_data(user, today, today_pain, today_mental)
+        cache.set(cache_key, (today_date, version, data), settings.HOME_DATA_CACHE_TIMEOUT)
+        return data
+
+    @staticmethod
+    def home_data(user, today, today_pain, today_mental):
         # Format date for display
         formatted_date = today.strftime('%A, %B %d')
         
@@ -446,7 +928,7 @@ class HomeScreenDataView(APIView):
         first_name = user.first_name or user.username
         
         # Compile the data
-        data = {
+        return {
             'date': formatted_date,
             'user_name': first_name,
             'has_logged_today': {
@@ -458,5 +940,165 @@ class HomeScreenDataView(APIView):
                 'mental': MentalWellnessEntrySerializer(today_mental).data if today_mental else None,
             }
         }
-        
-        return Response(data)
\ No newline at end of file
+
+    @staticmethod
+    def entries_on(model, user, today_date):
+        """The user's entries of `model` on `today_date`, newest first."""
+        # Half-open range on the raw column so the (user, timestamp) index applies
+        start, end = DailySymptomRollup.day_range(today_date)
+        return model.objects.filter(
+            user=user,
+            timestamp__gte=start,
+            timestamp__lt=end
+        ).order_by('-timestamp', '-id')
+
+    @classmethod
+    def latest_entries_today(cls, user, today_date):
+        def latest(model, level_field, kind):
+            newest = cls.entries_on(model, user, today_date).values('pk')[:1]
+            return model.objects.filter(pk=Subquery(newest)).annotate(
+                kind=Value(kind),
+                level=F(level_field)
+            ).values('kind', 'level', *cls.ENTRY_FIELDS)
+
+        # Both lookups in a single round trip
+        rows = latest(PhysicalPainEntry, 'pain_level', 'pain').union(
+            latest(MentalWellnessEntry, 'wellness_level', 'mental'),
+            all=True
+        )
+
+        found = {}
+        for row in rows:
+            kind = row.pop('kind')
+            level = row.pop('level')
+            if kind == 'pain':
+                found[kind] = PhysicalPainEntry(user=user, pain_level=level, **row)
+            else:
+                found[kind] = MentalWellnessEntry(user=user, wellness_level=level, **row)
+        return found.get('pain'), found.get('mental')
+
+
+class BootstrapView(APIView):
+    """Everything the app loads at launch, in one response.
+
+    The keys hold exactly what /profile/, /settings/, /home-data/,
+    /physician-info/, /notifications/ and /emergency-contact/ return, so a
+    cold start is one round trip instead of six. Built from a single user
+    query joined to the profile, settings and physician info, the home-data
+    lookup (skipped on a cache hit) and the first notification page.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @conditional_get(extra=lambda request: (DailySymptomRollup.bucket_date(timezone.now()),))
+    def get(self, request):
+        user = User.objects.select_related('profile', 'settings', 'physician_info').get(pk=request.user.pk)
+        try:
+            physicians = [user.physician_info]
+        except PhysicianInfo.DoesNotExist:
+            physicians = []
+
+        # The same first page, and next link, as the notifications list
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(Notification.objects.filter(user=user), request, view=self)
+        paginator.base_url = request.build_absolute_uri(reverse('notifications-list'))
+
+        return Response({
+            'profile': UserSerializer(user).data,
+            'settings': UserSettingsSerializer(user.settings).data,
+            'home_data': HomeScreenDataView.cached_home_data(user, request.data_version),
+            'physician_info': PhysicianInfoSerializer(physicians, many=True).data,
+            'notifications': paginator.get_paginated_response(NotificationSerializer(page, many=True).data).data,
+            'emergency_contact': EmergencyContactView.emergency_contact(user.profile),
+        })
+
+
+class SyncView(APIView):
+    """Pain, mental wellness, diary and notification rows and the settings
+    created, updated or deleted since the client's cursor.
+
+    Every write stamps its row (or, for a delete, a Tombstone) with the next
+    number of the user's ChangeSequence. ?cursor= is the `cursor` of the
+    previous response; omit it for a full sync. Changes come back oldest
+    first, at most ?limit= per response, and while `has_more` is true the
+    client asks again from the new cursor. Archived entries keep their
+    change numbers and come back as changes of their entry type. An
+    up-to-date client costs one query; otherwise each source is one indexed
+    range scan. Tombstones are kept for SYNC_TOMBSTONE_RETENTION_DAYS, so a
+    cursor older than the user's pruned ones gets 410 with code
+    "resync_required", and the client syncs again without a cursor.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    row_serializers = {
+        'pain': PhysicalPainEntryViewSet.row_serializer,
+        'mental': MentalWellnessEntryViewSet.row_serializer,
+        'diary': DiaryEntryViewSet.row_serializer,
+        'notification': RowSerializer(NotificationSerializer),
+    }
+    settings_row_serializer = RowSerializer(UserSettingsSerializer)
+
+    @conditional_get()
+    def get(self, request):
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = int(request.query_params.get('limit', settings.SYNC_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'cursor and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        cursor = max(cursor, 0)
+        limit = min(max(limit, 1), settings.SYNC_MAX_PAGE_SIZE)
+        user = request.user
+
+        data = {
+            'cursor': cursor,
+            'has_more': False,
+            'changes': {entry_type: [] for entry_type in SYNC_SOURCES},
+            'deleted': {entry_type: [] for entry_type in SYNC_SOURCES},
+            'settings': None,
+        }
+
+        # Every change numbered up to the committed counter has committed, so
+        # capping the scans there keeps one response consistent. It is the
+        # data version conditional_get has just read.
+        latest = request.data_version
+        if latest <= cursor:
+            return Response(data)
+
+        # Deletions numbered up to pruned_through may be gone (Tombstone.prune_batch)
+        if cursor and cursor < ChangeSequence.objects.filter(user=user).values_list('pruned_through', flat=True).get():
+            return Response(
+                {'error': 'This cursor is too old to sync from. Sync again without a cursor.', 'code': 'resync_required'},
+                status=status.HTTP_410_GONE
+            )
+
+        def pending(queryset):
+            return queryset.filter(user=user, change_seq__gt=cursor, change_seq__lte=latest).order_by('change_seq')
+
+        # The first `limit` changes overall are among the first `limit` of each source
+        found = []
+        for entry_type, model in SYNC_SOURCES.items():
+            rows = self.row_serializers[entry_type]
+            for item in rows.serialize(rows.values(pending(model.objects), 'change_seq')[:limit + 1]):
+                found.append((item.pop('change_seq'), 'changes', entry_type, item))
+        for archived in pending(ArchivedEntry.objects).values(*ARCHIVE_ROW_FIELDS, 'change_seq')[:limit + 1]:
+            entry_type = archived['entry_type']
+            rows = self.row_serializers[entry_type]
+            item = rows.serialize([entry_row(archived, rows.field_names)])[0]
+            found.append((archived['change_seq'], 'changes', entry_type, item))
+        rows = self.settings_row_serializer
+        for item in rows.serialize(rows.values(pending(UserSettings.objects), 'change_seq')[:1]):
+            found.append((item.pop('change_seq'), 'settings', None, item))
+        for change_seq, entry_type, object_id in pending(Tombstone.objects).values_list(
+            'change_seq', 'entry_type', 'object_id'
+        )[:limit + 1]:
+            found.append((change_seq, 'deleted', entry_type, object_id))
+
+        found.sort(key=lambda change: change[0])
+        page = found[:limit]
+        data['has_more'] = len(found) > limit
+        data['cursor'] = page[-1][0] if data['has_more'] else latest
+        for _, section, entry_type, item in page:
+            if section == 'settings':
+                data['settings'] = item
+            else:
+                data[section][entry_type].append(item)
+        return Response(data)